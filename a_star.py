@@ -2,6 +2,27 @@
 import heapq
 import math # Para a distância Euclidiana
 
+import numpy as np
+
+from csr_graph import GrafoCSR
+from dijkstra import _busca_bidirecional, _vizinhos_csr, _vizinhos_networkx
+from search_result import ResultadoBusca, relogio
+from spatial_index import RAIO_TERRA_METROS, resolver_pontos
+
+# O 'length' das arestas pode ter sido arredondado pelo osmnx; reduzir levemente a distância
+# em linha reta garante que a heurística nunca superestime o custo real (admissível).
+FATOR_ADMISSIBILIDADE_HAVERSINE = 0.9999
+
+
+def haversine_metros(lon1, lat1, lon2, lat2):
+    """
+    Distância de grande círculo (fórmula de Haversine) em metros.
+    Aceita escalares ou arrays NumPy (calcula elemento a elemento).
+    """
+    lon1, lat1, lon2, lat2 = map(np.radians, (lon1, lat1, lon2, lat2))
+    h = np.sin((lat2 - lat1) / 2)**2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2)**2
+    return 2 * RAIO_TERRA_METROS * np.arcsin(np.sqrt(np.minimum(h, 1.0)))
+
 def euclidean_distance_heuristic(graph, node1_id, node2_id):
     """
     Calcula a distância Euclidiana (linha reta) como heurística.
@@ -12,6 +33,15 @@ def euclidean_distance_heuristic(graph, node1_id, node2_id):
     Para distâncias reais em metros, o grafo precisaria ser projetado ou
     uma fórmula como Haversine deveria ser usada. Para uma heurística, isso é um começo.
     """
+    if isinstance(graph, GrafoCSR):
+        i, j = graph.indice(node1_id), graph.indice(node2_id)
+        if i is None or j is None:
+            return float('inf')
+        dx = graph.x[i] - graph.x[j]
+        dy = graph.y[i] - graph.y[j]
+        distancia = math.sqrt(dx**2 + dy**2)
+        return float('inf') if math.isnan(distancia) else distancia
+
     try:
         node1 = graph.nodes[node1_id]
         node2 = graph.nodes[node2_id]
@@ -30,21 +60,55 @@ def euclidean_distance_heuristic(graph, node1_id, node2_id):
         return float('inf')
 
 
-def a_star_search(graph, start_node_id, goal_node_id, heuristic_func=euclidean_distance_heuristic):
+def haversine_heuristic(graph, node1_id, node2_id):
+    """
+    Heurística de distância em linha reta em metros (Haversine), na mesma unidade do 'length'
+    das arestas. Por isso é bem mais informativa que `euclidean_distance_heuristic` (em graus),
+    e continua admissível. Retorna inf se as coordenadas não estiverem disponíveis.
+    """
+    if isinstance(graph, GrafoCSR):
+        i, j = graph.indice(node1_id), graph.indice(node2_id)
+        if i is None or j is None:
+            return float('inf')
+        x1, y1, x2, y2 = graph.x[i], graph.y[i], graph.x[j], graph.y[j]
+    else:
+        node1 = graph.nodes.get(node1_id, {})
+        node2 = graph.nodes.get(node2_id, {})
+        if 'x' not in node1 or 'y' not in node1 or 'x' not in node2 or 'y' not in node2:
+            return float('inf')
+        x1, y1, x2, y2 = node1['x'], node1['y'], node2['x'], node2['y']
+
+    distancia = float(haversine_metros(x1, y1, x2, y2))
+    return float('inf') if math.isnan(distancia) else distancia * FATOR_ADMISSIBILIDADE_HAVERSINE
+
+
+def a_star_search(graph, start_node_id, goal_node_id, heuristic_func=euclidean_distance_heuristic, temporizador=None):
     """
     Implementa o algoritmo de Busca A* (A-Estrela).
 
     Args:
-        graph (networkx.MultiDiGraph): O grafo do osmnx.
-        start_node_id (int): O ID do nó de início.
-        goal_node_id (int): O ID do nó de destino.
+        graph (networkx.MultiDiGraph | GrafoCSR): O grafo do osmnx, ou sua versão compilada
+            por `csr_graph.compilar_grafo` (bem mais rápida para várias consultas). Uma
+            `edge_overlay.SobreposicaoPesos` também serve: arestas bloqueadas nunca são usadas.
+        start_node_id (int | tuple): O ID do nó de início, ou coordenadas (lat, lon), ajustadas ao
+            nó mais próximo (ver spatial_index).
+        goal_node_id (int | tuple): O ID do nó de destino, ou coordenadas (lat, lon).
         heuristic_func (function): Função heurística que recebe (graph, no_atual_id, no_destino_id).
+        temporizador (callable): Opcional. Chamado como temporizador(fase, segundos) ao fim das
+            fases "preparacao", "busca" e "reconstrucao" (ver search_result.MedidorFases).
 
     Returns:
-        list: Uma lista de IDs de nós representando o caminho mais curto da origem ao destino.
-              Retorna None se nenhum caminho for encontrado.
+        ResultadoBusca: O caminho (lista de IDs de nós da origem ao destino, ou None se nenhum
+                        caminho for encontrado), o custo e os contadores da busca.
     """
-    # Fila de prioridade armazena tuplas: (f_score, id_do_no_atual)
+    start_node_id, goal_node_id = resolver_pontos(graph, start_node_id, goal_node_id)
+    if isinstance(graph, GrafoCSR):
+        return _a_star_search_csr(graph, start_node_id, goal_node_id, heuristic_func, temporizador)
+
+    if temporizador is not None:
+        inicio_fase = relogio()
+
+    # Fila de prioridade armazena tuplas: (f_score, id_do_no_atual, g_score)
     # f_score = g_score (custo real da origem até o nó atual) + h_score (heurística do nó atual até o destino)
     
     # Inicializar g_score para todos os nós como infinito
@@ -53,42 +117,42 @@ def a_star_search(graph, start_node_id, goal_node_id, heuristic_func=euclidean_d
     
     # f_score inicial para o nó de partida (g_score é 0)
     initial_f_score = heuristic_func(graph, start_node_id, goal_node_id)
-    priority_queue = [(initial_f_score, start_node_id)]
+    priority_queue = [(initial_f_score, start_node_id, 0)]
     
     came_from = {start_node_id: None}
 
-    print(f"A*: Iniciando busca de {start_node_id} para {goal_node_id}")
+    resultado = ResultadoBusca(algoritmo="astar", insercoes_fila=1)
+    nos_assentados = relaxamentos = entradas_obsoletas = pico_fronteira = 0
+    encontrado = False
 
-    while priority_queue:
-        current_f_score, current_node = heapq.heappop(priority_queue)
+    if temporizador is not None:
+        temporizador("preparacao", relogio() - inicio_fase)
+        inicio_fase = relogio()
 
-        # Log para depuração
-        # print(f"A*: Visitando {current_node} com f_score {current_f_score} (g_score: {g_score.get(current_node, float('inf'))})")
+    while priority_queue:
+        if len(priority_queue) > pico_fronteira:
+            pico_fronteira = len(priority_queue)
+        current_f_score, current_node, current_g_score = heapq.heappop(priority_queue)
 
         if current_node == goal_node_id:
-            print(f"A*: Destino {goal_node_id} alcançado com custo g_score {g_score[goal_node_id]}!")
-            path = []
-            node_iter = goal_node_id
-            while node_iter is not None:
-                path.append(node_iter)
-                node_iter = came_from[node_iter]
-            return path[::-1]
-
-        # Otimização: se já encontramos um caminho melhor para current_node depois que ele foi adicionado à fila.
-        # O f_score na fila pode estar desatualizado se o g_score do current_node foi melhorado por outro caminho
-        # e um novo item (com f_score menor) foi adicionado à fila para current_node.
-        # No entanto, o g_score[current_node] seria o valor atualizado.
-        # A condição `tentative_g_score < g_score.get(neighbor, float('inf'))` já previne
-        # a exploração de caminhos piores. Se um nó é retirado da PQ, é porque ele tinha o menor f_score *naquele momento*.
-        
+            encontrado = True
+            break
+
+        # Se já encontramos um caminho melhor para current_node depois que ele foi adicionado à fila,
+        # existe outra entrada (com f_score menor) para ele, que já foi expandida: esta está obsoleta.
+        # O g_score guardado na tupla permite detectar isso sem recalcular a heurística.
+        if current_g_score > g_score[current_node]:
+            entradas_obsoletas += 1
+            continue
+
         if not graph.has_node(current_node):
-            # print(f"A*: Atenção - Nó {current_node} não encontrado no grafo ao tentar obter vizinhos.")
             continue
+        nos_assentados += 1
 
         for neighbor in graph.neighbors(current_node):
             if not graph.has_node(neighbor):
-                # print(f"A*: Atenção - Vizinho {neighbor} de {current_node} não é um nó válido.")
                 continue
+            relaxamentos += 1
 
             min_edge_length = float('inf')
             if graph.has_edge(current_node, neighbor):
@@ -106,7 +170,243 @@ def a_star_search(graph, start_node_id, goal_node_id, heuristic_func=euclidean_d
                 g_score[neighbor] = tentative_g_score
                 h_score = heuristic_func(graph, neighbor, goal_node_id)
                 f_score = tentative_g_score + h_score
-                heapq.heappush(priority_queue, (f_score, neighbor))
-                
-    print(f"A*: Nenhum caminho encontrado de {start_node_id} para {goal_node_id}")
-    return None
\ No newline at end of file
+                heapq.heappush(priority_queue, (f_score, neighbor, tentative_g_score))
+                resultado.insercoes_fila += 1
+
+    if temporizador is not None:
+        temporizador("busca", relogio() - inicio_fase)
+        inicio_fase = relogio()
+
+    resultado.nos_assentados = nos_assentados
+    resultado.relaxamentos = relaxamentos
+    resultado.entradas_obsoletas = entradas_obsoletas
+    resultado.pico_fronteira = pico_fronteira
+
+    if encontrado:
+        path = []
+        node_iter = goal_node_id
+        while node_iter is not None:
+            path.append(node_iter)
+            node_iter = came_from[node_iter]
+        resultado.path = path[::-1]
+        resultado.custo = g_score[goal_node_id]
+
+    if temporizador is not None:
+        temporizador("reconstrucao", relogio() - inicio_fase)
+    return resultado
+
+
+def _euclidiana_por_indice(grafo, objetivo):
+    """Versão de `euclidean_distance_heuristic` sobre os arrays de coordenadas do GrafoCSR."""
+    x, y = grafo.coordenadas()
+    gx, gy = x[objetivo], y[objetivo]
+    sqrt = math.sqrt
+    isnan = math.isnan
+
+    def heuristica(i):
+        distancia = sqrt((x[i] - gx)**2 + (y[i] - gy)**2)
+        return float('inf') if isnan(distancia) else distancia
+
+    return heuristica
+
+
+def _haversine_por_indice(grafo, objetivo):
+    """Versão de `haversine_heuristic` sobre os arrays de coordenadas do GrafoCSR."""
+    x, y = grafo.coordenadas()
+    lon_objetivo, lat_objetivo = math.radians(x[objetivo]), math.radians(y[objetivo])
+    cos_lat_objetivo = math.cos(lat_objetivo)
+    radians, sin, cos, asin, sqrt, isnan = math.radians, math.sin, math.cos, math.asin, math.sqrt, math.isnan
+    escala = 2 * RAIO_TERRA_METROS * FATOR_ADMISSIBILIDADE_HAVERSINE
+
+    def heuristica(i):
+        lat = radians(y[i])
+        h = sin((lat_objetivo - lat) / 2)**2 + cos(lat) * cos_lat_objetivo * sin((lon_objetivo - radians(x[i])) / 2)**2
+        if isnan(h):
+            return float('inf')
+        return escala * asin(sqrt(min(h, 1.0)))
+
+    return heuristica
+
+
+# Heurísticas que possuem uma versão que trabalha diretamente com índices do GrafoCSR.
+# Objetos heurísticos (ex.: landmarks.HeuristicaLandmarks) podem oferecer o método `por_indice(grafo, objetivo)`.
+_HEURISTICAS_POR_INDICE = {
+    euclidean_distance_heuristic: _euclidiana_por_indice,
+    haversine_heuristic: _haversine_por_indice,
+}
+
+
+def _heuristica_nula(i):
+    return 0.0
+
+
+def _linha_reta_admissivel(grafo):
+    """
+    False se o grafo (uma SobreposicaoPesos) tem arestas mais baratas que a distância em linha
+    reta entre as pontas: aí as heurísticas de linha reta superestimam e o A* as troca por zero.
+    """
+    return not getattr(grafo, 'arestas_abaixo_linha_reta', None)
+
+
+def _heuristica_por_indice(heuristic_func, grafo, objetivo):
+    """
+    Retorna uma função h(indice) para o destino `objetivo` (índice denso).
+    Heurísticas sem versão por índice são chamadas com IDs OSM, como na busca original.
+    """
+    if heuristic_func in _HEURISTICAS_POR_INDICE:
+        if not _linha_reta_admissivel(grafo):
+            return _heuristica_nula
+        return _HEURISTICAS_POR_INDICE[heuristic_func](grafo, objetivo)
+    if hasattr(heuristic_func, 'por_indice'):
+        return heuristic_func.por_indice(grafo, objetivo)
+
+    node_ids = grafo.adjacencia()[3]
+    goal_node_id = node_ids[objetivo]
+    return lambda i: heuristic_func(grafo, node_ids[i], goal_node_id)
+
+
+def _a_star_search_csr(grafo, start_node_id, goal_node_id, heuristic_func, temporizador=None):
+    """
+    Mesma busca de `a_star_search`, mas sobre os arrays CSR de um GrafoCSR.
+    Trabalha com índices densos internamente e converte o caminho de volta para IDs OSM.
+    """
+    if temporizador is not None:
+        inicio_fase = relogio()
+
+    resultado = ResultadoBusca(algoritmo="astar")
+    inicio = grafo.indice(start_node_id)
+    objetivo = grafo.indice(goal_node_id)
+    if inicio is None or objetivo is None:
+        return resultado
+
+    offsets, alvos, pesos, _ = grafo.adjacencia()
+    heuristica = _heuristica_por_indice(heuristic_func, grafo, objetivo)
+
+    # Tuplas (f_score, no, g_score): a ordem (f_score, no) é a mesma da versão original,
+    # e o g_score permite descartar entradas desatualizadas sem recalcular a heurística.
+    g_score = {inicio: 0}
+    priority_queue = [(heuristica(inicio), inicio, 0)]
+    came_from = {inicio: -1}
+    nos_assentados = relaxamentos = entradas_obsoletas = pico_fronteira = 0
+    insercoes_fila = 1
+    encontrado = False
+
+    if temporizador is not None:
+        temporizador("preparacao", relogio() - inicio_fase)
+        inicio_fase = relogio()
+
+    while priority_queue:
+        if len(priority_queue) > pico_fronteira:
+            pico_fronteira = len(priority_queue)
+        current_f_score, current_node, current_g_score = heapq.heappop(priority_queue)
+
+        if current_node == objetivo:
+            encontrado = True
+            break
+
+        if current_g_score > g_score[current_node]:
+            entradas_obsoletas += 1
+            continue
+
+        nos_assentados += 1
+        primeira, ultima = offsets[current_node], offsets[current_node + 1]
+        relaxamentos += ultima - primeira
+        for i in range(primeira, ultima):
+            neighbor = alvos[i]
+            tentative_g_score = current_g_score + pesos[i]
+            if tentative_g_score < g_score.get(neighbor, float('inf')):
+                came_from[neighbor] = current_node
+                g_score[neighbor] = tentative_g_score
+                f_score = tentative_g_score + heuristica(neighbor)
+                heapq.heappush(priority_queue, (f_score, neighbor, tentative_g_score))
+                insercoes_fila += 1
+
+    if temporizador is not None:
+        temporizador("busca", relogio() - inicio_fase)
+        inicio_fase = relogio()
+
+    resultado.nos_assentados = nos_assentados
+    resultado.relaxamentos = relaxamentos
+    resultado.insercoes_fila = insercoes_fila
+    resultado.entradas_obsoletas = entradas_obsoletas
+    resultado.pico_fronteira = pico_fronteira
+
+    if encontrado:
+        path = []
+        node_iter = objetivo
+        while node_iter != -1:
+            path.append(node_iter)
+            node_iter = came_from[node_iter]
+        resultado.path = grafo.ids_osm(path[::-1])
+        resultado.custo = g_score[objetivo]
+
+    if temporizador is not None:
+        temporizador("reconstrucao", relogio() - inicio_fase)
+    return resultado
+
+
+def _heuristica_da_origem_por_indice(heuristic_func, grafo, inicio):
+    """
+    Retorna uma função h(indice) que estima a distância *de* `inicio` até cada nó, usada pela
+    fronteira de trás do A* bidirecional. As heurísticas de distância em linha reta são simétricas;
+    objetos como HeuristicaLandmarks oferecem `reversa()` com as tabelas trocadas.
+    """
+    if heuristic_func in _HEURISTICAS_POR_INDICE:
+        if not _linha_reta_admissivel(grafo):
+            return _heuristica_nula
+        return _HEURISTICAS_POR_INDICE[heuristic_func](grafo, inicio)
+    if hasattr(heuristic_func, 'reversa'):
+        return heuristic_func.reversa().por_indice(grafo, inicio)
+
+    node_ids = grafo.adjacencia()[3]
+    start_node_id = node_ids[inicio]
+    return lambda i: heuristic_func(grafo, start_node_id, node_ids[i])
+
+
+def bidirectional_a_star_search(graph, start_node_id, goal_node_id, heuristic_func=haversine_heuristic,
+                                temporizador=None):
+    """
+    Busca A* bidirecional com potenciais médios: p(v) = (h(v, destino) - h(origem, v)) / 2.
+    A fronteira da frente usa p e a de trás (no grafo reverso) usa -p, o que mantém os custos
+    reduzidos não negativos nos dois sentidos e permite o critério de parada do Dijkstra
+    bidirecional. O custo do caminho é o mesmo de `a_star_search` e `uniform_cost_search`.
+
+    Args:
+        graph (networkx.MultiDiGraph | GrafoCSR): O grafo do osmnx ou sua versão compilada.
+        start_node_id (int | tuple): O ID do nó de início, ou coordenadas (lat, lon), ajustadas ao
+            nó mais próximo (ver spatial_index).
+        goal_node_id (int | tuple): O ID do nó de destino, ou coordenadas (lat, lon).
+        heuristic_func (function): Heurística consistente, como em `a_star_search`.
+        temporizador (callable): Opcional, como em `a_star_search`.
+
+    Returns:
+        ResultadoBusca: O caminho (ou None), o custo e os contadores da busca.
+    """
+    start_node_id, goal_node_id = resolver_pontos(graph, start_node_id, goal_node_id)
+    if isinstance(graph, GrafoCSR):
+        inicio, objetivo = graph.indice(start_node_id), graph.indice(goal_node_id)
+        if inicio is None or objetivo is None:
+            return ResultadoBusca(algoritmo="astar-bi")
+        h_destino = _heuristica_por_indice(heuristic_func, graph, objetivo)
+        h_origem = _heuristica_da_origem_por_indice(heuristic_func, graph, inicio)
+        vizinhos_frente, vizinhos_tras = _vizinhos_csr(graph), _vizinhos_csr(graph.reverso())
+    else:
+        if not graph.has_node(start_node_id) or not graph.has_node(goal_node_id):
+            return ResultadoBusca(algoritmo="astar-bi")
+        inicio, objetivo = start_node_id, goal_node_id
+        h_destino = lambda v: heuristic_func(graph, v, goal_node_id)
+        h_origem = lambda v: heuristic_func(graph, start_node_id, v)
+        vizinhos_frente, vizinhos_tras = _vizinhos_networkx(graph.succ), _vizinhos_networkx(graph.pred)
+
+    def potencial(v):
+        h_t, h_s = h_destino(v), h_origem(v)
+        # Nós sem coordenadas (h = inf) ficam com potencial neutro.
+        if h_t == float('inf') or h_s == float('inf'):
+            return 0.0
+        return (h_t - h_s) / 2
+
+    resultado = _busca_bidirecional(vizinhos_frente, vizinhos_tras, inicio, objetivo, potencial,
+                                    algoritmo="astar-bi", temporizador=temporizador)
+    if resultado.path is not None and isinstance(graph, GrafoCSR):
+        resultado.path = graph.ids_osm(resultado.path)
+    return resultado
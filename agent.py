@@ -0,0 +1,604 @@
+# agent.py
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+import batch
+from snapshot import SNAPSHOT_DIRPATH, carregar_grafo_preparado
+from spatial_index import indice_espacial_de
+
+PORTA_PADRAO = 8080
+
+# Máximo de requisições por lote enviado a um trabalhador e quanto o agrupador espera (ms) por
+# mais requisições antes de despachar um lote incompleto. Lotes diluem o custo de enviar o
+# trabalho a outro processo; a janela curta limita a latência que isso acrescenta.
+TAMANHO_LOTE_PADRAO = 32
+JANELA_LOTE_MS_PADRAO = 2.0
+
+# Requisições aguardando um trabalhador. Com a fila cheia o serviço responde 503 na hora
+# (contrapressão) em vez de acumular trabalho que já chegaria atrasado.
+FILA_MAX_PADRAO = 1024
+
+# Prazo padrão de cada requisição (ms); o cliente pode pedir outro com "prazo_ms" ou o cabeçalho X-Prazo-Ms.
+PRAZO_MS_PADRAO = 5000.0
+PRAZO_MS_MAXIMO = 60000.0
+
+# Quantas medições recentes entram nos percentis das métricas
+JANELA_METRICAS = 10000
+
+MAX_BYTES_CORPO = 1 << 20
+
+RAZOES = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 413: "Payload Too Large",
+          500: "Internal Server Error", 503: "Service Unavailable", 504: "Gateway Timeout"}
+
+
+async def _ler_mensagem(reader):
+    """
+    Lê uma mensagem HTTP/1.1 (requisição ou resposta) com corpo delimitado por Content-Length.
+
+    Returns:
+        tuple: (primeira linha, {cabeçalho em minúsculas: valor}, corpo em bytes), ou None se a
+               conexão foi fechada antes de uma nova mensagem.
+    """
+    primeira_linha = await reader.readline()
+    if not primeira_linha.strip():
+        return None
+    cabecalhos = {}
+    while True:
+        linha = await reader.readline()
+        if linha in (b"\r\n", b"\n", b""):
+            break
+        nome, _, valor = linha.decode("latin-1").partition(":")
+        cabecalhos[nome.strip().lower()] = valor.strip()
+    tamanho = int(cabecalhos.get("content-length", 0))
+    if tamanho > MAX_BYTES_CORPO:
+        raise ValueError(f"Corpo de {tamanho} bytes excede o limite de {MAX_BYTES_CORPO}")
+    corpo = await reader.readexactly(tamanho) if tamanho else b""
+    return primeira_linha.decode("latin-1").rstrip("\r\n"), cabecalhos, corpo
+
+
+def _percentis(valores, percentis=(50, 90, 99)):
+    """Percentis (em ms) de uma sequência de durações em segundos: {"p50": ..., ..., "max": ...}."""
+    ordenados = sorted(valores)
+    if not ordenados:
+        return {**{f"p{p}": None for p in percentis}, "max": None}
+    resultado = {f"p{p}": round(ordenados[min(len(ordenados) - 1, int(len(ordenados) * p / 100))] * 1000, 3)
+                 for p in percentis}
+    resultado["max"] = round(ordenados[-1] * 1000, 3)
+    return resultado
+
+
+class Metricas:
+    """
+    Contadores e latências recentes do serviço, expostos em GET /metricas (JSON) e
+    GET /metrics (formato texto do Prometheus).
+
+    Latência é o tempo total de uma requisição respondida com 200; espera é o tempo que ela
+    passou na fila até o lote ser despachado para um trabalhador.
+    """
+
+    def __init__(self, janela=JANELA_METRICAS):
+        self.inicio = time.perf_counter()
+        self.contadores = {"recebidas": 0, "respondidas": 0, "invalidas": 0, "rejeitadas": 0,
+                           "expiradas": 0, "erros": 0}
+        self.latencias = deque(maxlen=janela)
+        self.esperas = deque(maxlen=janela)
+        self.tamanhos_lote = deque(maxlen=janela)
+        self.lotes = 0
+        self.pico_fila = 0
+
+    def como_dict(self, profundidade_fila, lotes_em_andamento):
+        lotes = self.tamanhos_lote
+        return {"uptime_s": round(time.perf_counter() - self.inicio, 3), **self.contadores,
+                "profundidade_fila": profundidade_fila, "pico_fila": self.pico_fila,
+                "lotes": self.lotes, "lotes_em_andamento": lotes_em_andamento,
+                "tamanho_medio_lote": round(sum(lotes) / len(lotes), 2) if lotes else None,
+                "latencia_ms": _percentis(self.latencias), "espera_fila_ms": _percentis(self.esperas)}
+
+    def como_prometheus(self, profundidade_fila, lotes_em_andamento):
+        linhas = ["# TYPE agent_requisicoes_total counter"]
+        linhas += [f'agent_requisicoes_total{{resultado="{nome}"}} {valor}' for nome, valor in self.contadores.items()]
+        linhas += ["# TYPE agent_profundidade_fila gauge", f"agent_profundidade_fila {profundidade_fila}",
+                   "# TYPE agent_lotes_em_andamento gauge", f"agent_lotes_em_andamento {lotes_em_andamento}",
+                   "# TYPE agent_lotes_total counter", f"agent_lotes_total {self.lotes}"]
+        for nome, valores in (("latencia", self.latencias), ("espera_fila", self.esperas)):
+            linhas.append(f"# TYPE agent_{nome}_segundos summary")
+            for p, valor in _percentis(valores).items():
+                if p != "max" and valor is not None:
+                    linhas.append(f'agent_{nome}_segundos{{quantile="{int(p[1:]) / 100}"}} {valor / 1000}')
+        return "\n".join(linhas) + "\n"
+
+
+class _Pedido:
+    __slots__ = ("origem", "destino", "algoritmo", "incluir_caminho", "prazo", "chegada", "futuro")
+
+    def __init__(self, origem, destino, algoritmo, incluir_caminho, prazo, chegada, futuro):
+        self.origem = origem
+        self.destino = destino
+        self.algoritmo = algoritmo
+        self.incluir_caminho = incluir_caminho
+        self.prazo = prazo
+        self.chegada = chegada
+        self.futuro = futuro
+
+
+def _ler_ponto(valor):
+    """
+    Converte o campo "origem"/"destino" da requisição em ID OSM (int) ou (lat, lon).
+
+    Raises:
+        ValueError: Se o ponto for inválido, inclusive coordenadas não finitas ou fora de
+                    [-90, 90] x [-180, 180] (o ajuste ao nó mais próximo as aceitaria).
+    """
+    if isinstance(valor, (list, tuple)):
+        if len(valor) != 2:
+            raise ValueError(f"Coordenadas devem ser [lat, lon]: {valor}")
+        lat, lon = float(valor[0]), float(valor[1])
+        if not (math.isfinite(lat) and math.isfinite(lon) and -90 <= lat <= 90 and -180 <= lon <= 180):
+            raise ValueError(f"Coordenadas fora do intervalo válido: {valor}")
+        return lat, lon
+    if isinstance(valor, bool) or valor is None:
+        raise ValueError(f"Ponto inválido: {valor}")
+    return int(valor)
+
+
+def _ler_prazo(valor):
+    """
+    Converte o "prazo_ms" da requisição (ou o cabeçalho X-Prazo-Ms) em ms. Retorna None se ausente.
+
+    Raises:
+        ValueError: Se o prazo não for um número finito maior que zero.
+    """
+    if valor is None:
+        return None
+    if isinstance(valor, bool):
+        raise ValueError(f"Prazo inválido: {valor}")
+    prazo_ms = float(valor)
+    if not (math.isfinite(prazo_ms) and prazo_ms > 0):
+        raise ValueError(f"O prazo deve ser um número finito maior que zero: {valor}")
+    return prazo_ms
+
+
+class ServicoRotas:
+    """
+    Serviço HTTP/JSON de rotas sobre asyncio.
+
+    O grafo preparado é carregado uma vez no processo principal (validação de IDs e ajuste de
+    coordenadas) e uma vez por trabalhador, a partir do snapshot mapeado em memória (como em
+    batch.py). O laço de eventos só faz E/S: as buscas rodam no pool de trabalhadores.
+
+    Requisições concorrentes entram numa fila limitada; um agrupador junta até `tamanho_lote`
+    delas (esperando no máximo `janela_ms` pelas seguintes) e despacha o lote quando há um
+    trabalhador livre, então lotes crescem sozinhos quando o serviço está carregado. Fila cheia
+    responde 503 e prazo estourado responde 504; requisições vencidas ainda na fila nem chegam
+    a ser buscadas.
+
+    Rotas:
+        POST /rota: {"origem", "destino", "algoritmo" ("ucs" ou "astar"), "caminho" (bool), "prazo_ms"}
+            com origem/destino como ID OSM ou [lat, lon]. Responde o resultado da busca (como em batch.py).
+        GET /metricas, GET /metrics: métricas em JSON e no formato do Prometheus.
+        GET /saude: estado do serviço.
+        GET /amostra?n=100&seed=0: IDs de nós sorteados (usado pelo gerador de carga).
+    """
+
+    def __init__(self, grafo, diretorio_snapshot=SNAPSHOT_DIRPATH, num_processos=None,
+                 tamanho_lote=TAMANHO_LOTE_PADRAO, janela_ms=JANELA_LOTE_MS_PADRAO,
+                 fila_max=FILA_MAX_PADRAO, prazo_ms=PRAZO_MS_PADRAO):
+        self.grafo = grafo
+        self.diretorio_snapshot = diretorio_snapshot
+        self.num_processos = os.cpu_count() if num_processos is None else num_processos
+        self.tamanho_lote = tamanho_lote
+        self.janela = janela_ms / 1000
+        self.fila_max = fila_max
+        self.prazo = prazo_ms / 1000
+        self.metricas = Metricas()
+        self._executor = None
+        self._indice = None
+        self._fila = None
+        self._vagas = None
+        self._tarefas = set()
+        self._conexoes = set()
+        self._servidor = None
+        self.lotes_em_andamento = 0
+
+    async def iniciar(self, host="127.0.0.1", porta=PORTA_PADRAO):
+        """Abre o pool de trabalhadores e começa a aceitar conexões. Com num_processos=0 usa uma thread."""
+        if self.num_processos > 0:
+            self._executor = ProcessPoolExecutor(max_workers=self.num_processos,
+                                                 initializer=batch._inicializar_trabalhador,
+                                                 initargs=(self.diretorio_snapshot,))
+        else:
+            self._executor = ThreadPoolExecutor(max_workers=1, initializer=batch._inicializar_trabalhador,
+                                                initargs=(self.diretorio_snapshot,))
+        self._indice = indice_espacial_de(self.grafo)
+        self._fila = asyncio.Queue(maxsize=self.fila_max)
+        # No máximo 2 lotes por trabalhador em andamento, como em batch.executar_lote.
+        self._vagas = asyncio.Semaphore(2 * max(1, self.num_processos))
+        self._guardar(asyncio.create_task(self._agrupar()))
+        self._servidor = await asyncio.start_server(self._atender, host, porta)
+        return self._servidor.sockets[0].getsockname()[:2]
+
+    async def encerrar(self):
+        if self._servidor is not None:
+            self._servidor.close()
+            for writer in list(self._conexoes):
+                writer.close()
+            await self._servidor.wait_closed()
+        for tarefa in list(self._tarefas):
+            tarefa.cancel()
+        await asyncio.gather(*self._tarefas, return_exceptions=True)
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+
+    def _guardar(self, tarefa):
+        self._tarefas.add(tarefa)
+        tarefa.add_done_callback(self._tarefas.discard)
+
+    def estatisticas(self):
+        return self.metricas.como_dict(self._fila.qsize(), self.lotes_em_andamento)
+
+    async def rotear(self, dados, prazo_ms=None):
+        """
+        Atende uma requisição de rota.
+
+        Returns:
+            tuple: (status HTTP, dicionário da resposta).
+        """
+        metricas = self.metricas
+        metricas.contadores["recebidas"] += 1
+        loop = asyncio.get_running_loop()
+        chegada = loop.time()
+        try:
+            origem, destino = _ler_ponto(dados.get("origem")), _ler_ponto(dados.get("destino"))
+            algoritmo = dados.get("algoritmo", "ucs")
+            if algoritmo not in batch.ALGORITMOS:
+                raise ValueError(f"Algoritmo desconhecido: {algoritmo}. Use um de {batch.ALGORITMOS}.")
+            prazo_pedido = _ler_prazo(dados.get("prazo_ms"))
+            prazo_cabecalho = _ler_prazo(prazo_ms)
+            if prazo_pedido is None:
+                prazo_pedido = prazo_cabecalho if prazo_cabecalho is not None else self.prazo * 1000
+            prazo = min(prazo_pedido, PRAZO_MS_MAXIMO) / 1000
+        except (AttributeError, TypeError, ValueError) as e:
+            metricas.contadores["invalidas"] += 1
+            return 400, {"erro": str(e)}
+        for ponto in (origem, destino):
+            if isinstance(ponto, int) and self.grafo.indice(ponto) is None:
+                metricas.contadores["invalidas"] += 1
+                return 404, {"erro": f"Nó {ponto} não existe no grafo"}
+
+        pedido = _Pedido(origem, destino, algoritmo, bool(dados.get("caminho")), chegada + prazo, chegada,
+                         loop.create_future())
+        try:
+            self._fila.put_nowait(pedido)
+        except asyncio.QueueFull:
+            metricas.contadores["rejeitadas"] += 1
+            return 503, {"erro": "Fila cheia, tente novamente", "profundidade_fila": self._fila.qsize()}
+        metricas.pico_fila = max(metricas.pico_fila, self._fila.qsize())
+
+        try:
+            status, resposta = await asyncio.wait_for(pedido.futuro, pedido.prazo - loop.time())
+        except asyncio.TimeoutError:
+            metricas.contadores["expiradas"] += 1
+            return 504, {"erro": f"Prazo de {prazo * 1000:.0f} ms esgotado"}
+        if status == 200:
+            metricas.contadores["respondidas"] += 1
+            metricas.latencias.append(loop.time() - chegada)
+        else:
+            metricas.contadores["erros"] += 1
+        return status, resposta
+
+    async def _agrupar(self):
+        """Forma lotes com as requisições da fila e os despacha conforme há trabalhadores livres."""
+        fila = self._fila
+        while True:
+            await self._vagas.acquire()
+            lote = [await fila.get()]
+            if fila.qsize() < self.tamanho_lote - 1 and self.janela > 0:
+                await asyncio.sleep(self.janela)
+            while len(lote) < self.tamanho_lote and not fila.empty():
+                lote.append(fila.get_nowait())
+            self.lotes_em_andamento += 1
+            self._guardar(asyncio.create_task(self._executar(lote)))
+
+    async def _executar(self, lote):
+        loop = asyncio.get_running_loop()
+        agora = loop.time()
+        try:
+            # Requisições já respondidas com 504 (futuro cancelado) ou vencidas não são buscadas.
+            lote = [pedido for pedido in lote if not pedido.futuro.done() and pedido.prazo > agora]
+            if not lote:
+                return
+            self.metricas.lotes += 1
+            self.metricas.tamanhos_lote.append(len(lote))
+            grupos = {}
+            for pedido in lote:
+                self.metricas.esperas.append(agora - pedido.chegada)
+                grupos.setdefault((pedido.algoritmo, pedido.incluir_caminho), []).append(pedido)
+            await asyncio.gather(*(self._executar_grupo(loop, chave, pedidos) for chave, pedidos in grupos.items()))
+        finally:
+            self.lotes_em_andamento -= 1
+            self._vagas.release()
+
+    async def _executar_grupo(self, loop, chave, pedidos):
+        algoritmo, incluir_caminho = chave
+        try:
+            pares = batch._ajustar_lote([(i, p.origem, p.destino) for i, p in enumerate(pedidos)], self._indice)
+            resultados = await loop.run_in_executor(self._executor, batch._resolver_lote, pares, algoritmo,
+                                                    incluir_caminho)
+        except Exception as e:  # Ajuste ou trabalhador falhou (ex.: processo encerrado): responde 500 ao grupo todo.
+            resultados = [None] * len(pedidos)
+            erro = f"{type(e).__name__}: {e}"
+        for pedido, resultado in zip(pedidos, resultados):
+            if pedido.futuro.done():
+                continue
+            if resultado is None:
+                pedido.futuro.set_result((500, {"erro": erro}))
+            else:
+                resultado["origem"], resultado["destino"] = pedido.origem, pedido.destino
+                del resultado["id"]
+                pedido.futuro.set_result((200, resultado))
+
+    def _amostra(self, consulta):
+        n = min(int(consulta.get("n", ["100"])[0]), self.grafo.num_nos)
+        rng = random.Random(int(consulta.get("seed", ["0"])[0]))
+        return {"nos": [int(self.grafo.node_ids[i]) for i in rng.sample(range(self.grafo.num_nos), n)]}
+
+    async def _responder(self, metodo, alvo, cabecalhos, corpo):
+        """Despacha uma requisição HTTP. Returns: (status, corpo, tipo de conteúdo)."""
+        url = urlsplit(alvo)
+        if url.path == "/rota":
+            if metodo != "POST":
+                return 405, {"erro": "Use POST"}, "application/json"
+            try:
+                dados = json.loads(corpo or b"{}")
+            except ValueError:
+                self.metricas.contadores["recebidas"] += 1
+                self.metricas.contadores["invalidas"] += 1
+                return 400, {"erro": "JSON inválido"}, "application/json"
+            status, resposta = await self.rotear(dados, prazo_ms=cabecalhos.get("x-prazo-ms"))
+            return status, resposta, "application/json"
+        if metodo != "GET":
+            return 405, {"erro": "Use GET"}, "application/json"
+        if url.path == "/metricas":
+            return 200, self.estatisticas(), "application/json"
+        if url.path == "/metrics":
+            return 200, self.metricas.como_prometheus(self._fila.qsize(), self.lotes_em_andamento), \
+                "text/plain; version=0.0.4"
+        if url.path == "/saude":
+            return 200, {"status": "ok", "nos": self.grafo.num_nos, "arestas": self.grafo.num_arestas,
+                         "trabalhadores": self.num_processos, "profundidade_fila": self._fila.qsize()}, \
+                "application/json"
+        if url.path == "/amostra":
+            try:
+                return 200, self._amostra(parse_qs(url.query)), "application/json"
+            except ValueError as e:
+                return 400, {"erro": str(e)}, "application/json"
+        return 404, {"erro": f"Rota desconhecida: {url.path}"}, "application/json"
+
+    async def _atender(self, reader, writer):
+        """Atende uma conexão (com keep-alive) até o cliente fechá-la."""
+        self._conexoes.add(writer)
+        try:
+            while True:
+                try:
+                    mensagem = await _ler_mensagem(reader)
+                except ValueError as e:
+                    await self._escrever(writer, 413, {"erro": str(e)}, "application/json", fechar=True)
+                    break
+                if mensagem is None:
+                    break
+                primeira_linha, cabecalhos, corpo = mensagem
+                partes = primeira_linha.split()
+                if len(partes) != 3:
+                    await self._escrever(writer, 400, {"erro": "Requisição malformada"}, "application/json", fechar=True)
+                    break
+                metodo, alvo, versao = partes
+                status, resposta, tipo = await self._responder(metodo, alvo, cabecalhos, corpo)
+                fechar = cabecalhos.get("connection", "").lower() == "close" or versao == "HTTP/1.0"
+                await self._escrever(writer, status, resposta, tipo, fechar)
+                if fechar:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._conexoes.discard(writer)
+            writer.close()
+
+    async def _escrever(self, writer, status, resposta, tipo, fechar):
+        corpo = (resposta if isinstance(resposta, str) else json.dumps(resposta, ensure_ascii=False)).encode()
+        cabecalhos = [f"HTTP/1.1 {status} {RAZOES[status]}", f"Content-Type: {tipo}", f"Content-Length: {len(corpo)}"]
+        if status == 503:
+            cabecalhos.append("Retry-After: 1")
+        if fechar:
+            cabecalhos.append("Connection: close")
+        writer.write(("\r\n".join(cabecalhos) + "\r\n\r\n").encode() + corpo)
+        await writer.drain()
+
+
+async def servir(grafo, host="127.0.0.1", porta=PORTA_PADRAO, **opcoes):
+    """Executa o `ServicoRotas` até o processo ser interrompido."""
+    servico = ServicoRotas(grafo, **opcoes)
+    host, porta = await servico.iniciar(host, porta)
+    print(f"AGENT.PY: Servindo rotas em http://{host}:{porta} com {servico.num_processos} trabalhadores "
+          f"(lotes de até {servico.tamanho_lote}, fila de {servico.fila_max}).")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await servico.encerrar()
+
+
+# --- Gerador de carga -------------------------------------------------------------------------
+
+class _Conexao:
+    """Conexão HTTP/1.1 persistente do gerador de carga."""
+
+    def __init__(self, host, porta):
+        self.host = host
+        self.porta = porta
+        self.reader = self.writer = None
+
+    async def requisitar(self, metodo, caminho, dados=None):
+        """Envia uma requisição e retorna (status, corpo decodificado de JSON)."""
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.porta)
+        corpo = json.dumps(dados).encode() if dados is not None else b""
+        self.writer.write((f"{metodo} {caminho} HTTP/1.1\r\nHost: {self.host}:{self.porta}\r\n"
+                           f"Content-Type: application/json\r\nContent-Length: {len(corpo)}\r\n\r\n").encode() + corpo)
+        try:
+            await self.writer.drain()
+            mensagem = await _ler_mensagem(self.reader)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            mensagem = None
+        if mensagem is None:
+            self.fechar()
+            raise ConnectionError("Conexão encerrada pelo servidor")
+        primeira_linha, cabecalhos, resposta = mensagem
+        if cabecalhos.get("connection", "").lower() == "close":
+            self.fechar()
+        return int(primeira_linha.split()[1]), json.loads(resposta) if resposta else None
+
+    def fechar(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+async def gerar_carga(host, porta, pares, concorrencia=32, taxa=None, algoritmo="ucs", prazo_ms=None):
+    """
+    Envia as requisições de rota de `pares` ao serviço e mede a latência de cada uma.
+
+    Sem `taxa`, é uma carga de malha fechada: `concorrencia` clientes enviam uma requisição
+    assim que recebem a resposta anterior (mede a vazão máxima). Com `taxa` (requisições/s), é
+    uma carga de malha aberta: as requisições saem em horários fixos, independentemente das
+    respostas, e a latência conta a partir do horário previsto (inclusive a espera por uma das
+    `concorrencia` conexões), para que lentidão do serviço não esconda a latência de cauda.
+
+    Returns:
+        dict: Totais por status, vazão (respostas 200 por segundo) e percentis de latência em ms.
+    """
+    pares = list(pares)
+    conexoes = asyncio.Queue()
+    for _ in range(concorrencia):
+        conexoes.put_nowait(_Conexao(host, porta))
+    loop = asyncio.get_running_loop()
+    medicoes = []
+
+    async def enviar(origem, destino, inicio):
+        conexao = await conexoes.get()
+        try:
+            dados = {"origem": origem, "destino": destino, "algoritmo": algoritmo}
+            if prazo_ms:
+                dados["prazo_ms"] = prazo_ms
+            status, _ = await conexao.requisitar("POST", "/rota", dados)
+        except ConnectionError:
+            status = None
+        finally:
+            conexoes.put_nowait(conexao)
+        medicoes.append((status, loop.time() - inicio))
+
+    inicio = loop.time()
+    if taxa is None:
+        proximos = iter(pares)
+
+        async def cliente():
+            for origem, destino in proximos:
+                await enviar(origem, destino, loop.time())
+
+        await asyncio.gather(*(cliente() for _ in range(concorrencia)))
+    else:
+        tarefas = []
+        for i, (origem, destino) in enumerate(pares):
+            previsto = inicio + i / taxa
+            if previsto > loop.time():
+                await asyncio.sleep(previsto - loop.time())
+            tarefas.append(asyncio.create_task(enviar(origem, destino, previsto)))
+        await asyncio.gather(*tarefas)
+    duracao = loop.time() - inicio
+
+    while not conexoes.empty():
+        conexoes.get_nowait().fechar()
+    por_status = {}
+    for status, _ in medicoes:
+        por_status[str(status)] = por_status.get(str(status), 0) + 1
+    sucesso = [latencia for status, latencia in medicoes if status == 200]
+    return {"requisicoes": len(medicoes), "por_status": por_status, "duracao_s": round(duracao, 3),
+            "vazao_rps": round(len(sucesso) / duracao, 1) if duracao > 0 else 0.0,
+            "latencia_ms": _percentis(sucesso, (50, 90, 99, 99.9))}
+
+
+async def _carga(args):
+    if args.pares:
+        pares = [(origem, destino) for _, origem, destino in batch.ler_pares(args.pares)]
+        pares = (pares * (args.requisicoes // max(1, len(pares)) + 1))[:args.requisicoes]
+    else:
+        _, amostra = await _Conexao(args.host, args.porta).requisitar("GET", f"/amostra?n=1000&seed={args.seed}")
+        rng = random.Random(args.seed)
+        pares = [(rng.choice(amostra["nos"]), rng.choice(amostra["nos"])) for _ in range(args.requisicoes)]
+    relatorio = await gerar_carga(args.host, args.porta, pares, concorrencia=args.concorrencia, taxa=args.taxa,
+                                  algoritmo=args.algoritmo, prazo_ms=args.prazo_ms)
+    _, relatorio["servidor"] = await _Conexao(args.host, args.porta).requisitar("GET", "/metricas")
+    return relatorio
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serviço HTTP/JSON de rotas e gerador de carga local.")
+    comandos = parser.add_subparsers(dest="comando", required=True)
+
+    servidor = comandos.add_parser("servir", help="Inicia o serviço de rotas")
+    servidor.add_argument("--host", default="127.0.0.1")
+    servidor.add_argument("--porta", type=int, default=PORTA_PADRAO)
+    servidor.add_argument("--snapshot", default=SNAPSHOT_DIRPATH)
+    servidor.add_argument("-p", "--processos", type=int, default=None,
+                          help="Processos trabalhadores (padrão: os.cpu_count(); 0 = uma thread)")
+    servidor.add_argument("--tamanho-lote", type=int, default=TAMANHO_LOTE_PADRAO)
+    servidor.add_argument("--janela-ms", type=float, default=JANELA_LOTE_MS_PADRAO)
+    servidor.add_argument("--fila-max", type=int, default=FILA_MAX_PADRAO)
+    servidor.add_argument("--prazo-ms", type=float, default=PRAZO_MS_PADRAO)
+
+    carga = comandos.add_parser("carga", help="Mede vazão e latência de um serviço em execução")
+    carga.add_argument("--host", default="127.0.0.1")
+    carga.add_argument("--porta", type=int, default=PORTA_PADRAO)
+    carga.add_argument("-n", "--requisicoes", type=int, default=2000)
+    carga.add_argument("-c", "--concorrencia", type=int, default=32)
+    carga.add_argument("--taxa", type=float, default=None, help="Requisições/s (malha aberta); padrão: malha fechada")
+    carga.add_argument("-a", "--algoritmo", choices=batch.ALGORITMOS, default="ucs")
+    carga.add_argument("--prazo-ms", type=float, default=None)
+    carga.add_argument("--pares", help="Arquivo .jsonl ou .csv de pares (como em batch.py); padrão: nós sorteados")
+    carga.add_argument("--seed", type=int, default=42)
+    carga.add_argument("-o", "--saida", help="Grava o relatório em JSON")
+    args = parser.parse_args()
+
+    if args.comando == "servir":
+        grafo, _ = carregar_grafo_preparado(args.snapshot)
+        if grafo is None:
+            print("AGENT.PY: Falha ao carregar o grafo.", file=sys.stderr)
+            sys.exit(1)
+        try:
+            asyncio.run(servir(grafo, args.host, args.porta, diretorio_snapshot=args.snapshot,
+                               num_processos=args.processos, tamanho_lote=args.tamanho_lote,
+                               janela_ms=args.janela_ms, fila_max=args.fila_max, prazo_ms=args.prazo_ms))
+        except KeyboardInterrupt:
+            print("AGENT.PY: Serviço encerrado.")
+        return
+
+    relatorio = asyncio.run(_carga(args))
+    latencia = relatorio["latencia_ms"]
+    print(f"AGENT.PY: {relatorio['requisicoes']} requisições em {relatorio['duracao_s']} s, "
+          f"{relatorio['vazao_rps']} rotas/s, status {relatorio['por_status']}")
+    print(f"AGENT.PY: Latência (ms) p50 {latencia['p50']}, p90 {latencia['p90']}, p99 {latencia['p99']}, "
+          f"p99.9 {latencia['p99.9']}, máx {latencia['max']}")
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            json.dump(relatorio, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+# batch.py
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from a_star import a_star_search, haversine_heuristic
+from dijkstra import uniform_cost_search
+from snapshot import SNAPSHOT_DIRPATH, carregar_grafo_preparado, carregar_snapshot
+from spatial_index import indice_espacial_de
+
+ALGORITMOS = ("ucs", "astar")
+
+# Pares por tarefa enviada a um processo: lotes maiores diluem o custo de comunicação entre processos.
+TAMANHO_LOTE_PADRAO = 256
+
+# Grafo do processo trabalhador (carregado uma vez por processo, em _inicializar_trabalhador)
+_GRAFO = None
+
+
+def _inicializar_trabalhador(diretorio_snapshot):
+    """
+    Inicializa um processo do pool: abre o snapshot com os arrays mapeados em memória.
+    Todos os processos compartilham as mesmas páginas do arquivo (cache de páginas do SO),
+    então o grafo não é copiado nem serializado para cada trabalhador.
+    """
+    global _GRAFO
+    _GRAFO, _ = carregar_snapshot(diretorio_snapshot, mmap=True)
+
+
+def _resolver_lote(lote, algoritmo, incluir_caminho):
+    """Executa as buscas de um lote de pares (id, origem, destino) no processo trabalhador."""
+    resultados = []
+    for id_par, start_node_id, goal_node_id in lote:
+        inicio = time.perf_counter()
+        if algoritmo == "astar":
+            busca = a_star_search(_GRAFO, start_node_id, goal_node_id, heuristic_func=haversine_heuristic)
+        else:
+            busca = uniform_cost_search(_GRAFO, start_node_id, goal_node_id)
+        resultado = {"id": id_par, "origem": start_node_id, "destino": goal_node_id}
+        resultado.update(busca.como_dict(incluir_caminho=incluir_caminho))
+        resultado["tempo_ms"] = round((time.perf_counter() - inicio) * 1000, 3)
+        resultados.append(resultado)
+    return resultados
+
+
+def ler_pares(caminho_arquivo):
+    """
+    Lê pares origem/destino de um arquivo JSONL ou CSV (pela extensão), um de cada vez.
+
+    JSONL: {"id": ..., "origem": <id OSM ou [lat, lon]>, "destino": <id OSM ou [lat, lon]>}
+    CSV: colunas id (opcional), origem e destino (IDs OSM), ou
+         origem_lat, origem_lon, destino_lat, destino_lon (coordenadas).
+
+    Yields:
+        tuple: (id, origem, destino), onde origem/destino são int (ID OSM) ou tuple (lat, lon).
+    """
+    with open(caminho_arquivo, encoding="utf-8", newline="") as f:
+        if caminho_arquivo.endswith(".csv"):
+            for numero, linha in enumerate(csv.DictReader(f)):
+                id_par = linha.get("id") or numero
+                if linha.get("origem") not in (None, ""):
+                    yield id_par, int(linha["origem"]), int(linha["destino"])
+                else:
+                    yield (id_par, (float(linha["origem_lat"]), float(linha["origem_lon"])),
+                           (float(linha["destino_lat"]), float(linha["destino_lon"])))
+        else:
+            for numero, linha in enumerate(f):
+                if not linha.strip():
+                    continue
+                par = json.loads(linha)
+                origem, destino = par["origem"], par["destino"]
+                yield (par.get("id", numero),
+                       tuple(origem) if isinstance(origem, list) else int(origem),
+                       tuple(destino) if isinstance(destino, list) else int(destino))
+
+
+def _ajustar_lote(lote, indice):
+    """Substitui coordenadas (lat, lon) do lote pelos IDs dos nós mais próximos, de forma vetorizada."""
+    coordenadas = [ponto for _, origem, destino in lote for ponto in (origem, destino) if isinstance(ponto, tuple)]
+    if not coordenadas:
+        return lote
+    lats, lons = zip(*coordenadas)
+    ids = iter(indice.ajustar_nos(lats, lons)[0].tolist())
+    return [(id_par,
+             next(ids) if isinstance(origem, tuple) else origem,
+             next(ids) if isinstance(destino, tuple) else destino)
+            for id_par, origem, destino in lote]
+
+
+def _em_lotes(pares, tamanho_lote):
+    lote = []
+    for par in pares:
+        lote.append(par)
+        if len(lote) == tamanho_lote:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+
+def executar_lote(pares, saida, algoritmo="ucs", num_processos=None, tamanho_lote=TAMANHO_LOTE_PADRAO,
+                  diretorio_snapshot=SNAPSHOT_DIRPATH, incluir_caminho=False, grafo=None):
+    """
+    Executa as buscas de todos os pares em um pool de processos e escreve cada resultado
+    (uma linha JSON) em `saida` assim que o lote correspondente termina.
+
+    No máximo 2 lotes por processo ficam em andamento, para que a leitura da entrada e a
+    memória usada acompanhem o ritmo dos trabalhadores mesmo com milhões de pares.
+
+    Args:
+        pares (iterable): Tuplas (id, origem, destino), como as de `ler_pares`.
+        saida (file): Arquivo de texto onde os resultados são escritos (JSONL).
+        algoritmo (str): "ucs" (uniform_cost_search) ou "astar" (a_star_search com heurística Haversine).
+        num_processos (int): Número de processos (padrão: os.cpu_count()).
+        tamanho_lote (int): Pares por tarefa.
+        diretorio_snapshot (str): Snapshot aberto por cada trabalhador.
+        incluir_caminho (bool): Se True, inclui a lista de nós de cada rota no resultado.
+        grafo (GrafoCSR): Grafo já carregado no processo principal (usado para ajustar coordenadas).
+
+    Returns:
+        dict: Estatísticas da execução (pares, tempo_s, pares_por_s, sem_caminho).
+    """
+    if algoritmo not in ALGORITMOS:
+        raise ValueError(f"Algoritmo desconhecido: {algoritmo}. Use um de {ALGORITMOS}.")
+    num_processos = num_processos or os.cpu_count()
+    indice = None
+    total = sem_caminho = 0
+    inicio = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=num_processos, initializer=_inicializar_trabalhador,
+                             initargs=(diretorio_snapshot,)) as executor:
+        em_andamento = set()
+        lotes = _em_lotes(pares, tamanho_lote)
+
+        def escrever(concluidos):
+            nonlocal total, sem_caminho
+            for futuro in concluidos:
+                for resultado in futuro.result():
+                    saida.write(json.dumps(resultado) + "\n")
+                    total += 1
+                    sem_caminho += resultado["custo"] is None
+            saida.flush()
+
+        for lote in lotes:
+            if any(isinstance(p, tuple) for _, origem, destino in lote for p in (origem, destino)):
+                if indice is None:
+                    indice = indice_espacial_de(grafo or carregar_snapshot(diretorio_snapshot)[0])
+                lote = _ajustar_lote(lote, indice)
+            em_andamento.add(executor.submit(_resolver_lote, lote, algoritmo, incluir_caminho))
+            if len(em_andamento) >= 2 * num_processos:
+                concluidos, em_andamento = wait(em_andamento, return_when=FIRST_COMPLETED)
+                escrever(concluidos)
+        concluidos, _ = wait(em_andamento)
+        escrever(concluidos)
+
+    tempo = time.perf_counter() - inicio
+    return {"pares": total, "tempo_s": round(tempo, 3),
+            "pares_por_s": round(total / tempo, 1) if tempo > 0 else 0.0,
+            "sem_caminho": sem_caminho}
+
+
+def medir_escalonamento(pares, algoritmo="ucs", max_processos=None, diretorio_snapshot=SNAPSHOT_DIRPATH):
+    """
+    Executa o mesmo conjunto de pares com 1, 2, 4, ... processos e imprime a vazão de cada
+    configuração e a eficiência em relação ao escalonamento linear.
+
+    Returns:
+        list: Lista de (num_processos, pares_por_s).
+    """
+    pares = list(pares)
+    max_processos = max_processos or os.cpu_count()
+    contagens = sorted({1 << i for i in range(max_processos.bit_length()) if 1 << i <= max_processos} | {max_processos})
+    medicoes = []
+    for num_processos in contagens:
+        estatisticas = executar_lote(pares, io.StringIO(), algoritmo=algoritmo, num_processos=num_processos,
+                                     diretorio_snapshot=diretorio_snapshot)
+        medicoes.append((num_processos, estatisticas["pares_por_s"]))
+        eficiencia = estatisticas["pares_por_s"] / (medicoes[0][1] * num_processos) if medicoes[0][1] else 0
+        print(f"BATCH.PY: {algoritmo} com {num_processos:>3} processos: {estatisticas['pares_por_s']:>10.1f} pares/s "
+              f"(eficiência {eficiencia:.0%})")
+    return medicoes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Executa buscas de rota em lote a partir de um arquivo JSONL ou CSV.")
+    parser.add_argument("entrada", help="Arquivo .jsonl ou .csv com os pares origem/destino")
+    parser.add_argument("-o", "--saida", help="Arquivo JSONL de saída (padrão: saída padrão)")
+    parser.add_argument("-a", "--algoritmo", choices=ALGORITMOS, default="ucs")
+    parser.add_argument("-p", "--processos", type=int, default=None)
+    parser.add_argument("--tamanho-lote", type=int, default=TAMANHO_LOTE_PADRAO)
+    parser.add_argument("--caminhos", action="store_true", help="Incluir a lista de nós de cada rota")
+    parser.add_argument("--escalonamento", action="store_true",
+                        help="Medir a vazão com 1, 2, 4, ... processos em vez de gravar resultados")
+    args = parser.parse_args()
+
+    # Garante que o snapshot existe e está atualizado antes de iniciar os trabalhadores.
+    grafo, _ = carregar_grafo_preparado()
+    if grafo is None:
+        print("BATCH.PY: Falha ao carregar o grafo.", file=sys.stderr)
+        sys.exit(1)
+
+    if args.escalonamento:
+        medir_escalonamento(ler_pares(args.entrada), algoritmo=args.algoritmo, max_processos=args.processos)
+        return
+
+    saida = open(args.saida, "w", encoding="utf-8") if args.saida else sys.stdout
+    try:
+        estatisticas = executar_lote(ler_pares(args.entrada), saida, algoritmo=args.algoritmo,
+                                     num_processos=args.processos, tamanho_lote=args.tamanho_lote,
+                                     incluir_caminho=args.caminhos, grafo=grafo)
+    finally:
+        if saida is not sys.stdout:
+            saida.close()
+    print(f"BATCH.PY: {estatisticas['pares']} pares em {estatisticas['tempo_s']} s "
+          f"({estatisticas['pares_por_s']} pares/s, {estatisticas['sem_caminho']} sem caminho).", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
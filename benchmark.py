@@ -0,0 +1,597 @@
+# benchmark.py
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+import networkx as nx
+import numpy as np
+
+try:
+    import resource  # Indisponível no Windows: o pico de memória fica como None
+except ImportError:
+    resource = None
+
+from a_star import (a_star_search, bidirectional_a_star_search, euclidean_distance_heuristic,
+                    haversine_heuristic, haversine_metros)
+from contraction_hierarchies import (carregar_hierarquia, contraction_hierarchy_search, preprocessar_hierarquia,
+                                     salvar_hierarquia)
+from csr_graph import compilar_grafo
+from dijkstra import bidirectional_uniform_cost_search, uniform_cost_search
+from landmarks import HeuristicaLandmarks, carregar_landmarks, selecionar_landmarks
+from partitioned_graph import carregar_particao, particionar_grafo, partitioned_uniform_cost_search
+from search_result import relogio
+
+_DIRETORIO_FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+# Grafo pequeno incluído no repositório, para rodar o benchmark sem rede e sem o osmnx
+FIXTURE_FILEPATH = os.path.join(_DIRETORIO_FIXTURES, "grafo_pequeno.json")
+
+# Resultados de referência do grafo pequeno, usados para detectar regressões (ver `verificar_regressoes`)
+REFERENCIA_FILEPATH = os.path.join(_DIRETORIO_FIXTURES, "referencia_benchmark.json")
+
+# Incrementar se a estrutura do JSON de resultados mudar
+VERSAO_RESULTADOS = 1
+
+CLASSES_CONSULTA = ("curta", "media", "longa", "ponto_onibus")
+
+MOTORES = ("ucs-networkx", "astar-networkx", "ucs", "astar", "astar-euclidiana", "ucs-bi", "astar-bi", "alt", "ch",
+           "particionado")
+
+NUM_CONSULTAS_PADRAO = 50
+
+# Variação relativa tolerada antes de uma métrica ser considerada regressão: os contadores das
+# buscas são determinísticos; a aceleração sobre o networkx ainda oscila com a carga da máquina.
+TOLERANCIA_PADRAO = 0.10
+TOLERANCIA_LATENCIA_PADRAO = 0.5
+
+# Consultas executadas antes da medição de cada motor (aquecem caches e o grafo reverso)
+NUM_AQUECIMENTO = 5
+
+# Cada consulta é repetida e vale o menor tempo, o que filtra interrupções do SO e deixa a
+# comparação com a referência estável entre execuções
+REPETICOES_PADRAO = 3
+
+# Módulos de entrada medidos pelo relatório de importação (ver `medir_importacoes`)
+MODULOS_IMPORTACAO = ("main", "batch", "agent", "render", "snapshot", "graph")
+
+# Pilha geoespacial e de plotagem: rotear sobre um grafo já preparado não deve importar nenhum deles
+MODULOS_PESADOS = ("osmnx", "geopandas", "pandas", "shapely", "matplotlib", "networkx")
+
+
+def carregar_fixture(caminho_arquivo=FIXTURE_FILEPATH):
+    """
+    Carrega o grafo pequeno de `fixtures/` no mesmo formato de `carregar_e_preparar_grafo`:
+    um MultiDiGraph com 'x'/'y' nos nós, 'length' nas arestas e 'bus_stop' nos pontos de ônibus.
+
+    Returns:
+        tuple: (networkx.MultiDiGraph, list) com o grafo e os IDs dos nós que são pontos de ônibus.
+    """
+    with open(caminho_arquivo, encoding="utf-8") as f:
+        dados = json.load(f)
+
+    G = nx.MultiDiGraph()
+    for node_id, x, y in dados["nodes"]:
+        G.add_node(node_id, x=x, y=y)
+    for u, v, length in dados["edges"]:
+        G.add_edge(u, v, length=length)
+    bus_stop_node_ids = []
+    for node_id, info in dados["bus_stops"].items():
+        G.nodes[int(node_id)]["bus_stop"] = info
+        bus_stop_node_ids.append(int(node_id))
+    return G, bus_stop_node_ids
+
+
+def grafo_networkx(grafo):
+    """Reconstrói um MultiDiGraph (com 'x', 'y' e 'length') a partir de um GrafoCSR, para os motores networkx."""
+    G = nx.MultiDiGraph()
+    node_ids = grafo.node_ids.tolist()
+    G.add_nodes_from((node_id, {"x": x, "y": y})
+                     for node_id, x, y in zip(node_ids, grafo.x.tolist(), grafo.y.tolist()))
+    origens = np.repeat(grafo.node_ids, np.diff(grafo.offsets))
+    G.add_weighted_edges_from(zip(origens.tolist(), grafo.node_ids[grafo.alvos].tolist(), grafo.pesos.tolist()),
+                              weight="length")
+    return G
+
+
+def gerar_consultas(grafo, bus_stop_node_ids, num_por_classe=NUM_CONSULTAS_PADRAO, seed=42):
+    """
+    Gera conjuntos de pares (origem, destino) reprodutíveis: a mesma semente e o mesmo grafo
+    produzem sempre as mesmas consultas.
+
+    As rotas "curta", "media" e "longa" são separadas pelos tercis da distância em linha reta
+    de uma amostra de pares aleatórios, então as classes se adaptam ao tamanho do grafo.
+    Em "ponto_onibus" a origem é um nó aleatório e o destino um ponto de ônibus aleatório.
+
+    Returns:
+        tuple: (dict, list) com {classe: [(origem, destino), ...]} e os dois limites (em metros)
+               que separam as classes curta/media e media/longa.
+    """
+    rng = random.Random(seed)
+    node_ids = grafo.node_ids.tolist()
+
+    amostra = [(rng.choice(node_ids), rng.choice(node_ids)) for _ in range(30 * num_por_classe)]
+    amostra = [(s, t) for s, t in amostra if s != t]
+    indices = np.array([(grafo.indice(s), grafo.indice(t)) for s, t in amostra])
+    distancias = haversine_metros(grafo.x[indices[:, 0]], grafo.y[indices[:, 0]],
+                                  grafo.x[indices[:, 1]], grafo.y[indices[:, 1]])
+    limites = np.nanpercentile(distancias, [100 / 3, 200 / 3])
+    classe_de = np.digitize(distancias, limites)
+
+    consultas = {classe: [] for classe in CLASSES_CONSULTA}
+    for par, k in zip(amostra, classe_de.tolist()):
+        if len(consultas[CLASSES_CONSULTA[k]]) < num_por_classe:
+            consultas[CLASSES_CONSULTA[k]].append(par)
+
+    pontos = sorted(bus_stop_node_ids)
+    if pontos:
+        consultas["ponto_onibus"] = [(rng.choice(node_ids), rng.choice(pontos)) for _ in range(num_por_classe)]
+    return consultas, [round(float(limite), 1) for limite in limites]
+
+
+def preparar_motor(nome, G, grafo, diretorio_preprocessamento=None):
+    """
+    Prepara um motor de busca para o benchmark.
+
+    ALT, CH e a partição precisam de pré-processamento: com `diretorio_preprocessamento` (o diretório
+    do snapshot), as tabelas salvas são reaproveitadas; sem ele, são calculadas em memória (a partição,
+    que é lida do disco, vai para um diretório temporário).
+
+    Args:
+        nome (str): Um dos MOTORES.
+        G (networkx.MultiDiGraph): O grafo networkx (usado pelos motores "*-networkx").
+        grafo (GrafoCSR): O grafo compilado.
+        diretorio_preprocessamento (str): Onde procurar/salvar landmarks, hierarquia e partição.
+
+    Returns:
+        callable: Função (start_node_id, goal_node_id) -> ResultadoBusca.
+    """
+    if nome == "ucs-networkx":
+        return lambda s, t: uniform_cost_search(G, s, t)
+    if nome == "astar-networkx":
+        return lambda s, t: a_star_search(G, s, t, heuristic_func=haversine_heuristic)
+    if nome == "ucs":
+        return lambda s, t: uniform_cost_search(grafo, s, t)
+    if nome == "astar":
+        return lambda s, t: a_star_search(grafo, s, t, heuristic_func=haversine_heuristic)
+    if nome == "astar-euclidiana":
+        return lambda s, t: a_star_search(grafo, s, t, heuristic_func=euclidean_distance_heuristic)
+    if nome == "ucs-bi":
+        return lambda s, t: bidirectional_uniform_cost_search(grafo, s, t)
+    if nome == "astar-bi":
+        return lambda s, t: bidirectional_a_star_search(grafo, s, t, heuristic_func=haversine_heuristic)
+    if nome == "alt":
+        if diretorio_preprocessamento:
+            heuristica = carregar_landmarks(grafo, os.path.join(diretorio_preprocessamento, "landmarks"))
+        else:
+            heuristica = HeuristicaLandmarks(grafo.node_ids, *selecionar_landmarks(grafo))
+        return lambda s, t: a_star_search(grafo, s, t, heuristic_func=heuristica)
+    if nome == "ch":
+        hierarquia = None
+        if diretorio_preprocessamento:
+            arquivo_hierarquia = os.path.join(diretorio_preprocessamento, "hierarquia.npz")
+            hierarquia = carregar_hierarquia(arquivo_hierarquia, grafo)
+        if hierarquia is None:
+            hierarquia = preprocessar_hierarquia(grafo)
+            if diretorio_preprocessamento:
+                salvar_hierarquia(hierarquia, arquivo_hierarquia)
+        return lambda s, t: contraction_hierarchy_search(hierarquia, s, t)
+    if nome == "particionado":
+        if diretorio_preprocessamento:
+            diretorio_particao = os.path.join(diretorio_preprocessamento, "particao")
+            particao = carregar_particao(diretorio_particao, grafo) or particionar_grafo(grafo, diretorio_particao)
+            return lambda s, t: partitioned_uniform_cost_search(particao, s, t)
+        temporario = tempfile.TemporaryDirectory(prefix="particao_")
+        particao = particionar_grafo(grafo, os.path.join(temporario.name, "particao"))
+        # O diretório temporário vive enquanto a função de busca (que o referencia) existir.
+        return lambda s, t, _diretorio=temporario: partitioned_uniform_cost_search(particao, s, t)
+    raise ValueError(f"Motor desconhecido: {nome}. Use um de {MOTORES}.")
+
+
+def busca_referencia(G):
+    """Motor de referência: `networkx.shortest_path` com peso 'length' (custo calculado fora da medição)."""
+    def buscar(s, t):
+        try:
+            return nx.shortest_path(G, s, t, weight="length")
+        except (nx.NetworkXNoPath, nx.NodeNotFound):
+            return None
+    return buscar
+
+
+def pico_memoria_kb():
+    """Maior memória residente (RSS) que o processo atingiu, em KB, ou None se não houver suporte."""
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # No macOS ru_maxrss vem em bytes; no Linux, em KB.
+    return pico // 1024 if sys.platform == "darwin" else pico
+
+
+def _resumir(latencias, resultados=None):
+    """Percentis de latência (ms) e médias dos contadores de um conjunto de consultas."""
+    if not latencias:
+        return {"consultas": 0}
+    p50, p90, p99 = np.percentile(latencias, [50, 90, 99]) * 1000
+    resumo = {"consultas": len(latencias), "p50_ms": round(p50, 4), "p90_ms": round(p90, 4),
+              "p99_ms": round(p99, 4), "media_ms": round(float(np.mean(latencias)) * 1000, 4)}
+    if resultados is not None:
+        resumo["nos_assentados_medio"] = round(float(np.mean([r.nos_assentados for r in resultados])), 1)
+        resumo["relaxamentos_medio"] = round(float(np.mean([r.relaxamentos for r in resultados])), 1)
+    return resumo
+
+
+def _custos_divergem(custo, custo_referencia, tolerancia=1e-6):
+    if custo == custo_referencia:
+        return False
+    return not abs(custo - custo_referencia) <= tolerancia * max(1.0, abs(custo_referencia))
+
+
+def _cronometrar(buscar, s, t, repeticoes):
+    """Executa a consulta `repeticoes` vezes; retorna (menor tempo em segundos, último resultado)."""
+    melhor = float('inf')
+    for _ in range(repeticoes):
+        inicio = relogio()
+        resultado = buscar(s, t)
+        melhor = min(melhor, relogio() - inicio)
+    return melhor, resultado
+
+
+def medir_referencia(G, consultas, repeticoes=REPETICOES_PADRAO):
+    """
+    Executa `networkx.shortest_path` em todas as consultas.
+
+    Returns:
+        tuple: (dict, dict) com o resumo por classe e {(origem, destino): custo} de cada consulta.
+    """
+    buscar = busca_referencia(G)
+    resumo, custos = {}, {}
+    todas_latencias = []
+    for classe, pares in consultas.items():
+        latencias = []
+        for s, t in pares:
+            tempo, path = _cronometrar(buscar, s, t, repeticoes)
+            latencias.append(tempo)
+            custos[(s, t)] = nx.path_weight(G, path, "length") if path else float('inf')
+        resumo[classe] = _resumir(latencias)
+        todas_latencias.extend(latencias)
+    resumo["geral"] = _resumir(todas_latencias)
+    return resumo, custos
+
+
+def medir_motor(buscar, consultas, custos_referencia, resumo_referencia, repeticoes=REPETICOES_PADRAO):
+    """
+    Mede um motor em todas as classes de consultas: latência, contadores da busca,
+    divergências de custo em relação à referência e aceleração sobre ela (razão entre as
+    medianas de latência, que independe da velocidade da máquina).
+
+    Returns:
+        dict: {classe: resumo}, mais a chave "geral" com todas as consultas juntas.
+    """
+    pares = [par for lista in consultas.values() for par in lista]
+    for s, t in pares[:NUM_AQUECIMENTO]:
+        buscar(s, t)
+
+    por_classe = {}
+    todas_latencias, todos_resultados = [], []
+    for classe, lista in consultas.items():
+        latencias, resultados, divergencias = [], [], 0
+        for s, t in lista:
+            tempo, resultado = _cronometrar(buscar, s, t, repeticoes)
+            latencias.append(tempo)
+            resultados.append(resultado)
+            divergencias += _custos_divergem(resultado.custo, custos_referencia[(s, t)])
+        por_classe[classe] = _resumir(latencias, resultados)
+        por_classe[classe]["divergencias"] = divergencias
+        todas_latencias.extend(latencias)
+        todos_resultados.extend(resultados)
+
+    por_classe["geral"] = _resumir(todas_latencias, todos_resultados)
+    por_classe["geral"]["divergencias"] = sum(r.get("divergencias", 0) for r in por_classe.values())
+    for classe, resumo in por_classe.items():
+        if resumo.get("p50_ms") and resumo_referencia[classe].get("p50_ms"):
+            resumo["aceleracao_p50"] = round(resumo_referencia[classe]["p50_ms"] / resumo["p50_ms"], 3)
+    return por_classe
+
+
+def _carregar_fonte(snapshot):
+    """Carrega o grafo do snapshot (grafo real) ou da fixture. Retorna (G ou None, GrafoCSR, pontos, diretório)."""
+    if snapshot:
+        from snapshot import SNAPSHOT_DIRPATH, carregar_grafo_preparado
+        grafo, bus_stop_node_ids = carregar_grafo_preparado()
+        return None, grafo, bus_stop_node_ids, SNAPSHOT_DIRPATH
+    G, bus_stop_node_ids = carregar_fixture()
+    return G, compilar_grafo(G), bus_stop_node_ids, None
+
+
+def _partida_fria_filho(motor, snapshot, start_node_id, goal_node_id):
+    """
+    Executado no processo filho de `medir_partida_fria`: carrega o grafo, prepara o motor,
+    responde uma consulta e imprime os tempos de cada etapa e o pico de memória em JSON.
+    """
+    inicio = relogio()
+    G, grafo, _, diretorio = _carregar_fonte(snapshot)
+    if G is None and motor.endswith("-networkx"):
+        G = grafo_networkx(grafo)
+    carga = relogio()
+    buscar = preparar_motor(motor, G, grafo, diretorio)
+    preparo = relogio()
+    buscar(start_node_id, goal_node_id)
+    fim = relogio()
+    print(json.dumps({"carga_s": round(carga - inicio, 4), "preparo_s": round(preparo - carga, 4),
+                      "primeira_consulta_ms": round((fim - preparo) * 1000, 4),
+                      "pico_rss_kb": pico_memoria_kb()}))
+
+
+def medir_partida_fria(motor, par, snapshot=False):
+    """
+    Mede a partida a frio de um motor em um processo novo: importação dos módulos, carga do
+    grafo, pré-processamento (ALT/CH/partição) e a primeira consulta. O pico de RSS também vem do
+    processo filho, então reflete apenas o que aquele motor precisou.
+
+    Returns:
+        dict: total_s (do início ao fim do processo filho) mais as etapas medidas nele,
+              ou {"erro": ...} se o processo falhar.
+    """
+    comando = [sys.executable, os.path.abspath(__file__), "--partida-fria", motor, "--par", str(par[0]), str(par[1])]
+    if snapshot:
+        comando.append("--snapshot")
+    inicio = time.perf_counter()
+    processo = subprocess.run(comando, capture_output=True, text=True)
+    total = time.perf_counter() - inicio
+    if processo.returncode != 0:
+        return {"erro": processo.stderr.strip().splitlines()[-1:] or ["código de saída " + str(processo.returncode)]}
+    medicao = json.loads(processo.stdout.strip().splitlines()[-1])
+    medicao["total_s"] = round(total, 4)
+    return medicao
+
+
+_CODIGO_IMPORTACAO = """
+import json, sys, time
+inicio = time.perf_counter()
+import {modulo}
+tempo = time.perf_counter() - inicio
+try:  # VmHWM (Linux) é zerado no exec; o ru_maxrss herdaria o pico do processo pai
+    with open("/proc/self/status") as f:
+        pico = next(int(linha.split()[1]) for linha in f if linha.startswith("VmHWM:"))
+except OSError:
+    pico = None
+print(json.dumps({{"tempo_ms": round(tempo * 1000, 1), "pico_rss_kb": pico,
+                  "modulos": len(sys.modules), "pesados": [m for m in {pesados!r} if m in sys.modules]}}))
+"""
+
+
+def medir_importacoes(modulos=MODULOS_IMPORTACAO, num_maiores=5):
+    """
+    Relatório de importação: importa cada módulo em um processo novo (com `python -X importtime`)
+    e mede o tempo do import, o pico de RSS, quantos módulos foram carregados, quais da pilha
+    pesada (MODULOS_PESADOS) vieram junto e os pacotes de topo que mais custaram.
+
+    Returns:
+        dict: {modulo: medição}, com {"erro": ...} para os que não puderam ser importados.
+    """
+    relatorio = {}
+    diretorio = os.path.dirname(os.path.abspath(__file__))
+    for modulo in modulos:
+        processo = subprocess.run([sys.executable, "-X", "importtime", "-c", _CODIGO_IMPORTACAO.format(modulo=modulo, pesados=MODULOS_PESADOS)],
+                                  capture_output=True, text=True, cwd=diretorio)
+        if processo.returncode != 0:
+            relatorio[modulo] = {"erro": processo.stderr.strip().splitlines()[-1:]}
+            continue
+        medicao = json.loads(processo.stdout.strip().splitlines()[-1])
+        # Linhas "import time: self [us] | cumulative | pacote"; o custo de um pacote é o maior
+        # acumulado entre as linhas dele (a do seu primeiro import, que inclui os submódulos).
+        custos = {}
+        for linha in processo.stderr.splitlines():
+            partes = linha.split("|")
+            if len(partes) == 3 and partes[0].startswith("import time:") and partes[1].strip().isdigit():
+                raiz = partes[2].strip().split(".")[0]
+                if raiz not in (modulo.split(".")[0], "json", "sys", "time"):
+                    custos[raiz] = max(custos.get(raiz, 0), int(partes[1]) / 1000)
+        pacotes = sorted(((ms, nome) for nome, ms in custos.items()), reverse=True)
+        medicao["maiores"] = [{"pacote": nome, "ms": round(ms, 1)} for ms, nome in pacotes[:num_maiores]]
+        relatorio[modulo] = medicao
+    return relatorio
+
+
+def imprimir_importacoes(relatorio):
+    print(f"{'módulo':<12}{'import ms':>11}{'pico RSS KB':>13}{'módulos':>9}  pesados / maiores pacotes")
+    for modulo, medicao in relatorio.items():
+        if "erro" in medicao:
+            print(f"{modulo:<12}falhou: {medicao['erro']}")
+            continue
+        maiores = ", ".join(f"{m['pacote']} {m['ms']:.0f}ms" for m in medicao["maiores"])
+        print(f"{modulo:<12}{medicao['tempo_ms']:>11.1f}{medicao['pico_rss_kb'] or 0:>13}{medicao['modulos']:>9}  "
+              f"[{', '.join(medicao['pesados']) or 'nenhum'}] {maiores}")
+
+
+def executar_benchmark(motores=MOTORES, num_por_classe=NUM_CONSULTAS_PADRAO, seed=42, snapshot=False,
+                       partida_fria=True, repeticoes=REPETICOES_PADRAO):
+    """
+    Executa o benchmark completo.
+
+    Args:
+        motores (iterable): Motores a medir (ver MOTORES).
+        num_por_classe (int): Consultas por classe (curta, media, longa, ponto_onibus).
+        seed (int): Semente das consultas.
+        snapshot (bool): Se True, usa o grafo real (snapshot.py); senão, a fixture offline.
+        partida_fria (bool): Se True, mede a partida a frio de cada motor em um processo separado.
+        repeticoes (int): Execuções de cada consulta (vale a mais rápida).
+
+    Returns:
+        dict: Os resultados, serializáveis em JSON (ver VERSAO_RESULTADOS).
+    """
+    for motor in motores:
+        if motor not in MOTORES:
+            raise ValueError(f"Motor desconhecido: {motor}. Use um de {MOTORES}.")
+
+    inicio_carga = relogio()
+    G, grafo, bus_stop_node_ids, diretorio = _carregar_fonte(snapshot)
+    if grafo is None:
+        raise RuntimeError("Falha ao carregar o grafo.")
+    if G is None:
+        G = grafo_networkx(grafo)
+    tempo_carga = relogio() - inicio_carga
+
+    consultas, limites = gerar_consultas(grafo, bus_stop_node_ids, num_por_classe, seed)
+    resumo_referencia, custos_referencia = medir_referencia(G, consultas, repeticoes)
+
+    resultados = {
+        "versao": VERSAO_RESULTADOS,
+        "data": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "maquina": {"python": platform.python_version(), "plataforma": platform.platform(),
+                    "processador": platform.processor() or platform.machine(), "cpus": os.cpu_count()},
+        "fonte": "snapshot" if snapshot else "fixture",
+        "grafo": {"num_nos": grafo.num_nos, "num_arestas": grafo.num_arestas,
+                  "pontos_onibus": len(bus_stop_node_ids), "assinatura": grafo.assinatura()},
+        "carga_s": round(tempo_carga, 4),
+        "seed": seed,
+        "repeticoes": repeticoes,
+        "consultas": {classe: len(pares) for classe, pares in consultas.items()},
+        "limites_classes_m": limites,
+        "referencia": {"motor": "networkx.shortest_path", "classes": resumo_referencia},
+        "motores": {},
+    }
+
+    primeiro_par = next(pares[0] for pares in consultas.values() if pares)
+    for motor in motores:
+        inicio_preparo = relogio()
+        buscar = preparar_motor(motor, G, grafo, diretorio)
+        tempo_preparo = relogio() - inicio_preparo
+        medicao = {"preparo_s": round(tempo_preparo, 4),
+                   "classes": medir_motor(buscar, consultas, custos_referencia, resumo_referencia,
+                                               repeticoes)}
+        if partida_fria:
+            medicao["partida_fria"] = medir_partida_fria(motor, primeiro_par, snapshot)
+        resultados["motores"][motor] = medicao
+
+    resultados["pico_rss_kb"] = pico_memoria_kb()
+    return resultados
+
+
+def verificar_regressoes(resultados, referencia=None, tolerancia=TOLERANCIA_PADRAO,
+                         tolerancia_latencia=TOLERANCIA_LATENCIA_PADRAO):
+    """
+    Compara os resultados com os de uma execução de referência.
+
+    São verificadas apenas métricas que não dependem da máquina, para que a referência
+    incluída no repositório sirva em qualquer computador:
+      - divergências de custo em relação ao networkx (sempre falha, mesmo sem referência);
+      - nós assentados e relaxamentos em média, por classe (falha se aumentarem mais que `tolerancia`);
+      - aceleração da mediana sobre o networkx, medida na mesma execução, no conjunto geral de
+        consultas (falha se cair mais que `tolerancia_latencia`).
+
+    Returns:
+        list: Descrições das regressões encontradas (vazia se não houver nenhuma).
+    """
+    regressoes = []
+    for motor, medicao in resultados["motores"].items():
+        for classe, resumo in medicao["classes"].items():
+            if classe != "geral" and resumo.get("divergencias"):
+                regressoes.append(f"{motor}/{classe}: {resumo['divergencias']} rotas com custo diferente do networkx")
+
+    if referencia is None:
+        return regressoes
+    if referencia.get("grafo", {}).get("assinatura") != resultados["grafo"]["assinatura"]:
+        regressoes.append("A referência foi gerada para outro grafo; gere uma nova com --saida.")
+        return regressoes
+    if referencia.get("seed") != resultados["seed"] or referencia.get("consultas") != resultados["consultas"]:
+        regressoes.append("A referência usa outro conjunto de consultas (seed ou quantidade diferentes).")
+        return regressoes
+
+    for motor, medicao in resultados["motores"].items():
+        classes_referencia = referencia.get("motores", {}).get(motor, {}).get("classes", {})
+        for classe, resumo in medicao["classes"].items():
+            anterior = classes_referencia.get(classe)
+            if not anterior:
+                continue
+            for contador in ("nos_assentados_medio", "relaxamentos_medio"):
+                if contador in anterior and resumo[contador] > anterior[contador] * (1 + tolerancia):
+                    regressoes.append(f"{motor}/{classe}: {contador} {anterior[contador]} -> {resumo[contador]}")
+            if classe == "geral" and "aceleracao_p50" in anterior and "aceleracao_p50" in resumo and \
+                    resumo["aceleracao_p50"] < anterior["aceleracao_p50"] * (1 - tolerancia_latencia):
+                regressoes.append(f"{motor}: aceleração sobre o networkx {anterior['aceleracao_p50']}x -> "
+                                  f"{resumo['aceleracao_p50']}x")
+    return regressoes
+
+
+def imprimir_resumo(resultados):
+    print(f"BENCHMARK.PY: Grafo ({resultados['fonte']}) com {resultados['grafo']['num_nos']} nós e "
+          f"{resultados['grafo']['num_arestas']} arestas; consultas por classe: {resultados['consultas']}.")
+    referencia = resultados["referencia"]["classes"]
+    print(f"{'motor':<18}{'classe':<14}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'assentados':>12}"
+          f"{'acel.':>8}{'diverg.':>9}")
+    for classe in (*CLASSES_CONSULTA, "geral"):
+        if referencia.get(classe, {}).get("consultas"):
+            r = referencia[classe]
+            print(f"{'networkx':<18}{classe:<14}{r['p50_ms']:>10.3f}{r['p90_ms']:>10.3f}{r['p99_ms']:>10.3f}")
+    for motor, medicao in resultados["motores"].items():
+        for classe, r in medicao["classes"].items():
+            if not r.get("consultas"):
+                continue
+            print(f"{motor:<18}{classe:<14}{r['p50_ms']:>10.3f}{r['p90_ms']:>10.3f}{r['p99_ms']:>10.3f}"
+                  f"{r['nos_assentados_medio']:>12.1f}{r.get('aceleracao_p50', float('nan')):>7.1f}x"
+                  f"{r['divergencias']:>9}")
+        fria = medicao.get("partida_fria")
+        if fria and "erro" not in fria:
+            print(f"{motor:<18}partida a frio: {fria['total_s']:.3f} s (carga {fria['carga_s']:.3f} s, "
+                  f"preparo {fria['preparo_s']:.3f} s), pico de RSS {fria['pico_rss_kb']} KB")
+        elif fria:
+            print(f"{motor:<18}partida a frio falhou: {fria['erro']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark reprodutível dos algoritmos de busca de rota.")
+    parser.add_argument("-m", "--motores", nargs="+", choices=MOTORES, default=list(MOTORES))
+    parser.add_argument("-n", "--consultas", type=int, default=NUM_CONSULTAS_PADRAO, help="Consultas por classe")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeticoes", type=int, default=REPETICOES_PADRAO,
+                        help="Execuções de cada consulta (vale a mais rápida)")
+    parser.add_argument("--snapshot", action="store_true",
+                        help="Usar o grafo real (snapshot de snapshot.py) em vez da fixture offline")
+    parser.add_argument("-o", "--saida", help="Arquivo JSON onde os resultados são gravados")
+    parser.add_argument("-r", "--referencia", nargs="?", const=REFERENCIA_FILEPATH,
+                        help="Resultados de referência para detectar regressões (sem valor: a referência da fixture)")
+    parser.add_argument("-t", "--tolerancia", type=float, default=TOLERANCIA_PADRAO,
+                        help="Aumento relativo tolerado nos nós assentados e relaxamentos")
+    parser.add_argument("--tolerancia-latencia", type=float, default=TOLERANCIA_LATENCIA_PADRAO,
+                        help="Queda relativa tolerada na aceleração sobre o networkx")
+    parser.add_argument("--sem-partida-fria", action="store_true", help="Não medir a partida a frio dos motores")
+    parser.add_argument("--importacoes", nargs="*", metavar="MODULO",
+                        help="Só o relatório de importação (sem valor: os módulos de MODULOS_IMPORTACAO)")
+    parser.add_argument("--partida-fria", metavar="MOTOR", help=argparse.SUPPRESS)
+    parser.add_argument("--par", nargs=2, type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.partida_fria:
+        _partida_fria_filho(args.partida_fria, args.snapshot, *args.par)
+        return
+    if args.importacoes is not None:
+        imprimir_importacoes(medir_importacoes(args.importacoes or MODULOS_IMPORTACAO))
+        return
+
+    resultados = executar_benchmark(args.motores, args.consultas, args.seed, args.snapshot,
+                                    partida_fria=not args.sem_partida_fria, repeticoes=args.repeticoes)
+    imprimir_resumo(resultados)
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            json.dump(resultados, f, ensure_ascii=False, indent=2)
+        print(f"BENCHMARK.PY: Resultados salvos em {args.saida}.")
+
+    referencia = None
+    if args.referencia:
+        with open(args.referencia, encoding="utf-8") as f:
+            referencia = json.load(f)
+    regressoes = verificar_regressoes(resultados, referencia, args.tolerancia, args.tolerancia_latencia)
+    for regressao in regressoes:
+        print(f"BENCHMARK.PY: REGRESSÃO: {regressao}", file=sys.stderr)
+    if regressoes:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
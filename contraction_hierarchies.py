@@ -0,0 +1,519 @@
+# contraction_hierarchies.py
+import heapq
+import random
+import time
+
+import numpy as np
+
+from dijkstra import bidirectional_uniform_cost_search, uniform_cost_search
+from search_result import ResultadoBusca
+from spatial_index import resolver_pontos
+
+# Versão do formato do arquivo da hierarquia (incrementar se os arrays salvos mudarem)
+VERSAO_HIERARQUIA = 1
+
+# Limite de nós assentados em cada busca de testemunha durante a contração. Buscas truncadas
+# só geram atalhos a mais (nunca caminhos errados), então o limite troca qualidade por tempo.
+MAX_ASSENTADOS_TESTEMUNHA = 500
+
+
+def _busca_testemunha(saida, origem, ignorado, limite, max_assentados):
+    """
+    Dijkstra local a partir de `origem` no grafo restante, sem passar por `ignorado` (o nó
+    sendo contraído) e parando ao ultrapassar `limite` ou `max_assentados` nós.
+    """
+    dist = {origem: 0}
+    priority_queue = [(0, origem)]
+    assentados = 0
+    while priority_queue:
+        current_cost, current_node = heapq.heappop(priority_queue)
+        if current_cost > dist[current_node]:
+            continue
+        if current_cost > limite:
+            break
+        assentados += 1
+        if assentados > max_assentados:
+            break
+        for neighbor, (peso, _) in saida[current_node].items():
+            if neighbor == ignorado:
+                continue
+            new_cost = current_cost + peso
+            if new_cost < dist.get(neighbor, float('inf')):
+                dist[neighbor] = new_cost
+                heapq.heappush(priority_queue, (new_cost, neighbor))
+    return dist
+
+
+def _atalhos_necessarios(saida, entrada, v, max_assentados):
+    """Lista os atalhos (u, x, custo) necessários para contrair `v` preservando as distâncias."""
+    atalhos = []
+    for u, (peso_uv, _) in entrada[v].items():
+        pesos_saida = [peso for x, (peso, _) in saida[v].items() if x != u]
+        if not pesos_saida:
+            continue
+        dist = _busca_testemunha(saida, u, v, peso_uv + max(pesos_saida), max_assentados)
+        for x, (peso_vx, _) in saida[v].items():
+            if x == u:
+                continue
+            custo = peso_uv + peso_vx
+            if dist.get(x, float('inf')) > custo:
+                atalhos.append((u, x, custo))
+    return atalhos
+
+
+class HierarquiaContracao:
+    """
+    Hierarquia de Contração (Contraction Hierarchies) pronta para consultas.
+
+    Cada nó tem um nível (rank). O grafo "para cima" da frente guarda as arestas u->x com
+    rank[x] > rank[u]; o grafo "para cima" de trás guarda, para cada v, as arestas u->v com
+    rank[u] > rank[v]. Atalhos guardam o nó do meio (`meio`), usado para desempacotar o
+    caminho; arestas originais têm meio = -1.
+
+    `grafo` (opcional) é o GrafoCSR de origem, usado apenas para ajustar coordenadas a nós
+    em `contraction_hierarchy_search`.
+
+    Inscrita em uma `edge_overlay.SobreposicaoPesos` (ver `aresta_alterada`), a hierarquia não é
+    refeita: cada consulta é validada contra os pesos atuais e só as afetadas por uma alteração
+    são respondidas pela busca bidirecional sobre a sobreposição (contadas em `recorridas`).
+    """
+
+    def __init__(self, node_ids, rank, frente, tras, assinatura_grafo=None, grafo=None):
+        self.node_ids = node_ids
+        self.rank = rank
+        # frente e tras são tuplas (offsets, alvos, pesos, meio) em formato CSR
+        self.frente = frente
+        self.tras = tras
+        self.assinatura_grafo = assinatura_grafo
+        self.grafo = grafo
+        self.sobreposicao = None
+        self.recorridas = 0
+        self._mais_baratas = {}  # (u, v) -> peso atual, só as arestas mais baratas que no grafo base
+        self._distancias_base = {}  # (a, b) -> distância da hierarquia entre pontas de arestas mais baratas
+        self._memoryviews = None
+
+    @property
+    def num_nos(self):
+        return len(self.node_ids)
+
+    def indice(self, node_id):
+        """Retorna o índice denso do nó com ID OSM `node_id`, ou None se ele não existir."""
+        i = int(np.searchsorted(self.node_ids, node_id))
+        if i < len(self.node_ids) and self.node_ids[i] == node_id:
+            return i
+        return None
+
+    def _adjacencias(self):
+        if self._memoryviews is None:
+            self._memoryviews = (tuple(memoryview(a) for a in self.frente),
+                                 tuple(memoryview(a) for a in self.tras),
+                                 memoryview(self.rank), memoryview(self.node_ids))
+        return self._memoryviews
+
+    def aresta_alterada(self, grafo, u, v, peso_antigo, peso_novo):
+        """
+        Registra a alteração do peso da aresta u->v (índices densos) na sobreposição `grafo`.
+
+        Se todas as alterações só encarecem arestas (interdições, obras), as distâncias da
+        hierarquia são limites inferiores das atuais: um caminho da hierarquia cujo custo com os
+        pesos atuais não mudou continua ótimo. Arestas mais baratas que no grafo base ficam
+        registradas e são testadas em `valida_na_sobreposicao`.
+        """
+        self.sobreposicao = grafo
+        if peso_novo < grafo.peso_base(u, v):
+            self._mais_baratas[(u, v)] = peso_novo
+        else:
+            self._mais_baratas.pop((u, v), None)
+            if not self._mais_baratas:
+                self._distancias_base.clear()
+
+    def valida_na_sobreposicao(self, resultado):
+        """
+        True se o resultado de `consultar` (índices densos) continua ótimo com os pesos atuais da sobreposição.
+
+        O caminho precisa custar o mesmo com os pesos atuais e nenhuma aresta mais barata pode
+        abrir um atalho (ver `_atalho_pelas_mais_baratas`); só as consultas que falham recorrem à
+        busca bidirecional.
+        """
+        if resultado.path is None:
+            # Alterações não criam nem removem arestas finitas da base: o que era inalcançável continua.
+            return True
+        offsets, alvos, pesos, _ = self.sobreposicao.adjacencia()
+        custo = 0.0
+        for a, b in zip(resultado.path, resultado.path[1:]):
+            for i in range(offsets[a], offsets[a + 1]):
+                if alvos[i] == b:
+                    custo += pesos[i]
+                    break
+        if abs(custo - resultado.custo) > 1e-9 * max(1.0, resultado.custo):
+            return False
+        return not (self._mais_baratas and
+                    self._atalho_pelas_mais_baratas(resultado.path[0], resultado.path[-1], resultado.custo))
+
+    def _distancia_base(self, a, b):
+        chave = (a, b)
+        if chave not in self._distancias_base:
+            self._distancias_base[chave] = self.consultar(a, b).custo
+        return self._distancias_base[chave]
+
+    def _atalho_pelas_mais_baratas(self, inicio, objetivo, custo):
+        """
+        True se algum caminho de `inicio` a `objetivo` que use arestas mais baratas pode custar menos que `custo`.
+
+        Entre duas arestas mais baratas consecutivas de um caminho, o trecho só usa arestas com
+        peso igual ou maior que o da base e custa ao menos a distância da hierarquia. Um Dijkstra
+        sobre as arestas mais baratas dá então o menor custo possível de um caminho que as use:
+        d(s, u1) + w'(u1, v1) + d(v1, u2) + ... + d(vk, t). Com uma única aresta, o teste é
+        d(s, u) + w'(u, v) + d(v, t) < custo. As distâncias entre pontas de arestas mais baratas não
+        dependem da consulta e ficam guardadas.
+        """
+        limite = custo - 1e-9 * max(1.0, custo)
+        baratas = list(self._mais_baratas.items())
+        chegada = [self.consultar(inicio, u).custo + peso for (u, _), peso in baratas]
+        fila = [(c, j) for j, c in enumerate(chegada) if c < limite]
+        heapq.heapify(fila)
+        expandidas = set()
+        while fila:
+            c, i = heapq.heappop(fila)
+            if i in expandidas or c > chegada[i]:
+                continue
+            expandidas.add(i)
+            v = baratas[i][0][1]
+            if c + self.consultar(v, objetivo).custo < limite:
+                return True
+            for j, ((u, _), peso) in enumerate(baratas):
+                if j in expandidas:
+                    continue
+                novo = c + self._distancia_base(v, u) + peso
+                if novo < chegada[j] and novo < limite:
+                    chegada[j] = novo
+                    heapq.heappush(fila, (novo, j))
+        return False
+
+    def _meio(self, a, b):
+        """Nó do meio da aresta a->b da hierarquia (-1 se for uma aresta original)."""
+        frente, tras, rank, _ = self._adjacencias()
+        if rank[a] < rank[b]:
+            offsets, alvos, _, meio = frente
+            u, alvo = a, b
+        else:
+            offsets, alvos, _, meio = tras
+            u, alvo = b, a
+        for i in range(offsets[u], offsets[u + 1]):
+            if alvos[i] == alvo:
+                return meio[i]
+        raise KeyError(f"Aresta {a}->{b} não encontrada na hierarquia")
+
+    def _desempacotar(self, a, b):
+        """Expande recursivamente a aresta a->b (possivelmente um atalho) nos nós originais após `a`."""
+        resultado = []
+        pilha = [(a, b)]
+        while pilha:
+            u, v = pilha.pop()
+            meio = self._meio(u, v)
+            if meio == -1:
+                resultado.append(v)
+            else:
+                pilha.append((meio, v))
+                pilha.append((u, meio))
+        return resultado
+
+    def consultar(self, inicio, objetivo):
+        """
+        Consulta bidirecional "para cima" entre índices densos.
+
+        Returns:
+            ResultadoBusca: Caminho em índices densos (ou None), custo e contadores.
+        """
+        resultado = ResultadoBusca(algoritmo="ch")
+        if inicio == objetivo:
+            resultado.path, resultado.custo = [inicio], 0
+            return resultado
+
+        frente, tras, _, _ = self._adjacencias()
+        grafos = (frente, tras)
+        dist = ({inicio: 0}, {objetivo: 0})
+        came_from = ({inicio: -1}, {objetivo: -1})
+        filas = ([(0, inicio)], [(0, objetivo)])
+        melhor_custo = float('inf')
+        no_encontro = -1
+        nos_assentados = relaxamentos = entradas_obsoletas = pico_fronteira = 0
+        insercoes_fila = 2
+
+        while filas[0] or filas[1]:
+            if len(filas[0]) + len(filas[1]) > pico_fronteira:
+                pico_fronteira = len(filas[0]) + len(filas[1])
+            if filas[0] and (not filas[1] or filas[0][0][0] <= filas[1][0][0]):
+                lado = 0
+            else:
+                lado = 1
+            current_cost, current_node = heapq.heappop(filas[lado])
+            if current_cost >= melhor_custo:
+                # Nada nesta direção pode melhorar o caminho: encerra a fronteira.
+                filas[lado].clear()
+                continue
+            dist_lado, dist_outro = dist[lado], dist[1 - lado]
+            if current_cost > dist_lado[current_node]:
+                entradas_obsoletas += 1
+                continue
+            if current_node in dist_outro and current_cost + dist_outro[current_node] < melhor_custo:
+                melhor_custo = current_cost + dist_outro[current_node]
+                no_encontro = current_node
+
+            # Stall-on-demand: se um vizinho de nível mais alto já alcança este nó por um caminho
+            # mais curto (pela aresta no sentido oposto), o nó não está em um caminho ótimo.
+            offsets, alvos, pesos, _ = grafos[1 - lado]
+            parar = False
+            for i in range(offsets[current_node], offsets[current_node + 1]):
+                if dist_lado.get(alvos[i], float('inf')) + pesos[i] < current_cost:
+                    parar = True
+                    break
+            if parar:
+                continue
+
+            nos_assentados += 1
+            offsets, alvos, pesos, _ = grafos[lado]
+            relaxamentos += offsets[current_node + 1] - offsets[current_node]
+            for i in range(offsets[current_node], offsets[current_node + 1]):
+                neighbor = alvos[i]
+                new_cost = current_cost + pesos[i]
+                if new_cost < dist_lado.get(neighbor, float('inf')):
+                    dist_lado[neighbor] = new_cost
+                    came_from[lado][neighbor] = current_node
+                    heapq.heappush(filas[lado], (new_cost, neighbor))
+                    insercoes_fila += 1
+
+        resultado.nos_assentados = nos_assentados
+        resultado.relaxamentos = relaxamentos
+        resultado.insercoes_fila = insercoes_fila
+        resultado.entradas_obsoletas = entradas_obsoletas
+        resultado.pico_fronteira = pico_fronteira
+        if no_encontro == -1:
+            return resultado
+
+        # Caminho na hierarquia: inicio -> ... -> encontro -> ... -> objetivo
+        caminho_hierarquia = []
+        node_iter = no_encontro
+        while node_iter != -1:
+            caminho_hierarquia.append(node_iter)
+            node_iter = came_from[0][node_iter]
+        caminho_hierarquia.reverse()
+        node_iter = came_from[1][no_encontro]
+        while node_iter != -1:
+            caminho_hierarquia.append(node_iter)
+            node_iter = came_from[1][node_iter]
+
+        path = [inicio]
+        for a, b in zip(caminho_hierarquia, caminho_hierarquia[1:]):
+            path.extend(self._desempacotar(a, b))
+        resultado.path, resultado.custo = path, melhor_custo
+        return resultado
+
+
+def contraction_hierarchy_search(hierarquia, start_node_id, goal_node_id):
+    """
+    Busca o caminho mais curto usando a Hierarquia de Contração.
+
+    Args:
+        hierarquia (HierarquiaContracao): A hierarquia pré-processada.
+        start_node_id (int | tuple): O ID do nó de início, ou coordenadas (lat, lon), ajustadas ao
+            nó mais próximo (ver spatial_index).
+        goal_node_id (int | tuple): O ID do nó de destino, ou coordenadas (lat, lon).
+
+    Returns:
+        ResultadoBusca: O caminho (lista de IDs de nós, no mesmo formato de `uniform_cost_search`,
+                        ou None), o custo e os contadores da busca. Se a hierarquia estiver inscrita
+                        em uma sobreposição de pesos e a consulta for afetada por ela, é o resultado
+                        de `bidirectional_uniform_cost_search` sobre a sobreposição.
+    """
+    start_node_id, goal_node_id = resolver_pontos(hierarquia.grafo, start_node_id, goal_node_id)
+    inicio, objetivo = hierarquia.indice(start_node_id), hierarquia.indice(goal_node_id)
+    if inicio is None or objetivo is None:
+        return ResultadoBusca(algoritmo="ch")
+    resultado = hierarquia.consultar(inicio, objetivo)
+    if hierarquia.sobreposicao is not None and not hierarquia.valida_na_sobreposicao(resultado):
+        hierarquia.recorridas += 1
+        return bidirectional_uniform_cost_search(hierarquia.sobreposicao, start_node_id, goal_node_id)
+    if resultado.path is not None:
+        node_ids = hierarquia._adjacencias()[3]
+        resultado.path = [node_ids[i] for i in resultado.path]
+    return resultado
+
+
+def _para_csr(listas, num_nos):
+    """Converte listas de (alvo, peso, meio) por nó para arrays CSR (offsets, alvos, pesos, meio)."""
+    offsets = np.zeros(num_nos + 1, dtype=np.int64)
+    np.cumsum([len(lista) for lista in listas], out=offsets[1:])
+    alvos = np.fromiter((x for lista in listas for x, _, _ in lista), dtype=np.int32, count=offsets[-1])
+    pesos = np.fromiter((w for lista in listas for _, w, _ in lista), dtype=np.float64, count=offsets[-1])
+    meio = np.fromiter((m for lista in listas for _, _, m in lista), dtype=np.int32, count=offsets[-1])
+    return offsets, alvos, pesos, meio
+
+
+def preprocessar_hierarquia(grafo, max_assentados=MAX_ASSENTADOS_TESTEMUNHA):
+    """
+    Constrói a Hierarquia de Contração do grafo compilado.
+
+    Os nós são contraídos em ordem crescente de prioridade, com atualização preguiçosa:
+    prioridade = (atalhos criados - arestas removidas) + vizinhos já contraídos.
+    Ao contrair v, cada par u->v->x que não tenha um caminho testemunha de custo menor ou
+    igual (sem passar por v) vira um atalho u->x.
+
+    Args:
+        grafo (GrafoCSR): O grafo compilado.
+        max_assentados (int): Limite de nós assentados por busca de testemunha.
+
+    Returns:
+        HierarquiaContracao: A hierarquia pronta para consultas.
+    """
+    n = grafo.num_nos
+    offsets, alvos, pesos, _ = grafo.adjacencia()
+
+    # Grafo restante (nós ainda não contraídos): saida[u][x] = (peso, meio)
+    saida = [dict() for _ in range(n)]
+    entrada = [dict() for _ in range(n)]
+    for u in range(n):
+        for i in range(offsets[u], offsets[u + 1]):
+            x = alvos[i]
+            saida[u][x] = (pesos[i], -1)
+            entrada[x][u] = (pesos[i], -1)
+
+    vizinhos_contraidos = [0] * n
+
+    def prioridade(v):
+        atalhos = _atalhos_necessarios(saida, entrada, v, max_assentados)
+        return len(atalhos) - len(saida[v]) - len(entrada[v]) + vizinhos_contraidos[v], atalhos
+
+    print(f"CH.PY: Calculando prioridades iniciais de {n} nós...")
+    inicio_tempo = time.perf_counter()
+    fila = [(prioridade(v)[0], v) for v in range(n)]
+    heapq.heapify(fila)
+
+    rank = np.zeros(n, dtype=np.int32)
+    frente = [None] * n
+    tras = [None] * n
+    nivel = 0
+    total_atalhos = 0
+    proximo_aviso = n // 10
+
+    while fila:
+        _, v = heapq.heappop(fila)
+        p, atalhos = prioridade(v)
+        # Atualização preguiçosa: se a prioridade piorou além do próximo da fila, reinserir.
+        if fila and p > fila[0][0]:
+            heapq.heappush(fila, (p, v))
+            continue
+
+        rank[v] = nivel
+        nivel += 1
+        frente[v] = [(x, peso, meio) for x, (peso, meio) in saida[v].items()]
+        tras[v] = [(u, peso, meio) for u, (peso, meio) in entrada[v].items()]
+
+        for u, x, custo in atalhos:
+            if custo < saida[u].get(x, (float('inf'), -1))[0]:
+                saida[u][x] = (custo, v)
+                entrada[x][u] = (custo, v)
+                total_atalhos += 1
+        for u in entrada[v]:
+            del saida[u][v]
+            vizinhos_contraidos[u] += 1
+        for x in saida[v]:
+            del entrada[x][v]
+            vizinhos_contraidos[x] += 1
+        saida[v] = entrada[v] = None
+
+        if nivel >= proximo_aviso and proximo_aviso > 0:
+            print(f"CH.PY: {nivel}/{n} nós contraídos, {total_atalhos} atalhos "
+                  f"({time.perf_counter() - inicio_tempo:.1f} s)")
+            proximo_aviso += n // 10
+
+    print(f"CH.PY: Hierarquia construída com {total_atalhos} atalhos em {time.perf_counter() - inicio_tempo:.1f} s.")
+    return HierarquiaContracao(np.asarray(grafo.node_ids), rank,
+                               _para_csr(frente, n), _para_csr(tras, n),
+                               assinatura_grafo=grafo.assinatura(), grafo=grafo)
+
+
+def salvar_hierarquia(hierarquia, caminho_arquivo):
+    """Salva a hierarquia em um único arquivo .npz."""
+    arrays = {"node_ids": hierarquia.node_ids, "rank": hierarquia.rank,
+              "versao": np.array(VERSAO_HIERARQUIA),
+              "assinatura_grafo": np.array(hierarquia.assinatura_grafo or "")}
+    for prefixo, csr in (("frente", hierarquia.frente), ("tras", hierarquia.tras)):
+        for nome, array in zip(("offsets", "alvos", "pesos", "meio"), csr):
+            arrays[f"{prefixo}_{nome}"] = array
+    with open(caminho_arquivo, "wb") as f:
+        np.savez(f, **arrays)
+
+
+def carregar_hierarquia(caminho_arquivo, grafo=None):
+    """
+    Carrega uma hierarquia salva por `salvar_hierarquia`.
+
+    Args:
+        caminho_arquivo (str): Arquivo .npz da hierarquia.
+        grafo (GrafoCSR): Se informado, a hierarquia só é aceita se tiver sido construída para ele.
+
+    Returns:
+        HierarquiaContracao: A hierarquia, ou None se o arquivo não existir, for de outra versão
+                             ou não corresponder ao grafo.
+    """
+    try:
+        with np.load(caminho_arquivo) as dados:
+            if int(dados["versao"]) != VERSAO_HIERARQUIA:
+                return None
+            assinatura = str(dados["assinatura_grafo"])
+            if grafo is not None and assinatura != grafo.assinatura():
+                print(f"CH.PY: Hierarquia em {caminho_arquivo} não corresponde ao grafo atual.")
+                return None
+            frente = tuple(dados[f"frente_{nome}"] for nome in ("offsets", "alvos", "pesos", "meio"))
+            tras = tuple(dados[f"tras_{nome}"] for nome in ("offsets", "alvos", "pesos", "meio"))
+            return HierarquiaContracao(dados["node_ids"], dados["rank"], frente, tras, assinatura, grafo=grafo)
+    except FileNotFoundError:
+        return None
+
+
+def verificar_hierarquia(grafo, hierarquia, num_pares=100, seed=42, tolerancia=1e-6):
+    """
+    Modo de verificação: compara o custo das rotas da hierarquia com o de `uniform_cost_search`
+    em pares aleatórios de nós, sorteados com a mesma semente usada em main.py.
+
+    Returns:
+        int: O número de pares com custos divergentes (0 se a hierarquia estiver correta).
+    """
+    rng = random.Random(seed)
+    node_ids = grafo.node_ids.tolist()
+    divergencias = 0
+    for _ in range(num_pares):
+        start_node_id, goal_node_id = rng.choice(node_ids), rng.choice(node_ids)
+        path_ucs = uniform_cost_search(grafo, start_node_id, goal_node_id).path
+        path_ch = contraction_hierarchy_search(hierarquia, start_node_id, goal_node_id).path
+        custo_ucs = grafo.custo_caminho(path_ucs) if path_ucs else float('inf')
+        custo_ch = grafo.custo_caminho(path_ch) if path_ch else float('inf')
+        if path_ch and (path_ch[0] != start_node_id or path_ch[-1] != goal_node_id):
+            custo_ch = float('inf')
+        if custo_ucs != custo_ch and abs(custo_ucs - custo_ch) > tolerancia:
+            divergencias += 1
+            print(f"CH.PY: Divergência de {start_node_id} para {goal_node_id}: UCS {custo_ucs} x CH {custo_ch}")
+    print(f"CH.PY: Verificação concluída: {num_pares - divergencias}/{num_pares} pares com custo idêntico.")
+    return divergencias
+
+
+if __name__ == "__main__":
+    import os
+    import sys
+    from snapshot import carregar_grafo_preparado, SNAPSHOT_DIRPATH
+
+    grafo_principal, _ = carregar_grafo_preparado()
+    if grafo_principal is None:
+        print("CH.PY: Falha ao carregar o grafo.")
+        sys.exit(1)
+
+    arquivo_hierarquia = os.path.join(SNAPSHOT_DIRPATH, "hierarquia.npz")
+    hierarquia_principal = carregar_hierarquia(arquivo_hierarquia, grafo_principal)
+    if hierarquia_principal is None:
+        hierarquia_principal = preprocessar_hierarquia(grafo_principal)
+        salvar_hierarquia(hierarquia_principal, arquivo_hierarquia)
+        print(f"CH.PY: Hierarquia salva em {arquivo_hierarquia}.")
+
+    if "--verificar" in sys.argv:
+        sys.exit(1 if verificar_hierarquia(grafo_principal, hierarquia_principal) else 0)
@@ -0,0 +1,171 @@
+# csr_graph.py
+import hashlib
+
+import numpy as np
+
+class GrafoCSR:
+    """
+    Representação compacta (CSR - Compressed Sparse Row) do grafo de caminhada.
+
+    Os nós do osmnx são mapeados para índices densos (0..n-1) em ordem crescente de ID OSM,
+    de forma que o desempate na fila de prioridade (custo, índice) seja o mesmo que
+    (custo, id_osm) nas buscas originais sobre o MultiDiGraph.
+
+    Atributos:
+        node_ids (numpy.ndarray[int64]): IDs OSM ordenados; node_ids[i] é o ID do nó de índice i.
+        offsets (numpy.ndarray[int64]): As arestas de saída do nó i ficam em [offsets[i], offsets[i+1]).
+        alvos (numpy.ndarray[int32]): Índice do nó de destino de cada aresta.
+        pesos (numpy.ndarray[float64]): Menor 'length' entre as arestas paralelas (u, v).
+        x, y (numpy.ndarray[float64]): Longitude e latitude de cada nó (NaN se ausentes).
+        bus_stops (dict): Atributo 'bus_stop' dos nós que são pontos de ônibus ({id_osm: info}).
+        diretorio (str): Diretório do snapshot de onde o grafo foi carregado (None se compilado em memória).
+    """
+
+    def __init__(self, node_ids, offsets, alvos, pesos, x, y, bus_stops=None):
+        self.node_ids = node_ids
+        self.offsets = offsets
+        self.alvos = alvos
+        self.pesos = pesos
+        self.x = x
+        self.y = y
+        self.bus_stops = bus_stops if bus_stops is not None else {}
+        self.diretorio = None
+        self._memoryviews = None
+        self._reverso = None
+        self._indice_espacial = None  # ver spatial_index.indice_espacial_de
+
+    @property
+    def num_nos(self):
+        return len(self.node_ids)
+
+    @property
+    def num_arestas(self):
+        return len(self.alvos)
+
+    def __len__(self):
+        return self.num_nos
+
+    def __contains__(self, node_id):
+        return self.indice(node_id) is not None
+
+    def indice(self, node_id):
+        """Retorna o índice denso do nó com ID OSM `node_id`, ou None se ele não existir."""
+        i = int(np.searchsorted(self.node_ids, node_id))
+        if i < len(self.node_ids) and self.node_ids[i] == node_id:
+            return i
+        return None
+
+    def ids_osm(self, indices):
+        """Converte uma sequência de índices densos para uma lista de IDs OSM (int)."""
+        node_ids = self.adjacencia()[3]
+        return [node_ids[i] for i in indices]
+
+    def adjacencia(self):
+        """
+        Retorna (offsets, alvos, pesos, node_ids) como memoryviews.
+
+        Indexar um memoryview devolve int/float do Python diretamente, o que é bem mais
+        rápido que indexar arrays NumPy elemento a elemento no laço das buscas, e não copia
+        os dados (funciona também com arrays mapeados em memória).
+        """
+        if self._memoryviews is None:
+            self._memoryviews = (memoryview(self.offsets), memoryview(self.alvos),
+                                 memoryview(self.pesos), memoryview(self.node_ids))
+        return self._memoryviews
+
+    def custo_caminho(self, path):
+        """
+        Soma os pesos (menor 'length' entre as arestas paralelas) de um caminho dado em IDs OSM.
+        Retorna inf se alguma aresta do caminho não existir.
+        """
+        if not path or len(path) < 2:
+            return 0
+        offsets, alvos, pesos, _ = self.adjacencia()
+        indices = [self.indice(node_id) for node_id in path]
+        cost = 0
+        for u, v in zip(indices, indices[1:]):
+            if u is None or v is None:
+                return float('inf')
+            for i in range(offsets[u], offsets[u + 1]):
+                if alvos[i] == v:
+                    cost += pesos[i]
+                    break
+            else:
+                return float('inf')
+        return cost
+
+    def coordenadas(self):
+        """Retorna (x, y) como memoryviews (longitude, latitude)."""
+        return memoryview(self.x), memoryview(self.y)
+
+    def reverso(self):
+        """
+        Retorna o grafo reverso (cada aresta u->v vira v->u, com o mesmo peso), compartilhando
+        node_ids e coordenadas. É usado pelas buscas que partem do destino. O resultado é guardado.
+        """
+        if self._reverso is None:
+            origens = np.repeat(np.arange(self.num_nos, dtype=np.int32), np.diff(self.offsets))
+            ordem = np.argsort(self.alvos, kind='stable')
+            offsets = np.zeros(self.num_nos + 1, dtype=np.int64)
+            np.cumsum(np.bincount(self.alvos, minlength=self.num_nos), out=offsets[1:])
+            self._reverso = GrafoCSR(self.node_ids, offsets, origens[ordem],
+                                     np.ascontiguousarray(self.pesos[ordem]), self.x, self.y,
+                                     bus_stops=self.bus_stops)
+            self._reverso._reverso = self
+        return self._reverso
+
+    def assinatura(self):
+        """Hash da topologia e dos pesos, usado para saber se estruturas pré-calculadas ainda valem."""
+        sha = hashlib.sha1()
+        for array in (self.node_ids, self.offsets, self.alvos, self.pesos):
+            sha.update(np.ascontiguousarray(array).data)
+        return sha.hexdigest()
+
+    def nbytes(self):
+        """Memória ocupada pelos arrays do grafo, em bytes."""
+        return sum(a.nbytes for a in (self.node_ids, self.offsets, self.alvos, self.pesos, self.x, self.y))
+
+
+def compilar_grafo(graph):
+    """
+    Compila o MultiDiGraph do osmnx (como retornado por `carregar_e_preparar_grafo`) em um GrafoCSR.
+
+    Para cada par (u, v) guarda-se apenas o menor 'length' entre as arestas paralelas, que é
+    exatamente o custo usado por `uniform_cost_search` e `a_star_search`. Arestas sem 'length'
+    são descartadas, assim como laços (u, u), que nunca melhoram um caminho.
+    Os atributos 'bus_stop' adicionados por `carregar_e_preparar_grafo` são preservados.
+    A ordem dos vizinhos de cada nó é a mesma de `graph.neighbors(u)`.
+
+    Args:
+        graph (networkx.MultiDiGraph): O grafo do osmnx.
+
+    Returns:
+        GrafoCSR: O grafo compilado.
+    """
+    node_ids = np.array(sorted(graph.nodes()), dtype=np.int64)
+    indice_de = {node_id: i for i, node_id in enumerate(node_ids.tolist())}
+
+    offsets = np.zeros(len(node_ids) + 1, dtype=np.int64)
+    alvos = []
+    pesos = []
+    for i, u in enumerate(node_ids.tolist()):
+        for v, arestas_paralelas in graph.adj[u].items():
+            if v == u:
+                continue
+            min_edge_length = float('inf')
+            for edge_data in arestas_paralelas.values():
+                min_edge_length = min(min_edge_length, edge_data.get('length', float('inf')))
+            if min_edge_length == float('inf'):
+                continue
+            alvos.append(indice_de[v])
+            pesos.append(min_edge_length)
+        offsets[i + 1] = len(alvos)
+
+    nodes = graph.nodes
+    x = np.array([nodes[u].get('x', np.nan) for u in node_ids.tolist()], dtype=np.float64)
+    y = np.array([nodes[u].get('y', np.nan) for u in node_ids.tolist()], dtype=np.float64)
+    bus_stops = {u: dict(data['bus_stop']) for u, data in graph.nodes(data=True) if 'bus_stop' in data}
+
+    return GrafoCSR(node_ids, offsets,
+                    np.array(alvos, dtype=np.int32), np.array(pesos, dtype=np.float64),
+                    x, y, bus_stops=bus_stops)
@@ -1,19 +1,37 @@
 # ucs.py
 import heapq # Para a fila de prioridade
 
-def uniform_cost_search(graph, start_node_id, goal_node_id):
+import numpy as np
+
+from csr_graph import GrafoCSR
+from search_result import ResultadoBusca, relogio
+from spatial_index import indice_espacial_de, resolver_pontos
+
+def uniform_cost_search(graph, start_node_id, goal_node_id, temporizador=None):
     """
     Implementa o algoritmo de Busca de Custo Uniforme (UCS).
 
     Args:
-        graph (networkx.MultiDiGraph): O grafo do osmnx.
-        start_node_id (int): O ID do nó de início.
-        goal_node_id (int): O ID do nó de destino.
+        graph (networkx.MultiDiGraph | GrafoCSR): O grafo do osmnx, ou sua versão compilada
+            por `csr_graph.compilar_grafo` (bem mais rápida para várias consultas). Uma
+            `edge_overlay.SobreposicaoPesos` também serve: arestas bloqueadas nunca são usadas.
+        start_node_id (int | tuple): O ID do nó de início, ou coordenadas (lat, lon), ajustadas ao
+            nó mais próximo (ver spatial_index).
+        goal_node_id (int | tuple): O ID do nó de destino, ou coordenadas (lat, lon).
+        temporizador (callable): Opcional. Chamado como temporizador(fase, segundos) ao fim das
+            fases "preparacao", "busca" e "reconstrucao" (ver search_result.MedidorFases).
 
     Returns:
-        list: Uma lista de IDs de nós representando o caminho mais curto da origem ao destino.
-              Retorna None se nenhum caminho for encontrado.
+        ResultadoBusca: O caminho (lista de IDs de nós da origem ao destino, ou None se nenhum
+                        caminho for encontrado), o custo e os contadores da busca.
     """
+    start_node_id, goal_node_id = resolver_pontos(graph, start_node_id, goal_node_id)
+    if isinstance(graph, GrafoCSR):
+        return _uniform_cost_search_csr(graph, start_node_id, goal_node_id, temporizador)
+
+    if temporizador is not None:
+        inicio_fase = relogio()
+
     # Fila de prioridade armazena tuplas: (custo_acumulado, id_do_no_atual, caminho_ate_agora)
     # Ou, de forma mais eficiente para reconstrução: (custo_acumulado, id_do_no_atual)
     # e um dicionário 'veio_de' para reconstruir o caminho.
@@ -27,39 +45,39 @@ def uniform_cost_search(graph, start_node_id, goal_node_id):
     # Dicionário para armazenar o custo (g_score) para alcançar cada nó a partir do início
     cost_so_far = {start_node_id: 0}
 
-    print(f"UCS: Iniciando busca de {start_node_id} para {goal_node_id}")
+    resultado = ResultadoBusca(algoritmo="ucs", insercoes_fila=1)
+    nos_assentados = relaxamentos = entradas_obsoletas = pico_fronteira = 0
+    encontrado = False
+
+    if temporizador is not None:
+        temporizador("preparacao", relogio() - inicio_fase)
+        inicio_fase = relogio()
 
     while priority_queue:
+        if len(priority_queue) > pico_fronteira:
+            pico_fronteira = len(priority_queue)
         current_cost, current_node = heapq.heappop(priority_queue)
 
-        # Log para depuração (pode ser removido ou ajustado)
-        # print(f"UCS: Visitando {current_node} com custo {current_cost}")
-
         if current_node == goal_node_id:
-            print(f"UCS: Destino {goal_node_id} alcançado com custo {current_cost}!")
-            # Reconstruir o caminho
-            path = []
-            node_iter = goal_node_id
-            while node_iter is not None:
-                path.append(node_iter)
-                node_iter = came_from[node_iter]
-            return path[::-1] # Retorna o caminho revertido (origem -> destino)
+            encontrado = True
+            break
 
         # Se já encontramos um caminho mais curto para este nó (devido a como heapq funciona), pulamos.
         # Isso é mais relevante se um nó puder ser adicionado múltiplas vezes à fila com custos diferentes.
         # A verificação `new_cost < cost_so_far.get(neighbor, float('inf'))` abaixo geralmente lida com isso.
         if current_cost > cost_so_far.get(current_node, float('inf')): # Adicionado .get para segurança
+            entradas_obsoletas += 1
             continue
 
         # Explorar vizinhos
         if not graph.has_node(current_node):
-            # print(f"UCS: Atenção - Nó {current_node} não encontrado no grafo ao tentar obter vizinhos.")
             continue
+        nos_assentados += 1
             
         for neighbor in graph.neighbors(current_node):
             if not graph.has_node(neighbor): # Verificação extra
-                # print(f"UCS: Atenção - Vizinho {neighbor} de {current_node} não é um nó válido.")
                 continue
+            relaxamentos += 1
 
             # Calcular o custo para ir de current_node para neighbor
             # Em um MultiDiGraph, pode haver múltiplas arestas. Pegamos a de menor 'length'.
@@ -77,7 +95,432 @@ def uniform_cost_search(graph, start_node_id, goal_node_id):
             if new_cost < cost_so_far.get(neighbor, float('inf')): # Usar .get para segurança
                 cost_so_far[neighbor] = new_cost
                 heapq.heappush(priority_queue, (new_cost, neighbor))
+                resultado.insercoes_fila += 1
                 came_from[neighbor] = current_node
-                
-    print(f"UCS: Nenhum caminho encontrado de {start_node_id} para {goal_node_id}")
-    return None # Caminho não encontrado
\ No newline at end of file
+
+    if temporizador is not None:
+        temporizador("busca", relogio() - inicio_fase)
+        inicio_fase = relogio()
+
+    resultado.nos_assentados = nos_assentados
+    resultado.relaxamentos = relaxamentos
+    resultado.entradas_obsoletas = entradas_obsoletas
+    resultado.pico_fronteira = pico_fronteira
+
+    if encontrado:
+        # Reconstruir o caminho
+        path = []
+        node_iter = goal_node_id
+        while node_iter is not None:
+            path.append(node_iter)
+            node_iter = came_from[node_iter]
+        resultado.path = path[::-1] # Caminho revertido (origem -> destino)
+        resultado.custo = current_cost
+
+    if temporizador is not None:
+        temporizador("reconstrucao", relogio() - inicio_fase)
+    return resultado
+
+
+def arvore_limitada(grafo, origens, limite=float('inf')):
+    """
+    Laço do Dijkstra (o mesmo heap de `uniform_cost_search`) a partir de um ou mais nós, sem
+    destino, parando quando o menor custo da fila passa de `limite`. Nós mais caros que o limite
+    nem entram na fila, então a busca só toca a região alcançável dentro do orçamento.
+
+    Args:
+        grafo (GrafoCSR): O grafo compilado.
+        origens (iterable): Índices densos dos nós de origem (todos com custo inicial 0).
+        limite (float): Custo máximo (m); inf para explorar tudo o que for alcançável.
+
+    Returns:
+        tuple: (dict, dict) com {índice: custo} dos nós assentados (em ordem de custo) e
+               {índice: predecessor} (-1 nas origens).
+    """
+    offsets, alvos, pesos, _ = grafo.adjacencia()
+
+    cost_so_far = {}
+    came_from = {}
+    assentados = {}
+    priority_queue = []
+    for origem in origens:
+        cost_so_far[origem] = 0
+        came_from[origem] = -1
+        priority_queue.append((0, origem))
+    heapq.heapify(priority_queue)
+
+    while priority_queue:
+        current_cost, current_node = heapq.heappop(priority_queue)
+        if current_node in assentados:
+            continue
+        assentados[current_node] = current_cost
+        for i in range(offsets[current_node], offsets[current_node + 1]):
+            neighbor = alvos[i]
+            new_cost = current_cost + pesos[i]
+            if new_cost <= limite and new_cost < cost_so_far.get(neighbor, float('inf')):
+                cost_so_far[neighbor] = new_cost
+                came_from[neighbor] = current_node
+                heapq.heappush(priority_queue, (new_cost, neighbor))
+
+    return assentados, came_from
+
+
+def distancias_a_partir_de(grafo, origens, limite=float('inf')):
+    """
+    Dijkstra completo (sem destino) sobre um GrafoCSR, a partir de um ou mais nós de origem.
+
+    Args:
+        grafo (GrafoCSR): O grafo compilado (use `grafo.reverso()` para obter distâncias *até* as origens).
+        origens (iterable): Índices densos dos nós de origem (todos com custo inicial 0).
+        limite (float): Custo máximo; nós além dele ficam como inalcançáveis (ver `arvore_limitada`).
+
+    Returns:
+        tuple: (numpy.ndarray[float64], numpy.ndarray[int32]) com a distância de cada nó à origem
+               mais próxima (inf se inalcançável) e o predecessor de cada nó na árvore (-1 se não houver).
+    """
+    dist = np.full(grafo.num_nos, np.inf)
+    pai = np.full(grafo.num_nos, -1, dtype=np.int32)
+    cost_so_far, came_from = arvore_limitada(grafo, origens, limite)
+
+    if cost_so_far:
+        nos = np.fromiter(cost_so_far.keys(), dtype=np.int64, count=len(cost_so_far))
+        dist[nos] = np.fromiter(cost_so_far.values(), dtype=np.float64, count=len(cost_so_far))
+        pai[nos] = np.fromiter((came_from[n] for n in cost_so_far), dtype=np.int32, count=len(cost_so_far))
+    return dist, pai
+
+
+def _uniform_cost_search_csr(grafo, start_node_id, goal_node_id, temporizador=None):
+    """
+    Mesma busca de `uniform_cost_search`, mas sobre os arrays CSR de um GrafoCSR.
+    Trabalha com índices densos internamente e converte o caminho de volta para IDs OSM.
+    """
+    if temporizador is not None:
+        inicio_fase = relogio()
+
+    resultado = ResultadoBusca(algoritmo="ucs")
+    inicio = grafo.indice(start_node_id)
+    objetivo = grafo.indice(goal_node_id)
+    if inicio is None or objetivo is None:
+        return resultado
+
+    offsets, alvos, pesos, _ = grafo.adjacencia()
+
+    # Mesmo desempate da versão original: índices seguem a ordem crescente dos IDs OSM.
+    priority_queue = [(0, inicio)]
+    came_from = {inicio: -1}
+    cost_so_far = {inicio: 0}
+    nos_assentados = relaxamentos = entradas_obsoletas = pico_fronteira = 0
+    insercoes_fila = 1
+    encontrado = False
+
+    if temporizador is not None:
+        temporizador("preparacao", relogio() - inicio_fase)
+        inicio_fase = relogio()
+
+    while priority_queue:
+        if len(priority_queue) > pico_fronteira:
+            pico_fronteira = len(priority_queue)
+        current_cost, current_node = heapq.heappop(priority_queue)
+
+        if current_node == objetivo:
+            encontrado = True
+            break
+
+        if current_cost > cost_so_far[current_node]:
+            entradas_obsoletas += 1
+            continue
+
+        nos_assentados += 1
+        primeira, ultima = offsets[current_node], offsets[current_node + 1]
+        relaxamentos += ultima - primeira
+        for i in range(primeira, ultima):
+            neighbor = alvos[i]
+            new_cost = current_cost + pesos[i]
+            if new_cost < cost_so_far.get(neighbor, float('inf')):
+                cost_so_far[neighbor] = new_cost
+                heapq.heappush(priority_queue, (new_cost, neighbor))
+                insercoes_fila += 1
+                came_from[neighbor] = current_node
+
+    if temporizador is not None:
+        temporizador("busca", relogio() - inicio_fase)
+        inicio_fase = relogio()
+
+    resultado.nos_assentados = nos_assentados
+    resultado.relaxamentos = relaxamentos
+    resultado.insercoes_fila = insercoes_fila
+    resultado.entradas_obsoletas = entradas_obsoletas
+    resultado.pico_fronteira = pico_fronteira
+
+    if encontrado:
+        path = []
+        node_iter = objetivo
+        while node_iter != -1:
+            path.append(node_iter)
+            node_iter = came_from[node_iter]
+        resultado.path = grafo.ids_osm(path[::-1])
+        resultado.custo = current_cost
+
+    if temporizador is not None:
+        temporizador("reconstrucao", relogio() - inicio_fase)
+    return resultado
+
+
+def _vizinhos_csr(grafo):
+    """Retorna vizinhos(u) -> iterável de (v, peso) sobre os índices densos de um GrafoCSR."""
+    offsets, alvos, pesos, _ = grafo.adjacencia()
+    return lambda u: zip(alvos[offsets[u]:offsets[u + 1]], pesos[offsets[u]:offsets[u + 1]])
+
+
+def _vizinhos_networkx(adjacencia):
+    """
+    Retorna vizinhos(u) -> lista de (v, peso) sobre `graph.succ` ou `graph.pred` de um MultiDiGraph,
+    usando o menor 'length' entre as arestas paralelas, como em `uniform_cost_search`.
+    """
+    def vizinhos(u):
+        resultado = []
+        for v, arestas_paralelas in adjacencia[u].items():
+            min_edge_length = float('inf')
+            for edge_data in arestas_paralelas.values():
+                min_edge_length = min(min_edge_length, edge_data.get('length', float('inf')))
+            if min_edge_length != float('inf'):
+                resultado.append((v, min_edge_length))
+        return resultado
+    return vizinhos
+
+
+def _busca_bidirecional(vizinhos_frente, vizinhos_tras, inicio, objetivo, potencial=None,
+                        algoritmo="ucs-bi", temporizador=None):
+    """
+    Núcleo das buscas bidirecionais: uma fronteira cresce a partir de `inicio` no grafo original
+    e outra a partir de `objetivo` no grafo reverso, sempre expandindo a de menor chave.
+
+    Com `potencial` (função p(v)), faz A* bidirecional com potenciais médios: a frente usa chave
+    g + p(v) e a de trás g - p(v). Com p consistente nos dois sentidos, os custos reduzidos são
+    não negativos e o critério de parada é o mesmo do Dijkstra bidirecional: parar quando
+    topo_frente + topo_tras >= mu, onde mu é o custo do melhor caminho já encontrado.
+
+    Returns:
+        ResultadoBusca: Caminho (nós de inicio a objetivo, no espaço de nós recebido), custo e contadores.
+    """
+    resultado = ResultadoBusca(algoritmo=algoritmo)
+    if inicio == objetivo:
+        resultado.path, resultado.custo = [inicio], 0
+        return resultado
+
+    if temporizador is not None:
+        inicio_fase = relogio()
+
+    if potencial is None:
+        potencial = lambda v: 0
+    sinais = (1, -1)
+
+    dist = ({inicio: 0}, {objetivo: 0})
+    came_from = ({inicio: None}, {objetivo: None})
+    # Tuplas (chave, no, g): g permite descartar entradas desatualizadas.
+    filas = ([(potencial(inicio), inicio, 0)], [(-potencial(objetivo), objetivo, 0)])
+    vizinhos = (vizinhos_frente, vizinhos_tras)
+
+    melhor_custo = float('inf')
+    no_encontro = None
+    nos_assentados = relaxamentos = entradas_obsoletas = pico_fronteira = 0
+    insercoes_fila = 2
+
+    if temporizador is not None:
+        temporizador("preparacao", relogio() - inicio_fase)
+        inicio_fase = relogio()
+
+    while filas[0] and filas[1]:
+        if filas[0][0][0] + filas[1][0][0] >= melhor_custo:
+            break
+
+        if len(filas[0]) + len(filas[1]) > pico_fronteira:
+            pico_fronteira = len(filas[0]) + len(filas[1])
+        lado = 0 if filas[0][0][0] <= filas[1][0][0] else 1
+        _, current_node, current_cost = heapq.heappop(filas[lado])
+        dist_lado, dist_outro = dist[lado], dist[1 - lado]
+        if current_cost > dist_lado[current_node]:
+            entradas_obsoletas += 1
+            continue
+        nos_assentados += 1
+
+        sinal = sinais[lado]
+        for neighbor, peso in vizinhos[lado](current_node):
+            relaxamentos += 1
+            new_cost = current_cost + peso
+            if new_cost < dist_lado.get(neighbor, float('inf')):
+                dist_lado[neighbor] = new_cost
+                came_from[lado][neighbor] = current_node
+                heapq.heappush(filas[lado], (new_cost + sinal * potencial(neighbor), neighbor, new_cost))
+                insercoes_fila += 1
+                if neighbor in dist_outro and new_cost + dist_outro[neighbor] < melhor_custo:
+                    melhor_custo = new_cost + dist_outro[neighbor]
+                    no_encontro = neighbor
+
+    if temporizador is not None:
+        temporizador("busca", relogio() - inicio_fase)
+        inicio_fase = relogio()
+
+    resultado.nos_assentados = nos_assentados
+    resultado.relaxamentos = relaxamentos
+    resultado.insercoes_fila = insercoes_fila
+    resultado.entradas_obsoletas = entradas_obsoletas
+    resultado.pico_fronteira = pico_fronteira
+
+    if no_encontro is not None:
+        path = []
+        node_iter = no_encontro
+        while node_iter is not None:
+            path.append(node_iter)
+            node_iter = came_from[0][node_iter]
+        path.reverse()
+        node_iter = came_from[1][no_encontro]
+        while node_iter is not None:
+            path.append(node_iter)
+            node_iter = came_from[1][node_iter]
+        resultado.path, resultado.custo = path, melhor_custo
+
+    if temporizador is not None:
+        temporizador("reconstrucao", relogio() - inicio_fase)
+    return resultado
+
+
+def bidirectional_uniform_cost_search(graph, start_node_id, goal_node_id, temporizador=None):
+    """
+    Busca de Custo Uniforme bidirecional: expande ao mesmo tempo a partir da origem (grafo original)
+    e do destino (grafo reverso) até que as fronteiras provem o caminho ótimo. Em rotas longas,
+    explora aproximadamente metade dos nós de `uniform_cost_search`, com o mesmo custo.
+
+    Args:
+        graph (networkx.MultiDiGraph | GrafoCSR): O grafo do osmnx ou sua versão compilada.
+        start_node_id (int | tuple): O ID do nó de início, ou coordenadas (lat, lon), ajustadas ao
+            nó mais próximo (ver spatial_index).
+        goal_node_id (int | tuple): O ID do nó de destino, ou coordenadas (lat, lon).
+        temporizador (callable): Opcional, como em `uniform_cost_search`.
+
+    Returns:
+        ResultadoBusca: O caminho (ou None), o custo e os contadores da busca.
+    """
+    start_node_id, goal_node_id = resolver_pontos(graph, start_node_id, goal_node_id)
+    if isinstance(graph, GrafoCSR):
+        inicio, objetivo = graph.indice(start_node_id), graph.indice(goal_node_id)
+        if inicio is None or objetivo is None:
+            return ResultadoBusca(algoritmo="ucs-bi")
+        resultado = _busca_bidirecional(_vizinhos_csr(graph), _vizinhos_csr(graph.reverso()), inicio, objetivo,
+                                        temporizador=temporizador)
+        if resultado.path is not None:
+            resultado.path = graph.ids_osm(resultado.path)
+        return resultado
+
+    if not graph.has_node(start_node_id) or not graph.has_node(goal_node_id):
+        return ResultadoBusca(algoritmo="ucs-bi")
+    return _busca_bidirecional(_vizinhos_networkx(graph.succ), _vizinhos_networkx(graph.pred),
+                               start_node_id, goal_node_id, temporizador=temporizador)
+
+
+def edge_snapped_uniform_cost_search(graph, start_point, goal_point, temporizador=None):
+    """
+    Busca de Custo Uniforme entre duas coordenadas, ajustadas ao ponto mais próximo sobre as
+    arestas (e não ao nó mais próximo, como nas demais buscas).
+
+    A busca parte das duas pontas da aresta de origem com os custos de entrada interpolados
+    (ver `spatial_index.IndiceEspacial.ajustar_arestas`) e termina em uma das pontas da aresta
+    de destino somando o trecho final. Se os dois pontos estão na mesma aresta, o trecho direto
+    entre eles também é considerado.
+
+    Args:
+        graph (GrafoCSR): O grafo compilado.
+        start_point (tuple): Coordenadas (lat, lon) de origem.
+        goal_point (tuple): Coordenadas (lat, lon) de destino.
+        temporizador (callable): Opcional, como em `uniform_cost_search`.
+
+    Returns:
+        ResultadoBusca: O custo inclui os trechos parciais das arestas de origem e destino; o
+                        caminho lista os nós percorridos entre eles (vazio se o trajeto é só o
+                        trecho direto na mesma aresta), ou None se não houver caminho.
+    """
+    if temporizador is not None:
+        inicio_fase = relogio()
+
+    resultado = ResultadoBusca(algoritmo="ucs-aresta")
+    indice = indice_espacial_de(graph)
+    segmento, fracao, _ = indice.ajustar_segmentos([start_point[0], goal_point[0]], [start_point[1], goal_point[1]])
+    (u_s, v_s), (u_t, v_t) = indice.segmentos[segmento[0]].tolist(), indice.segmentos[segmento[1]].tolist()
+
+    # Custo de sair do ponto de origem até cada ponta e de cada ponta até o ponto de destino
+    # (chegar ao destino vindo de u é o caminho inverso de sair dele em direção a u).
+    ate_u, ate_v = indice.custos_trecho(segmento[0], fracao[0])
+    entradas = {u_s: float(ate_u), v_s: float(ate_v)}
+    de_u = indice.custos_trecho(segmento[1], 0.0, ate=fracao[1])[1]
+    de_v = indice.custos_trecho(segmento[1], 1.0, ate=fracao[1])[1]
+    saidas = {u_t: float(de_u), v_t: float(de_v)}
+
+    melhor_custo, melhor_saida = float('inf'), None
+    if segmento[0] == segmento[1]:
+        melhor_custo = float(indice.custos_trecho(segmento[0], fracao[0], ate=fracao[1])[1])
+
+    offsets, alvos, pesos, _ = graph.adjacencia()
+    came_from = {}
+    cost_so_far = {}
+    priority_queue = []
+    for no, custo in entradas.items():
+        if custo < cost_so_far.get(no, float('inf')):
+            cost_so_far[no] = custo
+            came_from[no] = -1
+            priority_queue.append((custo, no))
+    heapq.heapify(priority_queue)
+    nos_assentados = relaxamentos = entradas_obsoletas = pico_fronteira = 0
+    insercoes_fila = len(priority_queue)
+
+    if temporizador is not None:
+        temporizador("preparacao", relogio() - inicio_fase)
+        inicio_fase = relogio()
+
+    while priority_queue:
+        if len(priority_queue) > pico_fronteira:
+            pico_fronteira = len(priority_queue)
+        current_cost, current_node = heapq.heappop(priority_queue)
+        # Os custos das saídas não são negativos: nenhum nó mais caro melhora a rota.
+        if current_cost >= melhor_custo:
+            break
+        if current_cost > cost_so_far[current_node]:
+            entradas_obsoletas += 1
+            continue
+
+        nos_assentados += 1
+        if current_node in saidas and current_cost + saidas[current_node] < melhor_custo:
+            melhor_custo, melhor_saida = current_cost + saidas[current_node], current_node
+
+        primeira, ultima = offsets[current_node], offsets[current_node + 1]
+        relaxamentos += ultima - primeira
+        for i in range(primeira, ultima):
+            neighbor = alvos[i]
+            new_cost = current_cost + pesos[i]
+            if new_cost < cost_so_far.get(neighbor, float('inf')):
+                cost_so_far[neighbor] = new_cost
+                heapq.heappush(priority_queue, (new_cost, neighbor))
+                insercoes_fila += 1
+                came_from[neighbor] = current_node
+
+    if temporizador is not None:
+        temporizador("busca", relogio() - inicio_fase)
+        inicio_fase = relogio()
+
+    resultado.nos_assentados = nos_assentados
+    resultado.relaxamentos = relaxamentos
+    resultado.insercoes_fila = insercoes_fila
+    resultado.entradas_obsoletas = entradas_obsoletas
+    resultado.pico_fronteira = pico_fronteira
+
+    if melhor_custo < float('inf'):
+        path = []
+        node_iter = melhor_saida if melhor_saida is not None else -1
+        while node_iter != -1:
+            path.append(node_iter)
+            node_iter = came_from[node_iter]
+        resultado.path = graph.ids_osm(path[::-1])
+        resultado.custo = float(melhor_custo)
+
+    if temporizador is not None:
+        temporizador("reconstrucao", relogio() - inicio_fase)
+    return resultado
@@ -0,0 +1,196 @@
+# edge_overlay.py
+import copy
+import weakref
+
+import numpy as np
+
+from a_star import FATOR_ADMISSIBILIDADE_HAVERSINE, haversine_metros
+from csr_graph import GrafoCSR
+
+
+class SobreposicaoPesos(GrafoCSR):
+    """
+    Pesos dinâmicos sobre um GrafoCSR: bloqueia arestas (interdições, obras) ou muda seus pesos
+    temporariamente, sem recompilar nem alterar o grafo base.
+
+    A sobreposição é ela mesma um GrafoCSR que compartilha a topologia (node_ids, offsets, alvos,
+    coordenadas) com a base e tem sua própria cópia de `pesos`, alterada no lugar. Por isso todas
+    as buscas sobre GrafoCSR (`uniform_cost_search`, `a_star_search`, as bidirecionais, isócronas...)
+    já respeitam as alterações: basta passar a sobreposição no lugar do grafo. Uma aresta
+    bloqueada tem peso inf e nunca é relaxada.
+
+    Estruturas derivadas são avisadas de cada alteração e se reparam só onde ela as afeta:
+    o grafo reverso e o índice espacial (pesos corrigidos no lugar), os caches de rotas criados
+    sobre a sobreposição (inscritos automaticamente) e, se inscritos com `inscrever`, a
+    heurística de landmarks e a hierarquia de contração pré-processadas sobre a base.
+    As heurísticas de linha reta (haversine, euclidiana) deixam de ser admissíveis se algum peso
+    ficar menor que a distância entre as pontas da aresta; essas arestas ficam registradas em
+    `arestas_abaixo_linha_reta` e, enquanto houver alguma, o A* (inclusive o dos caches de rotas)
+    troca essas heurísticas por zero.
+
+    Atributos:
+        base (GrafoCSR): O grafo original (nunca é modificado).
+        versao (int): Incrementada a cada alteração efetiva de peso.
+        arestas_abaixo_linha_reta (dict): Posição -> (u, v) das arestas cujo peso atual é menor
+            que a distância em linha reta entre as pontas.
+    """
+
+    def __init__(self, base):
+        super().__init__(base.node_ids, base.offsets, base.alvos, np.array(base.pesos, dtype=np.float64),
+                         base.x, base.y, bus_stops=base.bus_stops)
+        self.base = base
+        self.versao = 0
+        self._alteradas = {}  # posição da aresta -> (u, v) em índices densos, só as que diferem da base
+        self.arestas_abaixo_linha_reta = {}
+        self._inscritos = weakref.WeakSet()
+        self._posicao_reversa = None
+        self._chaves_segmentos = None
+        if base._indice_espacial is not None:
+            self._indice_espacial = _copiar_indice(base._indice_espacial)
+
+    def inscrever(self, estrutura):
+        """
+        Passa a avisar `estrutura` de cada alteração, chamando
+        estrutura.aresta_alterada(grafo, u, v, peso_antigo, peso_novo) com u e v em índices densos.
+        A inscrição não impede que a estrutura seja coletada pelo coletor de lixo.
+        """
+        self._inscritos.add(estrutura)
+
+    def cancelar_inscricao(self, estrutura):
+        self._inscritos.discard(estrutura)
+
+    def posicao(self, u, v):
+        """Posição da aresta u->v (índices densos) nos arrays CSR, ou None se ela não existir."""
+        offsets, alvos, _, _ = self.adjacencia()
+        for i in range(offsets[u], offsets[u + 1]):
+            if alvos[i] == v:
+                return i
+        return None
+
+    def _posicoes(self, u_id, v_id, ambos_sentidos):
+        """Posições das arestas entre dois IDs OSM (KeyError se alguma não existir)."""
+        sentidos = [(u_id, v_id), (v_id, u_id)] if ambos_sentidos else [(u_id, v_id)]
+        posicoes = []
+        for a_id, b_id in sentidos:
+            a, b = self.indice(a_id), self.indice(b_id)
+            i = self.posicao(a, b) if a is not None and b is not None else None
+            if i is None:
+                raise KeyError(f"Aresta {a_id}->{b_id} não existe no grafo")
+            posicoes.append((i, a, b))
+        return posicoes
+
+    def peso_base(self, u, v):
+        """Peso da aresta u->v (índices densos) no grafo base."""
+        return float(self.base.pesos[self.posicao(u, v)])
+
+    def alterar_peso(self, u_id, v_id, peso, ambos_sentidos=False):
+        """
+        Muda o peso da aresta u->v (e de v->u, se `ambos_sentidos`). Use inf para bloquear.
+
+        Raises:
+            KeyError: Se a aresta não existir no grafo base.
+            ValueError: Se o peso for negativo ou NaN.
+        """
+        if not peso >= 0:
+            raise ValueError(f"Peso inválido para a aresta {u_id}->{v_id}: {peso}")
+        for i, u, v in self._posicoes(u_id, v_id, ambos_sentidos):
+            self._aplicar(i, u, v, float(peso))
+
+    def bloquear(self, u_id, v_id, ambos_sentidos=False):
+        """Bloqueia a aresta u->v (e v->u, se `ambos_sentidos`), como numa interdição."""
+        self.alterar_peso(u_id, v_id, float('inf'), ambos_sentidos)
+
+    def restaurar(self, u_id=None, v_id=None, ambos_sentidos=False):
+        """Volta a aresta u->v ao peso do grafo base, ou todas as arestas alteradas se nada for informado."""
+        if u_id is None:
+            alvo = [(i, u, v) for i, (u, v) in self._alteradas.items()]
+        else:
+            alvo = self._posicoes(u_id, v_id, ambos_sentidos)
+        for i, u, v in alvo:
+            self._aplicar(i, u, v, float(self.base.pesos[i]))
+
+    def alteracoes(self):
+        """Arestas com peso diferente do grafo base: {(u_id, v_id): peso atual}."""
+        node_ids = self.node_ids
+        return {(int(node_ids[u]), int(node_ids[v])): float(self.pesos[i]) for i, (u, v) in self._alteradas.items()}
+
+    def _aplicar(self, i, u, v, peso):
+        antigo = float(self.pesos[i])
+        if peso == antigo:
+            return
+        self.pesos[i] = peso
+        if peso == self.base.pesos[i]:
+            self._alteradas.pop(i, None)
+        else:
+            self._alteradas[i] = (u, v)
+        x, y = self.coordenadas()
+        if peso < FATOR_ADMISSIBILIDADE_HAVERSINE * haversine_metros(x[u], y[u], x[v], y[v]):
+            self.arestas_abaixo_linha_reta[i] = (u, v)
+        else:
+            self.arestas_abaixo_linha_reta.pop(i, None)
+        self.versao += 1
+
+        if self._reverso is not None:
+            self._reverso.pesos[self._posicao_reversa[i]] = peso
+        if self._indice_espacial is not None and self._indice_espacial.tem_arestas:
+            self._corrigir_indice(u, v, peso)
+        for estrutura in list(self._inscritos):
+            estrutura.aresta_alterada(self, u, v, antigo, peso)
+
+    def _corrigir_indice(self, u, v, peso):
+        """Atualiza o peso do sentido u->v no segmento correspondente do índice espacial."""
+        indice = self._indice_espacial
+        if self._chaves_segmentos is None:
+            self._chaves_segmentos = indice.segmentos[:, 0].astype(np.int64) * self.num_nos + indice.segmentos[:, 1]
+        chave = min(u, v) * self.num_nos + max(u, v)
+        s = int(np.searchsorted(self._chaves_segmentos, chave))
+        if s < len(self._chaves_segmentos) and self._chaves_segmentos[s] == chave:
+            (indice.peso_ida if u < v else indice.peso_volta)[s] = peso
+
+    def reverso(self):
+        """Como `GrafoCSR.reverso`; os pesos do reverso acompanham as alterações da sobreposição."""
+        if self._reverso is None:
+            super().reverso()
+            self._posicao_reversa = np.empty(self.num_arestas, dtype=np.int64)
+            self._posicao_reversa[np.argsort(self.alvos, kind='stable')] = np.arange(self.num_arestas)
+        return self._reverso
+
+
+def _copiar_indice(indice):
+    """Cópia rasa do índice espacial com pesos próprios (as árvores continuam compartilhadas)."""
+    copia = copy.copy(indice)
+    if indice.tem_arestas:
+        copia.peso_ida = indice.peso_ida.copy()
+        copia.peso_volta = indice.peso_volta.copy()
+    return copia
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from dijkstra import uniform_cost_search
+    from snapshot import carregar_grafo_preparado
+
+    parser = argparse.ArgumentParser(description="Compara uma rota antes e depois de bloquear arestas.")
+    parser.add_argument("origem", type=int)
+    parser.add_argument("destino", type=int)
+    parser.add_argument("-b", "--bloquear", nargs=2, type=int, action="append", default=[], metavar=("U", "V"),
+                        help="Aresta U->V a bloquear; pode ser repetido")
+    args = parser.parse_args()
+
+    grafo_principal, _ = carregar_grafo_preparado()
+    if grafo_principal is None:
+        print("EDGE_OVERLAY.PY: Falha ao carregar o grafo.")
+        raise SystemExit(1)
+
+    sobreposicao = SobreposicaoPesos(grafo_principal)
+    antes = uniform_cost_search(sobreposicao, args.origem, args.destino)
+    for u_id, v_id in args.bloquear:
+        try:
+            sobreposicao.bloquear(u_id, v_id)
+        except KeyError as e:
+            print(f"EDGE_OVERLAY.PY: {e.args[0]}")
+            raise SystemExit(1)
+    depois = uniform_cost_search(sobreposicao, args.origem, args.destino)
+    print(f"EDGE_OVERLAY.PY: Antes: {antes.custo:.1f} m ({len(antes.path or [])} nós). "
+          f"Depois de {len(sobreposicao.alteracoes())} bloqueios: {depois.custo:.1f} m ({len(depois.path or [])} nós).")
@@ -1,8 +1,7 @@
 # graph.py
-import osmnx as ox
-import pandas as pd
-import matplotlib.pyplot as plt
-import geopandas as gpd # Para carregar/salvar features em GeoJSON
+# osmnx, geopandas, pandas e matplotlib são importados dentro das funções, só quando um download,
+# o processamento do GeoJSON ou um plot são de fato necessários. Quem só usa as constantes deste
+# módulo (como snapshot.py ao abrir um snapshot válido) não paga o tempo nem a memória dessas bibliotecas.
 
 # Definição do local (pode ser um parâmetro da função se quiser mais flexibilidade)
 PLACE_NAME = "Belo Horizonte, Minas Gerais, Brazil"
@@ -12,6 +11,60 @@ PLACE_FILE_PREFIX = PLACE_NAME.split(",")[0].lower().replace(" ", "_")
 GRAPH_FILEPATH = f"{PLACE_FILE_PREFIX}_walk.graphml"
 FEATURES_FILEPATH_GEOJSON = f"{PLACE_FILE_PREFIX}_bus_stops.geojson"
 
+# Se as ox.settings já foram aplicadas neste processo (ver _configurar_osmnx)
+_osmnx_configurado = False
+
+def _configurar_osmnx():
+    """
+    Importa o osmnx e aplica as configurações do projeto uma única vez por processo.
+
+    Returns:
+        module: O módulo osmnx.
+    """
+    global _osmnx_configurado
+    import osmnx as ox
+
+    if not _osmnx_configurado:
+        # --- Configurações OSMnx ---
+        # Valem para todas as chamadas do osmnx feitas depois (download do grafo e das features).
+        ox.settings.overpass_endpoint = "https://overpass.kumi.systems/api" 
+        # ox.settings.overpass_endpoint = "https://lz4.overpass-api.de/api" # Outra opção
+        # ox.settings.overpass_endpoint = "https://z.overpass-api.de/api" # Mais uma opção
+        
+        ox.settings.timeout = 300 # Aumentar timeout para 5 minutos
+        ox.settings.log_console = True 
+        ox.settings.use_cache = True # Tentar usar o cache se houver dados
+        _osmnx_configurado = True
+    return ox
+
+def salvar_plot_grafo_geral(G, bus_stop_node_ids_in_graph, nome_arquivo_plot):
+    """
+    Plota o grafo com todos os pontos de ônibus destacados e salva em `nome_arquivo_plot`.
+    O matplotlib só é importado aqui.
+    """
+    import matplotlib.pyplot as plt
+    ox = _configurar_osmnx()
+
+    print(f"\nGRAPH.PY: Preparando para plotar o grafo geral e salvar como {nome_arquivo_plot}...")
+    if not G.nodes:
+        print("GRAPH.PY: Grafo está vazio, não há nada para plotar.")
+    else:
+        node_colors = ['red' if node_id in bus_stop_node_ids_in_graph else 'lightgray' for node_id in G.nodes()]
+        node_sizes = [5 if node_id in bus_stop_node_ids_in_graph else 0 for node_id in G.nodes()]
+        
+        fig, ax = ox.plot_graph(G, node_color=node_colors, node_size=node_sizes,
+                                edge_linewidth=0.3, edge_color='gray', node_zorder=2,
+                                show=False, close=False, save=True, filepath=nome_arquivo_plot,
+                                dpi=300, bgcolor='w')
+        title = f"Grafo de Caminhada de {PLACE_NAME.split(',')[0]}"
+        if bus_stop_node_ids_in_graph:
+            title += f" com {len(bus_stop_node_ids_in_graph)} Pontos de Ônibus"
+        else:
+            title += " (Sem Pontos de Ônibus Destacados)"
+        ax.set_title(title, color='black', y=0.01, fontsize=8)
+        print(f"GRAPH.PY: Gráfico salvo como: {nome_arquivo_plot}")
+        plt.close(fig)
+
 def carregar_e_preparar_grafo(plotar_grafo_geral=False, nome_arquivo_plot="grafo_bh_pontos_onibus.png"):
     """
     Carrega o grafo de caminhada de Belo Horizonte, identifica pontos de ônibus,
@@ -30,15 +83,8 @@ def carregar_e_preparar_grafo(plotar_grafo_geral=False, nome_arquivo_plot="grafo
     features = None # Será um GeoDataFrame
     bus_stop_node_ids_in_graph = []
 
-    # --- Configurações OSMnx ---
-    # Estas configurações serão aplicadas quando as funções do osmnx forem chamadas DENTRO desta função.
-    ox.settings.overpass_endpoint = "https://overpass.kumi.systems/api" 
-    # ox.settings.overpass_endpoint = "https://lz4.overpass-api.de/api" # Outra opção
-    # ox.settings.overpass_endpoint = "https://z.overpass-api.de/api" # Mais uma opção
-    
-    ox.settings.timeout = 300 # Aumentar timeout para 5 minutos
-    ox.settings.log_console = True 
-    ox.settings.use_cache = True # Tentar usar o cache se houver dados
+    ox = _configurar_osmnx()
+    import geopandas as gpd # Para carregar/salvar features em GeoJSON
 
     # --- Tentar carregar de arquivos locais primeiro ---
     try:
@@ -62,38 +108,30 @@ def carregar_e_preparar_grafo(plotar_grafo_geral=False, nome_arquivo_plot="grafo
     # --- Se não carregou dos arquivos, tentar baixar ---
     if G is None: 
         try:
-            print(f"GRAPH.PY: Baixando grafo de caminhada para {PLACE_NAME}...")
-            # A chamada ox.graph_from_place AQUI usará as ox.settings definidas acima.
-            G = ox.graph_from_place(PLACE_NAME, network_type="walk")
-            print(f"GRAPH.PY: Grafo para {PLACE_NAME} baixado com {len(G.nodes)} nós e {len(G.edges)} arestas.")
-            print(f"GRAPH.PY: Salvando grafo em: {GRAPH_FILEPATH}")
-            ox.save_graphml(G, filepath=GRAPH_FILEPATH)
+            print(f"GRAPH.PY: Baixando grafo de caminhada e pontos de ônibus para {PLACE_NAME} em tiles...")
+            # Os tiles são baixados em paralelo, com novas tentativas e retomada, e ficam comprimidos
+            # em disco (ver osm_download.py), que grava o GraphML e o GeoJSON lidos abaixo.
+            from osm_download import baixar_lugar
+            estatisticas = baixar_lugar()
+            G = ox.load_graphml(GRAPH_FILEPATH)
+            print(f"GRAPH.PY: Grafo para {PLACE_NAME} baixado ({estatisticas['tiles']} tiles) com "
+                  f"{len(G.nodes)} nós e {len(G.edges)} arestas, salvo em: {GRAPH_FILEPATH}")
         except Exception as e:
             print(f"GRAPH.PY: ERRO CRÍTICO ao baixar o grafo: {e}")
             return None, [] 
 
-    if features is None and G: 
         try:
-            bus_stop_tags_query = {"public_transport": "platform", "highway": "bus_stop"}
-            print(f"GRAPH.PY: Baixando features (pontos de ônibus) para: {PLACE_NAME} com tags: {bus_stop_tags_query}...")
-            # A chamada ox.features.features_from_place AQUI usará as ox.settings.
-            features_gdf = ox.features.features_from_place(PLACE_NAME, tags=bus_stop_tags_query)
-            
-            if not features_gdf.empty:
-                print(f"GRAPH.PY: Encontradas {len(features_gdf)} feições de pontos de ônibus.")
-                print(f"GRAPH.PY: Salvando features em: {FEATURES_FILEPATH_GEOJSON}")
-                features_gdf.to_file(FEATURES_FILEPATH_GEOJSON, driver="GeoJSON")
-                features = features_gdf 
-            else:
-                print("GRAPH.PY: Nenhuma feição de ponto de ônibus encontrada para salvar.")
-                features = gpd.GeoDataFrame() 
+            features = gpd.read_file(FEATURES_FILEPATH_GEOJSON)
+            print(f"GRAPH.PY: Features baixadas com {len(features)} pontos, salvas em: {FEATURES_FILEPATH_GEOJSON}")
         except Exception as e:
-            print(f"GRAPH.PY: ERRO ao baixar features dos pontos de ônibus: {e}")
+            print(f"GRAPH.PY: ERRO ao carregar features dos pontos de ônibus: {e}")
             features = gpd.GeoDataFrame() 
 
     # --- Processar features e adicionar aos nós do grafo ---
     # (O restante da função permanece o mesmo)
     if G and features is not None and not features.empty:
+        import pandas as pd
+
         if isinstance(features, gpd.GeoDataFrame) and 'geometry' in features.columns and not features.geometry.isna().all():
             features_valid = features[features.geometry.is_valid & ~features.geometry.isna()].copy()
             
@@ -124,25 +162,7 @@ def carregar_e_preparar_grafo(plotar_grafo_geral=False, nome_arquivo_plot="grafo
          print("GRAPH.PY: Features de pontos de ônibus não disponíveis ou grafo não carregado corretamente.")
     
     if plotar_grafo_geral and G:
-        print(f"\nGRAPH.PY: Preparando para plotar o grafo geral e salvar como {nome_arquivo_plot}...")
-        if not G.nodes:
-            print("GRAPH.PY: Grafo está vazio, não há nada para plotar.")
-        else:
-            node_colors = ['red' if node_id in bus_stop_node_ids_in_graph else 'lightgray' for node_id in G.nodes()]
-            node_sizes = [5 if node_id in bus_stop_node_ids_in_graph else 0 for node_id in G.nodes()]
-            
-            fig, ax = ox.plot_graph(G, node_color=node_colors, node_size=node_sizes,
-                                    edge_linewidth=0.3, edge_color='gray', node_zorder=2,
-                                    show=False, close=False, save=True, filepath=nome_arquivo_plot,
-                                    dpi=300, bgcolor='w')
-            title = f"Grafo de Caminhada de {PLACE_NAME.split(',')[0]}"
-            if bus_stop_node_ids_in_graph:
-                title += f" com {len(bus_stop_node_ids_in_graph)} Pontos de Ônibus"
-            else:
-                title += " (Sem Pontos de Ônibus Destacados)"
-            ax.set_title(title, color='black', y=0.01, fontsize=8)
-            print(f"GRAPH.PY: Gráfico salvo como: {nome_arquivo_plot}")
-            plt.close(fig)
+        salvar_plot_grafo_geral(G, bus_stop_node_ids_in_graph, nome_arquivo_plot)
             
     return G, bus_stop_node_ids_in_graph
 
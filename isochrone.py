@@ -0,0 +1,228 @@
+# isochrone.py
+import numpy as np
+
+from dijkstra import arvore_limitada
+from spatial_index import resolver_ponto
+from stop_matrix import MEMORIA_LOTE_PADRAO, matriz_esparsa
+
+
+class Isocrona:
+    """
+    Região alcançável a pé a partir de uma origem dentro de um orçamento de distância.
+
+    Atributos:
+        grafo (GrafoCSR): O grafo da busca.
+        origem (int): ID OSM do nó de origem.
+        limite (float): Orçamento em metros.
+        nos (numpy.ndarray[int64]): Índices densos dos nós alcançáveis, em ordem crescente de distância.
+        distancias (numpy.ndarray[float64]): Distância da origem até cada nó de `nos`.
+    """
+
+    def __init__(self, grafo, origem, limite, nos, distancias):
+        self.grafo = grafo
+        self.origem = origem
+        self.limite = limite
+        self.nos = nos
+        self.distancias = distancias
+        self._arestas = None
+
+    def __len__(self):
+        return len(self.nos)
+
+    @property
+    def node_ids(self):
+        """IDs OSM dos nós alcançáveis (mesma ordem de `nos`)."""
+        return self.grafo.node_ids[self.nos]
+
+    def _classificar_arestas(self):
+        """
+        Arestas que saem de nós alcançáveis: (u, v, distância até u, peso, completa), com u e v em
+        índices densos; completa = percorrida por inteiro dentro do orçamento.
+        """
+        if self._arestas is None:
+            offsets = np.asarray(self.grafo.offsets)
+            inicio = offsets[self.nos]
+            quantidade = offsets[self.nos + 1] - inicio
+            origem = np.repeat(np.arange(len(self.nos)), quantidade)
+            posicoes = np.repeat(inicio - np.cumsum(quantidade) + quantidade, quantidade) + np.arange(quantidade.sum())
+            distancia_u = self.distancias[origem]
+            pesos = np.asarray(self.grafo.pesos)[posicoes]
+            self._arestas = (self.nos[origem], np.asarray(self.grafo.alvos)[posicoes], distancia_u, pesos,
+                             distancia_u + pesos <= self.limite)
+        return self._arestas
+
+    @property
+    def num_arestas(self):
+        """Arestas percorridas por inteiro dentro do orçamento."""
+        return int(np.count_nonzero(self._classificar_arestas()[4]))
+
+    def arestas(self):
+        """
+        Arestas percorridas por inteiro dentro do orçamento.
+
+        Returns:
+            tuple: (numpy.ndarray, numpy.ndarray) com os IDs OSM de origem e destino de cada aresta.
+        """
+        u, v, _, _, completas = self._classificar_arestas()
+        return self.grafo.node_ids[u[completas]], self.grafo.node_ids[v[completas]]
+
+    def pontos_onibus(self):
+        """IDs OSM dos pontos de ônibus alcançáveis (array, em ordem crescente de distância)."""
+        node_ids = self.node_ids
+        if not self.grafo.bus_stops:
+            return node_ids[:0]
+        return node_ids[np.isin(node_ids, np.fromiter(self.grafo.bus_stops, dtype=np.int64))]
+
+    def atributos_pontos_onibus(self):
+        """
+        Pontos de ônibus alcançáveis com o atributo 'bus_stop' associado por `carregar_e_preparar_grafo`
+        e a distância até cada um: {id_osm: {"distancia": ..., **bus_stop}}.
+        """
+        posicao = {node_id: i for i, node_id in enumerate(self.node_ids.tolist())}
+        return {node_id: {"distancia": float(self.distancias[posicao[node_id]]), **self.grafo.bus_stops[node_id]}
+                for node_id in self.pontos_onibus().tolist()}
+
+    def contorno(self):
+        """
+        Contorno convexo da região alcançável: nós alcançáveis mais o ponto, interpolado pelo
+        orçamento restante, em que a caminhada para em cada aresta parcial.
+
+        Returns:
+            numpy.ndarray: (m, 2) com os vértices (lon, lat) do polígono fechado (o primeiro se repete
+                           no final), ou array vazio se a região tiver menos de 3 pontos distintos.
+        """
+        from scipy.spatial import ConvexHull, QhullError
+
+        x, y = np.asarray(self.grafo.x), np.asarray(self.grafo.y)
+        u, v, distancia_u, pesos, completas = self._classificar_arestas()
+        parciais = ~completas
+        up, vp = u[parciais], v[parciais]
+        fracao = (self.limite - distancia_u[parciais]) / pesos[parciais]
+        pontos = np.concatenate((np.column_stack((x[self.nos], y[self.nos])),
+                                 np.column_stack((x[up] + (x[vp] - x[up]) * fracao, y[up] + (y[vp] - y[up]) * fracao))))
+        pontos = np.unique(pontos[~np.isnan(pontos).any(axis=1)], axis=0)
+        if len(pontos) < 3:
+            return np.empty((0, 2))
+        try:
+            vertices = ConvexHull(pontos).vertices
+        except QhullError:  # Pontos colineares
+            return np.empty((0, 2))
+        return pontos[np.append(vertices, vertices[0])]
+
+    def poligono(self, concavidade=None):
+        """
+        A região como um polígono do shapely (a mesma biblioteca de geometrias usada pelo osmnx).
+
+        Args:
+            concavidade (float): None para o contorno convexo; entre 0 e 1 para um contorno côncavo
+                (shapely.concave_hull com ratio=concavidade, menor = mais justo).
+        """
+        import shapely
+        from shapely.geometry import Polygon
+
+        if concavidade is None:
+            contorno = self.contorno()
+            return Polygon(contorno) if len(contorno) else Polygon()
+        x, y = np.asarray(self.grafo.x), np.asarray(self.grafo.y)
+        return shapely.concave_hull(shapely.MultiPoint(np.column_stack((x[self.nos], y[self.nos]))),
+                                    ratio=concavidade)
+
+    def como_dict(self, incluir_nos=False, incluir_atributos=False, incluir_poligono=False):
+        """Representação em dicionário (serializável em JSON); o polígono segue o formato GeoJSON."""
+        dados = {"origem": self.origem, "limite": self.limite, "num_nos": len(self.nos),
+                 "num_arestas": self.num_arestas, "pontos_onibus": self.pontos_onibus().tolist()}
+        if incluir_nos:
+            dados["nos"] = self.node_ids.tolist()
+            dados["distancias"] = self.distancias.tolist()
+        if incluir_atributos:
+            dados["atributos_pontos_onibus"] = {str(k): v for k, v in self.atributos_pontos_onibus().items()}
+        if incluir_poligono:
+            dados["poligono"] = {"type": "Polygon", "coordinates": [self.contorno().tolist()]}
+        return dados
+
+
+def isocrona(grafo, origem, limite):
+    """
+    Tudo o que é alcançável a pé a partir de `origem` em até `limite` metros.
+
+    Usa o laço de `uniform_cost_search` sem destino (ver dijkstra.arvore_limitada), que para no
+    orçamento em vez de esgotar o grafo.
+
+    Args:
+        grafo (GrafoCSR): O grafo compilado.
+        origem (int | tuple): O ID do nó de origem, ou coordenadas (lat, lon).
+        limite (float): Orçamento de distância em metros.
+
+    Returns:
+        Isocrona: A região alcançável (vazia se a origem não existir no grafo).
+    """
+    origem = resolver_ponto(grafo, origem)
+    inicio = grafo.indice(origem)
+    if inicio is None:
+        return Isocrona(grafo, origem, limite, np.empty(0, dtype=np.int64), np.empty(0))
+    assentados, _ = arvore_limitada(grafo, [inicio], limite)
+    nos = np.fromiter(assentados.keys(), dtype=np.int64, count=len(assentados))
+    distancias = np.fromiter(assentados.values(), dtype=np.float64, count=len(assentados))
+    return Isocrona(grafo, origem, limite, nos, distancias)
+
+
+def isocronas(grafo, origens, limite, tamanho_lote=None):
+    """
+    Isócronas de várias origens de uma vez, com o Dijkstra em C do scipy.sparse.csgraph
+    (limitado pelo orçamento) sobre a matriz esparsa do grafo, em lotes de origens.
+
+    Args:
+        grafo (GrafoCSR): O grafo compilado.
+        origens (iterable): IDs dos nós de origem e/ou coordenadas (lat, lon).
+        limite (float): Orçamento de distância em metros.
+        tamanho_lote (int): Origens por chamada ao csgraph (padrão: limitado por MEMORIA_LOTE_PADRAO).
+
+    Yields:
+        Isocrona: Uma por origem, na ordem de `origens`.
+    """
+    from scipy.sparse.csgraph import dijkstra
+
+    origens = [resolver_ponto(grafo, origem) for origem in origens]
+    matriz = matriz_esparsa(grafo)
+    tamanho_lote = tamanho_lote or max(1, MEMORIA_LOTE_PADRAO // (8 * max(grafo.num_nos, 1)))
+
+    for inicio_lote in range(0, len(origens), tamanho_lote):
+        lote = origens[inicio_lote:inicio_lote + tamanho_lote]
+        indices = [grafo.indice(origem) for origem in lote]
+        validos = [i for i in indices if i is not None]
+        distancias = dijkstra(matriz, directed=True, indices=validos, limit=limite) if validos else None
+        linha = 0
+        for origem, i in zip(lote, indices):
+            if i is None:
+                yield Isocrona(grafo, origem, limite, np.empty(0, dtype=np.int64), np.empty(0))
+                continue
+            nos = np.flatnonzero(np.isfinite(distancias[linha]))
+            ordem = np.argsort(distancias[linha, nos], kind="stable")
+            yield Isocrona(grafo, origem, limite, nos[ordem], distancias[linha, nos[ordem]])
+            linha += 1
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    from snapshot import carregar_grafo_preparado
+
+    parser = argparse.ArgumentParser(description="Tudo o que é alcançável a pé a partir de um nó em até N metros.")
+    parser.add_argument("origens", nargs="+", help="IDs de nós ou coordenadas no formato lat,lon")
+    parser.add_argument("-l", "--limite", type=float, default=500.0, help="Orçamento de distância (m)")
+    parser.add_argument("--atributos", action="store_true", help="Incluir os atributos dos pontos de ônibus")
+    parser.add_argument("--poligono", action="store_true", help="Incluir o contorno da região (GeoJSON)")
+    args = parser.parse_args()
+
+    grafo_principal, _ = carregar_grafo_preparado()
+    if grafo_principal is None:
+        print("ISOCHRONE.PY: Falha ao carregar o grafo.")
+        raise SystemExit(1)
+
+    origens = [tuple(float(c) for c in origem.split(",")) if "," in origem else int(origem) for origem in args.origens]
+    regioes = [isocrona(grafo_principal, origens[0], args.limite)] if len(origens) == 1 else \
+        isocronas(grafo_principal, origens, args.limite)
+    for regiao in regioes:
+        print(json.dumps(regiao.como_dict(incluir_atributos=args.atributos, incluir_poligono=args.poligono),
+                         ensure_ascii=False))
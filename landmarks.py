@@ -0,0 +1,205 @@
+# landmarks.py
+import json
+import os
+import random
+
+import numpy as np
+
+from dijkstra import distancias_a_partir_de
+
+# Número padrão de landmarks (K). Mais landmarks deixam a heurística mais justa,
+# ao custo de 2 * K * 8 bytes por nó nas tabelas.
+NUM_LANDMARKS_PADRAO = 16
+
+# Distâncias inalcançáveis são guardadas como este valor finito para evitar inf - inf (NaN)
+# no cálculo da heurística. Se L não alcança t mas alcança v, então v também não alcança t,
+# e a estimativa (enorme) continua sendo um limite inferior válido.
+DISTANCIA_INALCANCAVEL = 1e15
+
+
+def selecionar_landmarks(grafo, k=NUM_LANDMARKS_PADRAO, seed=42):
+    """
+    Escolhe K landmarks pela estratégia "mais distante": começa de um nó aleatório e,
+    a cada passo, escolhe o nó cuja distância ao landmark mais próximo já escolhido é a maior.
+    Landmarks na periferia do grafo dão limites inferiores mais justos.
+
+    Args:
+        grafo (GrafoCSR): O grafo compilado.
+        k (int): Número de landmarks.
+        seed (int): Semente para a escolha do nó inicial (reprodutibilidade).
+
+    Returns:
+        tuple: (list, numpy.ndarray, numpy.ndarray) com os índices dos landmarks e as tabelas
+               de distâncias d(L, v) e d(v, L), ambas com formato (num_nos, K).
+    """
+    rng = random.Random(seed)
+    reverso = grafo.reverso()
+    k = min(k, grafo.num_nos)
+
+    landmarks = []
+    dist_de = np.empty((grafo.num_nos, k))
+    dist_para = np.empty((grafo.num_nos, k))
+    menor_distancia = np.full(grafo.num_nos, np.inf)
+    candidato = rng.randrange(grafo.num_nos)
+
+    for j in range(k):
+        landmarks.append(candidato)
+        dist_de[:, j], _ = distancias_a_partir_de(grafo, [candidato])
+        dist_para[:, j], _ = distancias_a_partir_de(reverso, [candidato])
+
+        # Distância "de ida e volta" ao conjunto de landmarks, ignorando nós inalcançáveis.
+        ida_e_volta = dist_de[:, j] + dist_para[:, j]
+        menor_distancia = np.minimum(menor_distancia, ida_e_volta)
+        pontuacao = np.where(np.isfinite(menor_distancia), menor_distancia, -1.0)
+        pontuacao[landmarks] = -1.0
+        candidato = int(np.argmax(pontuacao))
+        if pontuacao[candidato] < 0:
+            # Componente esgotada: recomeça de um nó ainda não coberto por nenhum landmark.
+            restantes = np.flatnonzero(~np.isfinite(menor_distancia))
+            if len(restantes) == 0:
+                dist_de, dist_para = dist_de[:, :j + 1], dist_para[:, :j + 1]
+                break
+            candidato = int(restantes[rng.randrange(len(restantes))])
+
+    dist_de[~np.isfinite(dist_de)] = DISTANCIA_INALCANCAVEL
+    dist_para[~np.isfinite(dist_para)] = DISTANCIA_INALCANCAVEL
+    return landmarks, dist_de, dist_para
+
+
+class HeuristicaLandmarks:
+    """
+    Heurística ALT (A*, Landmarks e desigualdade Triangular) para `a_star_search`.
+
+    Para cada landmark L, a desigualdade triangular dá dois limites inferiores para d(v, t):
+    d(L, t) - d(L, v) e d(v, L) - d(t, L). A heurística é o maior deles entre todos os
+    landmarks (e nunca menor que 0), portanto admissível e consistente.
+
+    Pode ser usada como `heuristic_func` tanto com o MultiDiGraph quanto com o GrafoCSR.
+    """
+
+    def __init__(self, node_ids, landmarks, dist_de, dist_para):
+        self.node_ids = node_ids
+        self.landmarks = landmarks
+        self.dist_de = dist_de
+        self.dist_para = dist_para
+
+    def _indice(self, node_id):
+        i = int(np.searchsorted(self.node_ids, node_id))
+        if i < len(self.node_ids) and self.node_ids[i] == node_id:
+            return i
+        return None
+
+    def estimar(self, i, j):
+        """Limite inferior para a distância do nó de índice i ao nó de índice j."""
+        return max(0.0, float(np.max(self.dist_de[j] - self.dist_de[i])),
+                   float(np.max(self.dist_para[i] - self.dist_para[j])))
+
+    def __call__(self, graph, node1_id, node2_id):
+        i, j = self._indice(node1_id), self._indice(node2_id)
+        if i is None or j is None:
+            return float('inf')
+        return self.estimar(i, j)
+
+    def reversa(self):
+        """Heurística para o grafo reverso: estima d(origem, v) trocando as tabelas de ida e volta."""
+        return HeuristicaLandmarks(self.node_ids, self.landmarks, self.dist_para, self.dist_de)
+
+    def aresta_alterada(self, grafo, u, v, peso_antigo, peso_novo):
+        """
+        Mantém a heurística válida quando o peso da aresta u->v (índices densos) muda em uma
+        `edge_overlay.SobreposicaoPesos` em que ela foi inscrita.
+
+        Aumentos (e bloqueios) nunca invalidam as tabelas: as distâncias só crescem, então os
+        limites inferiores continuam admissíveis e consistentes, apenas menos justos. Uma redução
+        só importa para os landmarks em que ela viola a desigualdade triangular
+        (d(L, u) + peso < d(L, v), ou o equivalente na tabela de volta); só essas colunas são recalculadas.
+
+        Returns:
+            int: Quantas colunas das tabelas foram recalculadas.
+        """
+        if peso_novo >= peso_antigo:
+            return 0
+        colunas_de = np.flatnonzero(self.dist_de[u] + peso_novo < self.dist_de[v])
+        colunas_para = np.flatnonzero(self.dist_para[v] + peso_novo < self.dist_para[u])
+        if len(colunas_de):
+            self.dist_de = self._recalcular(self.dist_de, colunas_de, grafo)
+        if len(colunas_para):
+            self.dist_para = self._recalcular(self.dist_para, colunas_para, grafo.reverso())
+        return len(colunas_de) + len(colunas_para)
+
+    def _recalcular(self, tabela, colunas, grafo):
+        """Recalcula as colunas `colunas` da tabela (copiada se estiver mapeada só para leitura)."""
+        if not tabela.flags.writeable:
+            tabela = np.array(tabela)
+        for j in colunas:
+            distancias, _ = distancias_a_partir_de(grafo, [self.landmarks[j]])
+            distancias[~np.isfinite(distancias)] = DISTANCIA_INALCANCAVEL
+            tabela[:, j] = distancias
+        return tabela
+
+    def por_indice(self, grafo, objetivo):
+        """Retorna h(indice) para o destino `objetivo`, usado pelo A* sobre o GrafoCSR."""
+        de_objetivo = self.dist_de[objetivo]
+        para_objetivo = self.dist_para[objetivo]
+        dist_de, dist_para = self.dist_de, self.dist_para
+        maximo = np.max
+
+        def heuristica(i):
+            h = max(maximo(de_objetivo - dist_de[i]), maximo(dist_para[i] - para_objetivo))
+            return float(h) if h > 0 else 0.0
+
+        return heuristica
+
+
+def preprocessar_landmarks(grafo, diretorio, k=NUM_LANDMARKS_PADRAO, seed=42):
+    """
+    Seleciona os landmarks, calcula as tabelas de distâncias e as salva em `diretorio`
+    (landmarks.npy, dist_de.npy, dist_para.npy e meta.json com a assinatura do grafo).
+
+    Returns:
+        HeuristicaLandmarks: A heurística pronta para uso.
+    """
+    landmarks, dist_de, dist_para = selecionar_landmarks(grafo, k=k, seed=seed)
+
+    os.makedirs(diretorio, exist_ok=True)
+    np.save(os.path.join(diretorio, "landmarks.npy"), np.array(landmarks, dtype=np.int32))
+    np.save(os.path.join(diretorio, "dist_de.npy"), dist_de)
+    np.save(os.path.join(diretorio, "dist_para.npy"), dist_para)
+    with open(os.path.join(diretorio, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump({"assinatura_grafo": grafo.assinatura(), "k": len(landmarks), "seed": seed}, f)
+
+    return HeuristicaLandmarks(grafo.node_ids, landmarks, dist_de, dist_para)
+
+
+def carregar_landmarks(grafo, diretorio, k=NUM_LANDMARKS_PADRAO, seed=42):
+    """
+    Carrega as tabelas de landmarks de `diretorio` (mapeadas em memória). Se não existirem,
+    tiverem outro K ou tiverem sido calculadas para outro grafo, são recalculadas e salvas.
+
+    Returns:
+        HeuristicaLandmarks: A heurística pronta para uso.
+    """
+    try:
+        with open(os.path.join(diretorio, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("assinatura_grafo") == grafo.assinatura() and meta.get("k") == k and meta.get("seed") == seed:
+            landmarks = np.load(os.path.join(diretorio, "landmarks.npy")).tolist()
+            dist_de = np.load(os.path.join(diretorio, "dist_de.npy"), mmap_mode="r")
+            dist_para = np.load(os.path.join(diretorio, "dist_para.npy"), mmap_mode="r")
+            return HeuristicaLandmarks(grafo.node_ids, landmarks, dist_de, dist_para)
+        print(f"LANDMARKS.PY: Tabelas em {diretorio} não correspondem ao grafo atual. Recalculando...")
+    except (FileNotFoundError, json.JSONDecodeError, ValueError):
+        print(f"LANDMARKS.PY: Tabelas de landmarks não encontradas em {diretorio}. Calculando...")
+
+    return preprocessar_landmarks(grafo, diretorio, k=k, seed=seed)
+
+
+if __name__ == "__main__":
+    from snapshot import carregar_grafo_preparado, SNAPSHOT_DIRPATH
+
+    grafo_principal, _ = carregar_grafo_preparado()
+    if grafo_principal is not None:
+        heuristica_alt = preprocessar_landmarks(grafo_principal, os.path.join(SNAPSHOT_DIRPATH, "landmarks"))
+        print(f"LANDMARKS.PY: {len(heuristica_alt.landmarks)} landmarks calculados e salvos.")
+    else:
+        print("LANDMARKS.PY: Falha ao carregar o grafo.")
@@ -1,48 +1,23 @@
 # main.py
-import osmnx as ox
-import matplotlib.pyplot as plt
 import random
+import time
 
-# Importar a função de preparação do grafo do arquivo graph.py
-# Certifique-se de que graph.py está na mesma pasta ou no PYTHONPATH
-from graph import carregar_e_preparar_grafo 
+# Carregar o grafo já preparado do snapshot binário (snapshot.py). O osmnx, o geopandas e o
+# matplotlib só são importados (por graph.py) se o snapshot precisar ser reconstruído.
+from snapshot import carregar_grafo_preparado
+from render import carregar_mapa_base, renderizar_rota
 
 # Importar os algoritmos de busca dos arquivos .py correspondentes
 from dijkstra import uniform_cost_search
 from a_star import a_star_search, euclidean_distance_heuristic # Importar a heurística também
 
-def calcular_custo_caminho(graph, path):
-    """Calcula o custo total (comprimento) de um caminho no grafo."""
-    if not path or len(path) < 2:
-        return 0
-    cost = 0
-    for i in range(len(path) - 1):
-        u, v = path[i], path[i+1]
-        min_len = float('inf')
-        if graph.has_edge(u,v): # Verifica se existe alguma aresta entre u e v
-            # Iterar sobre as chaves das múltiplas arestas (se houver)
-            # graph[u][v] retorna um AtlasView, que é como um dicionário de dicionários de atributos
-            for k in graph[u][v]: 
-                 min_len = min(min_len, graph[u][v][k].get('length', float('inf')))
-            
-            if min_len == float('inf'): # Se nenhuma aresta tiver 'length' ou não for encontrada
-                print(f"MAIN.PY: Aviso - Aresta entre {u} e {v} não possui atributo 'length' válido.")
-            else:
-                cost += min_len
-        else:
-            # Isso não deveria acontecer se o caminho foi gerado corretamente pelo grafo
-            print(f"MAIN.PY: Aviso - Aresta não encontrada entre {u} e {v} no caminho {path}.")
-            return float('inf') # Indica um problema no caminho
-    return cost
-
 def main_testes_busca():
     print("MAIN.PY: Iniciando testes dos algoritmos de busca...")
 
-    # 1. Carregar e preparar o grafo e os pontos de ônibus
-    # O plot do grafo geral é opcional aqui, então definimos como False.
-    G, bus_stop_node_ids = carregar_e_preparar_grafo(plotar_grafo_geral=False)
+    # 1. Carregar o grafo compilado (CSR) e os pontos de ônibus do snapshot; as buscas rodam sobre ele.
+    grafo_csr, bus_stop_node_ids = carregar_grafo_preparado()
 
-    if G is None:
+    if grafo_csr is None:
         print("MAIN.PY: Falha ao carregar o grafo. Encerrando testes.")
         return
     
@@ -59,39 +34,44 @@ def main_testes_busca():
     goal_node_test = random.choice(bus_stop_node_ids)
     
     # Garantir que a origem não seja o mesmo que o destino e exista no grafo
-    possible_start_nodes = [n for n in G.nodes() if n != goal_node_test]
+    possible_start_nodes = [n for n in grafo_csr.node_ids.tolist() if n != goal_node_test]
     if not possible_start_nodes:
         print("MAIN.PY: Não há nós suficientes no grafo para selecionar uma origem diferente do destino.")
         return
     start_node_test = random.choice(possible_start_nodes)
     
-    # Garantir que os nós de teste realmente existem no grafo (importante se G for muito pequeno)
-    if not G.has_node(start_node_test) or not G.has_node(goal_node_test):
+    # Garantir que os nós de teste realmente existem no grafo (importante se o grafo for muito pequeno)
+    if start_node_test not in grafo_csr or goal_node_test not in grafo_csr:
         print(f"MAIN.PY: Nó de origem ({start_node_test}) ou destino ({goal_node_test}) não encontrado no grafo. Encerrando.")
         return
 
+    print(f"MAIN.PY: Grafo (CSR) com {grafo_csr.num_nos} nós e {grafo_csr.num_arestas} arestas "
+          f"({grafo_csr.nbytes() / 1e6:.1f} MB).")
+
+    # A rede de ruas é rasterizada uma vez (e guardada em disco); cada rota só desenha a sua polilinha.
+    mapa_base = carregar_mapa_base(grafo_csr)
+
     print(f"\nMAIN.PY: --- TESTE DOS ALGORITMOS DE BUSCA ---")
     print(f"Origem: {start_node_test}, Destino (Ponto de Ônibus): {goal_node_test}")
 
     # --- Testar UCS ---
     print("\nMAIN.PY: Executando Busca de Custo Uniforme (UCS)...")
-    path_ucs = uniform_cost_search(G, start_node_test, goal_node_test)
+    resultado_ucs = uniform_cost_search(grafo_csr, start_node_test, goal_node_test)
 
-    if path_ucs:
-        cost_ucs = calcular_custo_caminho(G, path_ucs)
+    if resultado_ucs:
+        path_ucs, cost_ucs = resultado_ucs.path, resultado_ucs.custo
         print(f"UCS - Caminho encontrado: {path_ucs}")
         print(f"UCS - Número de passos: {len(path_ucs)}")
         print(f"UCS - Custo do caminho (distância): {cost_ucs:.2f} metros")
+        print(f"UCS - Nós expandidos: {resultado_ucs.nos_assentados}, inserções na fila: {resultado_ucs.insercoes_fila}")
 
         output_filename_ucs = f"rota_ucs_{start_node_test}_para_{goal_node_test}.png"
         print(f"MAIN.PY: Plotando rota UCS e salvando em {output_filename_ucs}...")
         try:
-            fig, ax = ox.plot_graph_route(G, path_ucs, route_color='blue', route_linewidth=3,
-                                          node_size=0, show=False, close=False, save=True,
-                                          filepath=output_filename_ucs, dpi=300, bgcolor='w')
-            ax.set_title(f"Rota UCS de {start_node_test} para {goal_node_test}\nCusto: {cost_ucs:.0f}m", 
-                         color='black', y=0.01, fontsize=8)
-            plt.close(fig) # Fechar a figura para liberar memória
+            inicio_plot = time.perf_counter()
+            renderizar_rota(mapa_base, grafo_csr, path_ucs, arquivo=output_filename_ucs, cor='blue',
+                            titulo=f"Rota UCS de {start_node_test} para {goal_node_test} - Custo: {cost_ucs:.0f}m")
+            print(f"MAIN.PY: Rota UCS desenhada em {(time.perf_counter() - inicio_plot) * 1000:.1f} ms.")
         except Exception as e:
             print(f"MAIN.PY: Erro ao plotar/salvar rota UCS: {e}")
     else:
@@ -99,23 +79,22 @@ def main_testes_busca():
 
     # --- Testar A* ---
     print("\nMAIN.PY: Executando Busca A* (A-Estrela)...")
-    path_a_star = a_star_search(G, start_node_test, goal_node_test, heuristic_func=euclidean_distance_heuristic)
+    resultado_a_star = a_star_search(grafo_csr, start_node_test, goal_node_test, heuristic_func=euclidean_distance_heuristic)
 
-    if path_a_star:
-        cost_a_star = calcular_custo_caminho(G, path_a_star)
+    if resultado_a_star:
+        path_a_star, cost_a_star = resultado_a_star.path, resultado_a_star.custo
         print(f"A* - Caminho encontrado: {path_a_star}")
         print(f"A* - Número de passos: {len(path_a_star)}")
         print(f"A* - Custo do caminho (distância): {cost_a_star:.2f} metros")
+        print(f"A* - Nós expandidos: {resultado_a_star.nos_assentados}, inserções na fila: {resultado_a_star.insercoes_fila}")
 
         output_filename_a_star = f"rota_a_star_{start_node_test}_para_{goal_node_test}.png"
         print(f"MAIN.PY: Plotando rota A* e salvando em {output_filename_a_star}...")
         try:
-            fig, ax = ox.plot_graph_route(G, path_a_star, route_color='green', route_linewidth=3,
-                                          node_size=0, show=False, close=False, save=True,
-                                          filepath=output_filename_a_star, dpi=300, bgcolor='w')
-            ax.set_title(f"Rota A* de {start_node_test} para {goal_node_test}\nCusto: {cost_a_star:.0f}m", 
-                         color='black', y=0.01, fontsize=8)
-            plt.close(fig) # Fechar a figura para liberar memória
+            inicio_plot = time.perf_counter()
+            renderizar_rota(mapa_base, grafo_csr, path_a_star, arquivo=output_filename_a_star, cor='green',
+                            titulo=f"Rota A* de {start_node_test} para {goal_node_test} - Custo: {cost_a_star:.0f}m")
+            print(f"MAIN.PY: Rota A* desenhada em {(time.perf_counter() - inicio_plot) * 1000:.1f} ms.")
         except Exception as e:
             print(f"MAIN.PY: Erro ao plotar/salvar rota A*: {e}")
             
@@ -0,0 +1,113 @@
+# nearest_stop.py
+import os
+
+import numpy as np
+
+from dijkstra import distancias_a_partir_de
+
+# Arquivos do campo de pontos de ônibus dentro do diretório do snapshot
+ARQUIVOS_CAMPO = {
+    "distancia": "campo_distancia.npy",
+    "ponto": "campo_ponto.npy",
+    "proximo": "campo_proximo.npy",
+}
+
+
+class CampoPontosOnibus:
+    """
+    Para cada nó do grafo: a distância de caminhada até o ponto de ônibus mais próximo,
+    qual é esse ponto e o próximo nó do caminho até ele.
+
+    Atributos:
+        grafo (GrafoCSR): O grafo a que o campo se refere.
+        distancia (numpy.ndarray[float32]): Distância em metros (inf se nenhum ponto é alcançável).
+            float32 basta: o erro de arredondamento é de milímetros para distâncias urbanas.
+        ponto (numpy.ndarray[int32]): Índice do ponto de ônibus mais próximo (-1 se não houver).
+        proximo (numpy.ndarray[int32]): Índice do próximo nó no caminho até o ponto (-1 no próprio ponto).
+    """
+
+    def __init__(self, grafo, distancia, ponto, proximo):
+        self.grafo = grafo
+        self.distancia = distancia
+        self.ponto = ponto
+        self.proximo = proximo
+
+    def distancia_ate_ponto(self, node_id):
+        """Distância (m) do nó até o ponto de ônibus mais próximo. inf se não houver."""
+        i = self.grafo.indice(node_id)
+        return float('inf') if i is None else float(self.distancia[i])
+
+    def ponto_mais_proximo(self, node_id):
+        """ID OSM do ponto de ônibus mais próximo do nó, ou None se nenhum for alcançável."""
+        i = self.grafo.indice(node_id)
+        if i is None or self.ponto[i] < 0:
+            return None
+        return int(self.grafo.node_ids[self.ponto[i]])
+
+    def caminho_ate_ponto(self, node_id):
+        """
+        Caminho (lista de IDs OSM) do nó até o ponto de ônibus mais próximo, seguindo os
+        próximos passos. Retorna None se nenhum ponto for alcançável.
+        """
+        i = self.grafo.indice(node_id)
+        if i is None or self.ponto[i] < 0:
+            return None
+        path = [i]
+        while self.proximo[path[-1]] >= 0:
+            path.append(int(self.proximo[path[-1]]))
+        return self.grafo.ids_osm(path)
+
+
+def calcular_campo_pontos(grafo, bus_stop_node_ids):
+    """
+    Calcula o campo de pontos de ônibus com um único Dijkstra de múltiplas origens no grafo
+    reverso, partindo de todos os nós de `bus_stop_node_ids` ao mesmo tempo.
+
+    No grafo reverso, a distância de um ponto até v é a distância de caminhada de v até o
+    ponto no grafo original, e o predecessor de v na árvore é o próximo passo de v até ele.
+
+    Args:
+        grafo (GrafoCSR): O grafo compilado.
+        bus_stop_node_ids (list): IDs OSM dos nós que são pontos de ônibus.
+
+    Returns:
+        CampoPontosOnibus: O campo calculado.
+    """
+    origens = {grafo.indice(node_id) for node_id in bus_stop_node_ids} - {None}
+    distancia, proximo = distancias_a_partir_de(grafo.reverso(), sorted(origens))
+
+    # O ponto mais próximo é a raiz da árvore: "pular ponteiros" até estabilizar
+    # (log da profundidade iterações, todas vetorizadas).
+    ponto = np.where(proximo >= 0, proximo, np.arange(grafo.num_nos, dtype=np.int32))
+    ponto[~np.isfinite(distancia)] = -1
+    alcancados = ponto >= 0
+    while True:
+        novo = ponto.copy()
+        novo[alcancados] = ponto[ponto[alcancados]]
+        if np.array_equal(novo, ponto):
+            break
+        ponto = novo
+
+    return CampoPontosOnibus(grafo, distancia.astype(np.float32), ponto.astype(np.int32), proximo)
+
+
+def salvar_campo(campo, diretorio):
+    """Salva os arrays do campo em `diretorio` (normalmente o diretório do snapshot)."""
+    for nome, arquivo in ARQUIVOS_CAMPO.items():
+        np.save(os.path.join(diretorio, arquivo), getattr(campo, nome))
+
+
+def carregar_campo(grafo, diretorio, mmap=True):
+    """
+    Carrega o campo salvo por `salvar_campo` (mapeado em memória por padrão), ou None se
+    os arquivos não existirem ou não corresponderem ao tamanho do grafo.
+    """
+    mmap_mode = "r" if mmap else None
+    try:
+        arrays = {nome: np.load(os.path.join(diretorio, arquivo), mmap_mode=mmap_mode)
+                  for nome, arquivo in ARQUIVOS_CAMPO.items()}
+    except (FileNotFoundError, ValueError):
+        return None
+    if any(len(array) != grafo.num_nos for array in arrays.values()):
+        return None
+    return CampoPontosOnibus(grafo, **arrays)
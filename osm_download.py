@@ -0,0 +1,780 @@
+# osm_download.py
+import gzip
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from a_star import haversine_metros
+from graph import FEATURES_FILEPATH_GEOJSON, GRAPH_FILEPATH, PLACE_FILE_PREFIX, PLACE_NAME
+
+# O mesmo endpoint configurado em graph.py (ox.settings.overpass_endpoint)
+OVERPASS_ENDPOINT = "https://overpass.kumi.systems/api/interpreter"
+NOMINATIM_ENDPOINT = "https://nominatim.openstreetmap.org/search"
+USER_AGENT = "Tp1_IA_LLM osm_download"
+
+# Diretório dos tiles baixados (respostas do Overpass comprimidas + manifest.json)
+TILES_DIRPATH = f"{PLACE_FILE_PREFIX}_tiles"
+
+# Cache HTTP do osmnx: a resposta do Nominatim com o polígono do lugar costuma já estar lá
+OSMNX_CACHE_DIRPATH = "cache"
+
+# Lado dos tiles em graus (~5,5 km em Belo Horizonte). Tiles menores deixam cada consulta leve
+# para o Overpass e tornam barato baixar de novo só uma região.
+TAMANHO_TILE_PADRAO = 0.05
+
+# Consultas simultâneas. As instâncias públicas do Overpass limitam os slots por IP; mais
+# conexões que isso só geram respostas 429.
+NUM_CONEXOES_PADRAO = 2
+
+# Novas tentativas por tile, com espera exponencial (com variação aleatória) entre elas
+TENTATIVAS_PADRAO = 6
+ESPERA_BASE_S = 2.0
+ESPERA_MAXIMA_S = 120.0
+
+# O mesmo timeout configurado em graph.py (ox.settings.timeout)
+TIMEOUT_S = 300
+
+# Intervalo mínimo entre gravações do manifesto durante o download. Uma interrupção perde no
+# máximo os registros desse intervalo (os arquivos ficam no disco e são baixados de novo).
+INTERVALO_MANIFESTO_S = 1.0
+
+# Filtro da rede de caminhada (network_type="walk" do osmnx)
+FILTRO_CAMINHADA = ('["highway"]["area"!~"yes"]["access"!~"private"]'
+                    '["highway"!~"abandoned|bus_guideway|construction|cycleway|motor|no|planned|platform|proposed|raceway|razed"]'
+                    '["foot"!~"no"]["service"!~"private"]')
+
+# As mesmas tags da consulta de pontos de ônibus de graph.py
+TAGS_PONTOS_ONIBUS = {"public_transport": "platform", "highway": "bus_stop"}
+
+TIPOS = ("walk", "bus_stops")
+
+# Subdivisão de cada tile na grade usada para recortar os nós pelo polígono (ver dentro_do_poligono)
+CELULAS_POR_TILE = 16
+
+ARQUIVO_MANIFESTO = "manifest.json"
+
+# Incrementar se o formato dos arquivos de tiles mudar; tiles de outra versão são baixados de novo.
+VERSAO_TILES = 1
+
+
+class ErroOverpass(Exception):
+    """Falha numa consulta ao Overpass. `retentavel` diz se vale tentar de novo (429, 5xx, timeout...)."""
+
+    def __init__(self, mensagem, retentavel=True, espera=None):
+        super().__init__(mensagem)
+        self.retentavel = retentavel
+        self.espera = espera
+
+
+# --- Polígono do lugar e divisão em tiles ---
+
+def _aneis_geojson(geojson):
+    """Anéis (arrays (k, 2) de lon, lat) de um Polygon ou MultiPolygon em GeoJSON."""
+    if geojson["type"] == "Polygon":
+        poligonos = [geojson["coordinates"]]
+    elif geojson["type"] == "MultiPolygon":
+        poligonos = geojson["coordinates"]
+    else:
+        raise ValueError(f"Geometria do lugar não é um polígono: {geojson['type']}")
+    return [np.array(anel, dtype=np.float64)[:, :2] for poligono in poligonos for anel in poligono]
+
+
+def carregar_poligono(lugar=PLACE_NAME, diretorio_cache=OSMNX_CACHE_DIRPATH, endpoint_nominatim=NOMINATIM_ENDPOINT):
+    """
+    Polígono do lugar: primeiro procura a resposta do Nominatim no cache HTTP do osmnx; se não
+    houver, consulta o Nominatim. Com outro `endpoint_nominatim` (como o do servidor local), o
+    cache do osmnx, que só tem respostas do Nominatim público, é ignorado.
+
+    Returns:
+        list: Anéis do polígono (arrays (k, 2) de lon, lat), exterior(es) e buracos juntos
+              (o teste de ponto no polígono usa a regra par-ímpar).
+    """
+    nome = lugar.split(",")[0].strip()
+    if endpoint_nominatim == NOMINATIM_ENDPOINT and os.path.isdir(diretorio_cache):
+        for arquivo in sorted(os.listdir(diretorio_cache)):
+            if not arquivo.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(diretorio_cache, arquivo), encoding="utf-8") as f:
+                    resposta = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if isinstance(resposta, list) and resposta and isinstance(resposta[0], dict) and \
+                    "geojson" in resposta[0] and resposta[0].get("display_name", "").startswith(nome):
+                return _aneis_geojson(resposta[0]["geojson"])
+
+    parametros = urllib.parse.urlencode({"q": lugar, "format": "json", "polygon_geojson": 1, "limit": 1})
+    pedido = urllib.request.Request(f"{endpoint_nominatim}?{parametros}", headers={"User-Agent": USER_AGENT})
+    with urllib.request.urlopen(pedido, timeout=TIMEOUT_S) as resposta:
+        resultados = json.load(resposta)
+    if not resultados:
+        raise ValueError(f"Lugar não encontrado no Nominatim: {lugar}")
+    return _aneis_geojson(resultados[0]["geojson"])
+
+
+def _segmentos(aneis):
+    """Arestas de todos os anéis como arrays (x0, y0, x1, y1)."""
+    x0 = np.concatenate([anel[:-1, 0] for anel in aneis])
+    y0 = np.concatenate([anel[:-1, 1] for anel in aneis])
+    x1 = np.concatenate([anel[1:, 0] for anel in aneis])
+    y1 = np.concatenate([anel[1:, 1] for anel in aneis])
+    return x0, y0, x1, y1
+
+
+def _cruzam_retangulo(segmentos, oeste, sul, leste, norte):
+    """Quais segmentos passam pelo retângulo (recorte de Liang-Barsky, vetorizado)."""
+    x0, y0, x1, y1 = segmentos
+    dx, dy = x1 - x0, y1 - y0
+    t0, t1 = np.zeros(len(x0)), np.ones(len(x0))
+    rejeitados = np.zeros(len(x0), dtype=bool)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for p, q in ((-dx, x0 - oeste), (dx, leste - x0), (-dy, y0 - sul), (dy, norte - y0)):
+            r = q / p
+            rejeitados |= (p == 0) & (q < 0)
+            t0 = np.where(p < 0, np.maximum(t0, r), t0)
+            t1 = np.where(p > 0, np.minimum(t1, r), t1)
+    return ~rejeitados & (t0 <= t1)
+
+
+def _raio_horizontal(lon, lat, segmentos, tamanho_lote=2048):
+    """Teste de ponto no polígono por força bruta (raio horizontal, regra par-ímpar)."""
+    x0, y0, x1, y1 = segmentos
+    dentro = np.zeros(len(lon), dtype=bool)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for inicio in range(0, len(lon), tamanho_lote):
+            px = lon[inicio:inicio + tamanho_lote, None]
+            py = lat[inicio:inicio + tamanho_lote, None]
+            cruza = ((y0 > py) != (y1 > py)) & (px < x0 + (py - y0) * (x1 - x0) / (y1 - y0))
+            dentro[inicio:inicio + tamanho_lote] = np.count_nonzero(cruza, axis=1) % 2 == 1
+    return dentro
+
+
+def dentro_do_poligono(lon, lat, aneis, celula=None):
+    """
+    Teste de ponto no polígono para arrays de pontos.
+
+    Com `celula` (em graus), os pontos são antes agrupados numa grade: células que o contorno não
+    corta estão inteiramente dentro ou fora (basta testar o centro), e só os pontos das células
+    cortadas passam pelo teste completo contra todas as arestas do polígono.
+    """
+    segmentos = _segmentos(aneis)
+    lon, lat = np.asarray(lon, dtype=np.float64), np.asarray(lat, dtype=np.float64)
+    if celula is None or len(lon) == 0:
+        return _raio_horizontal(lon, lat, segmentos)
+
+    chaves, por_ponto = np.unique(np.column_stack((np.floor(lon / celula), np.floor(lat / celula))),
+                                  axis=0, return_inverse=True)
+    por_ponto = por_ponto.reshape(-1)
+    cortadas = np.array([_cruzam_retangulo(segmentos, ix * celula, iy * celula, (ix + 1) * celula,
+                                           (iy + 1) * celula).any() for ix, iy in chaves.tolist()], dtype=bool)
+    dentro = _raio_horizontal((chaves[:, 0] + 0.5) * celula, (chaves[:, 1] + 0.5) * celula, segmentos)[por_ponto]
+    testar = cortadas[por_ponto]
+    dentro[testar] = _raio_horizontal(lon[testar], lat[testar], segmentos)
+    return dentro
+
+
+def id_tile(lon, lat, tamanho=TAMANHO_TILE_PADRAO):
+    """ID do tile que contém o ponto. Os tiles seguem uma grade global, então o ID é estável."""
+    return f"{int(np.floor(lon / tamanho))}_{int(np.floor(lat / tamanho))}"
+
+
+def dividir_em_tiles(aneis, tamanho=TAMANHO_TILE_PADRAO):
+    """
+    Divide o polígono numa grade de tiles de `tamanho` graus, mantendo só os que o tocam.
+
+    Returns:
+        list: Dicionários {"id", "bbox": [sul, oeste, norte, leste]}.
+    """
+    segmentos = _segmentos(aneis)
+    todos = np.concatenate(aneis)
+    ix0, ix1 = int(np.floor(todos[:, 0].min() / tamanho)), int(np.floor(todos[:, 0].max() / tamanho))
+    iy0, iy1 = int(np.floor(todos[:, 1].min() / tamanho)), int(np.floor(todos[:, 1].max() / tamanho))
+    tiles = []
+    for iy in range(iy0, iy1 + 1):
+        for ix in range(ix0, ix1 + 1):
+            oeste, sul, leste, norte = ix * tamanho, iy * tamanho, (ix + 1) * tamanho, (iy + 1) * tamanho
+            if _cruzam_retangulo(segmentos, oeste, sul, leste, norte).any() or \
+                    dentro_do_poligono([oeste + tamanho / 2], [sul + tamanho / 2], aneis)[0]:
+                tiles.append({"id": f"{ix}_{iy}", "bbox": [round(sul, 9), round(oeste, 9), round(norte, 9), round(leste, 9)]})
+    return tiles
+
+
+# --- Consultas ao Overpass ---
+
+def consulta_overpass(tipo, bbox, timeout=TIMEOUT_S):
+    """Consulta Overpass QL de um tile: a rede de caminhada ("walk") ou os pontos de ônibus ("bus_stops")."""
+    caixa = "({:.7f},{:.7f},{:.7f},{:.7f})".format(*bbox)
+    if tipo == "walk":
+        return f"[out:json][timeout:{timeout}];(way{FILTRO_CAMINHADA}{caixa};>;);out;"
+    partes = "".join(f'{elemento}["{chave}"="{valor}"]{caixa};'
+                     for chave, valor in TAGS_PONTOS_ONIBUS.items() for elemento in ("node", "way"))
+    return f"[out:json][timeout:{timeout}];({partes});out center;"
+
+
+def _assinatura_consulta(tipo):
+    """Hash da consulta sem a caixa: se o filtro mudar, os tiles salvos deixam de valer."""
+    return hashlib.sha1(consulta_overpass(tipo, (0, 0, 0, 0)).encode()).hexdigest()[:16]
+
+
+def _requisitar(endpoint, consulta, timeout):
+    """
+    Envia uma consulta ao Overpass.
+
+    Returns:
+        tuple: (bytes, int) com o corpo da resposta (JSON) e o número de elementos.
+
+    Raises:
+        ErroOverpass: Em erro HTTP, de rede, resposta inválida ou erro de execução no servidor.
+    """
+    pedido = urllib.request.Request(endpoint, data=urllib.parse.urlencode({"data": consulta}).encode(),
+                                    headers={"User-Agent": USER_AGENT})
+    try:
+        with urllib.request.urlopen(pedido, timeout=timeout) as resposta:
+            corpo = resposta.read()
+    except urllib.error.HTTPError as e:
+        espera = e.headers.get("Retry-After") if e.headers else None
+        raise ErroOverpass(f"HTTP {e.code}", retentavel=e.code in (429, 502, 503, 504),
+                           espera=float(espera) if espera and espera.isdigit() else None)
+    except (urllib.error.URLError, TimeoutError, ConnectionError) as e:
+        raise ErroOverpass(f"Erro de rede: {e}")
+
+    try:
+        dados = json.loads(corpo)
+    except ValueError:
+        raise ErroOverpass("Resposta do Overpass não é JSON válido")
+    # Timeout ou falta de memória no servidor chegam como HTTP 200 com um 'remark'
+    if "runtime error" in dados.get("remark", ""):
+        raise ErroOverpass(f"Overpass: {dados['remark']}")
+    return corpo, len(dados.get("elements", []))
+
+
+def _baixar_tile(tile, tipo, endpoint, diretorio, tentativas, timeout, espera_base_s):
+    """Baixa um tile com novas tentativas e grava a resposta comprimida (gzip) de forma atômica."""
+    consulta = consulta_overpass(tipo, tile["bbox"], timeout)
+    for tentativa in range(1, tentativas + 1):
+        try:
+            corpo, num_elementos = _requisitar(endpoint, consulta, timeout)
+            break
+        except ErroOverpass as e:
+            if not e.retentavel or tentativa == tentativas:
+                raise
+            time.sleep(e.espera if e.espera is not None else
+                       min(ESPERA_MAXIMA_S, espera_base_s * 2 ** (tentativa - 1)) * random.uniform(0.5, 1.5))
+
+    arquivo = f"{tipo}_{tile['id']}.json.gz"
+    caminho = os.path.join(diretorio, arquivo)
+    temporario = f"{caminho}.tmp-{threading.get_ident()}"
+    with gzip.open(temporario, "wb", compresslevel=6) as f:
+        f.write(corpo)
+    os.replace(temporario, caminho)
+    return {"arquivo": arquivo, "elementos": num_elementos, "bytes": len(corpo),
+            "bytes_comprimidos": os.path.getsize(caminho), "baixado_em": time.time(),
+            "consulta": _assinatura_consulta(tipo), "tentativas": tentativa}
+
+
+# --- Manifesto e download concorrente ---
+
+def ler_manifesto(diretorio=TILES_DIRPATH):
+    try:
+        with open(os.path.join(diretorio, ARQUIVO_MANIFESTO), encoding="utf-8") as f:
+            manifesto = json.load(f)
+        if manifesto.get("versao") == VERSAO_TILES:
+            return manifesto
+    except (FileNotFoundError, json.JSONDecodeError):
+        pass
+    return {"versao": VERSAO_TILES, "tiles": {}}
+
+
+def _salvar_manifesto(diretorio, manifesto):
+    caminho = os.path.join(diretorio, ARQUIVO_MANIFESTO)
+    temporario = f"{caminho}.tmp-{os.getpid()}"
+    with open(temporario, "w", encoding="utf-8") as f:
+        json.dump(manifesto, f)
+    os.replace(temporario, caminho)
+
+
+def _tile_valido(manifesto, diretorio, tile, tipo):
+    registro = manifesto["tiles"].get(tile["id"], {}).get(tipo)
+    return registro is not None and registro.get("consulta") == _assinatura_consulta(tipo) and \
+        os.path.exists(os.path.join(diretorio, registro["arquivo"]))
+
+
+def baixar_tiles(tiles, diretorio=TILES_DIRPATH, endpoint=OVERPASS_ENDPOINT, num_conexoes=NUM_CONEXOES_PADRAO,
+                 tentativas=TENTATIVAS_PADRAO, forcar=(), timeout=TIMEOUT_S, espera_base_s=ESPERA_BASE_S):
+    """
+    Baixa a rede de caminhada e os pontos de ônibus de cada tile, `num_conexoes` consultas por vez.
+
+    Retomável: os tiles concluídos são registrados no manifesto (gravado no máximo a cada
+    INTERVALO_MANIFESTO_S e ao final, mesmo se houver erro), e tiles já
+    registrados (com a mesma consulta e o arquivo presente) não são baixados de novo. Uma falha
+    num tile não interrompe os demais; basta rodar de novo para tentar só os que faltaram.
+
+    Args:
+        tiles (list): Tiles de `dividir_em_tiles`.
+        diretorio (str): Onde ficam os arquivos .json.gz e o manifest.json.
+        endpoint (str): URL do interpretador do Overpass.
+        num_conexoes (int): Consultas simultâneas.
+        tentativas (int): Tentativas por tile antes de desistir dele.
+        forcar (iterable): IDs de tiles a baixar de novo mesmo que já estejam salvos (atualização).
+        timeout (int): Timeout de cada consulta, em segundos.
+        espera_base_s (float): Espera antes da 2ª tentativa (dobra a cada nova tentativa).
+
+    Returns:
+        dict: tiles, baixados, reaproveitados, falhas ({"tile/tipo": mensagem}), bytes, bytes_comprimidos, tempo_s.
+    """
+    os.makedirs(diretorio, exist_ok=True)
+    manifesto = ler_manifesto(diretorio)
+    forcar = set(forcar)
+    for tile in tiles:
+        manifesto["tiles"].setdefault(tile["id"], {})["bbox"] = tile["bbox"]
+    pendentes = [(tile, tipo) for tile in tiles for tipo in TIPOS
+                 if tile["id"] in forcar or not _tile_valido(manifesto, diretorio, tile, tipo)]
+    _salvar_manifesto(diretorio, manifesto)
+
+    trava = threading.Lock()
+    falhas = {}
+    baixados = total_bytes = total_comprimidos = 0
+    inicio = ultimo_salvamento = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=num_conexoes) as executor:
+            futuros = {executor.submit(_baixar_tile, tile, tipo, endpoint, diretorio, tentativas, timeout,
+                                       espera_base_s): (tile, tipo) for tile, tipo in pendentes}
+            for futuro in as_completed(futuros):
+                tile, tipo = futuros[futuro]
+                try:
+                    registro = futuro.result()
+                except Exception as e:
+                    falhas[f"{tile['id']}/{tipo}"] = str(e)
+                    continue
+                with trava:
+                    manifesto["tiles"][tile["id"]][tipo] = registro
+                    # Regravar o manifesto a cada tile custaria O(n²) com milhares de tiles.
+                    if time.perf_counter() - ultimo_salvamento >= INTERVALO_MANIFESTO_S:
+                        _salvar_manifesto(diretorio, manifesto)
+                        ultimo_salvamento = time.perf_counter()
+                baixados += 1
+                total_bytes += registro["bytes"]
+                total_comprimidos += registro["bytes_comprimidos"]
+    finally:
+        with trava:
+            _salvar_manifesto(diretorio, manifesto)
+
+    return {"tiles": len(tiles), "baixados": baixados, "reaproveitados": len(tiles) * len(TIPOS) - len(pendentes),
+            "falhas": falhas, "bytes": total_bytes, "bytes_comprimidos": total_comprimidos,
+            "tempo_s": round(time.perf_counter() - inicio, 3)}
+
+
+def _elementos(diretorio, manifesto, tiles, tipo):
+    """Elementos OSM de todos os tiles, sem repetição (vias e nós nas divisas aparecem em mais de um tile)."""
+    vistos = {}
+    for tile in tiles:
+        with gzip.open(os.path.join(diretorio, manifesto["tiles"][tile["id"]][tipo]["arquivo"]), "rb") as f:
+            for elemento in json.load(f)["elements"]:
+                vistos[(elemento["type"], elemento["id"])] = elemento
+    return vistos.values()
+
+
+# --- Montagem do grafo e das features ---
+
+def _simplificar(adjacencia):
+    """
+    Junta as cadeias de nós de grau 2 numa aresta só, como o ox.simplify_graph: um nó é ponta
+    se tiver laço, vizinhos distintos diferentes de 2 ou arestas paralelas.
+
+    Args:
+        adjacencia (dict): {nó: [(vizinho, id da via), ...]}, sem direção (cada aresta nos dois nós).
+
+    Yields:
+        tuple: (lista de nós da cadeia, lista de IDs das vias), uma por sentido.
+    """
+    def e_ponta(no):
+        vizinhos = [v for v, _ in adjacencia[no]]
+        return len(vizinhos) != 2 or len(set(vizinhos)) != 2 or no in vizinhos
+
+    pontas = {no for no in adjacencia if e_ponta(no)}
+    visitados = set(pontas)
+    inicios = list(pontas)
+    while inicios:
+        for u in inicios:
+            for v, via in adjacencia[u]:
+                cadeia, vias = [u, v], [via]
+                while v not in pontas:
+                    visitados.add(v)
+                    (a, via_a), (b, via_b) = adjacencia[v]
+                    v, via = (b, via_b) if a == cadeia[-2] else (a, via_a)
+                    cadeia.append(v)
+                    vias.append(via)
+                yield cadeia, vias
+        # Anéis isolados não têm pontas: um nó de cada anel restante vira ponta
+        inicios = [next((no for no in adjacencia if no not in visitados), None)]
+        if inicios[0] is None:
+            return
+        pontas.add(inicios[0])
+        visitados.add(inicios[0])
+
+
+def montar_grafo(diretorio, tiles, aneis, tamanho=TAMANHO_TILE_PADRAO, simplificar=True):
+    """
+    Junta os tiles num MultiDiGraph no formato do osmnx (x/y nos nós, 'length' em metros e
+    'osmid' nas arestas, todas as vias nos dois sentidos, como em network_type="walk"),
+    recortado pelo polígono e restrito à maior componente conexa, como o ox.graph_from_place.
+
+    Returns:
+        networkx.MultiDiGraph: O grafo.
+    """
+    import networkx as nx
+
+    manifesto = ler_manifesto(diretorio)
+    coordenadas = {}
+    vias = {}
+    for elemento in _elementos(diretorio, manifesto, tiles, "walk"):
+        if elemento["type"] == "node":
+            coordenadas[elemento["id"]] = (elemento["lon"], elemento["lat"])
+        elif elemento["type"] == "way":
+            vias[elemento["id"]] = (elemento["nodes"], elemento.get("tags", {}))
+
+    ids = np.fromiter(coordenadas.keys(), dtype=np.int64, count=len(coordenadas))
+    lon_lat = np.array(list(coordenadas.values()), dtype=np.float64).reshape(-1, 2)
+    lon, lat = lon_lat[:, 0], lon_lat[:, 1]
+    mantidos = set(ids[dentro_do_poligono(lon, lat, aneis, celula=tamanho / CELULAS_POR_TILE)].tolist())
+
+    adjacencia = {}
+    for via, (nos, _) in vias.items():
+        for u, v in zip(nos, nos[1:]):
+            if u != v and u in mantidos and v in mantidos:
+                adjacencia.setdefault(u, []).append((v, via))
+                adjacencia.setdefault(v, []).append((u, via))
+
+    # Maior componente conexa (sem direção, já que todas as arestas existem nos dois sentidos)
+    componente, maior = {}, set()
+    for inicio in adjacencia:
+        if inicio in componente:
+            continue
+        atual, pilha = {inicio}, [inicio]
+        componente[inicio] = inicio
+        while pilha:
+            for v, _ in adjacencia[pilha.pop()]:
+                if v not in componente:
+                    componente[v] = inicio
+                    atual.add(v)
+                    pilha.append(v)
+        if len(atual) > len(maior):
+            maior = atual
+    adjacencia = {u: arestas for u, arestas in adjacencia.items() if u in maior}
+
+    if simplificar:
+        cadeias = _simplificar(adjacencia)
+    else:
+        cadeias = (([u, v], [via]) for u, arestas in adjacencia.items() for v, via in arestas)
+
+    G = nx.MultiDiGraph(crs="epsg:4326", simplified=simplificar, created_with=USER_AGENT)
+    for cadeia, ids_vias in cadeias:
+        x, y = np.array([coordenadas[no] for no in cadeia]).T
+        atributos = {"length": float(haversine_metros(x[:-1], y[:-1], x[1:], y[1:]).sum()), "oneway": False}
+        ids_distintos = list(dict.fromkeys(ids_vias))
+        atributos["osmid"] = ids_distintos[0] if len(ids_distintos) == 1 else ids_distintos
+        for chave in ("highway", "name"):
+            valores = list(dict.fromkeys(vias[via][1][chave] for via in ids_distintos if chave in vias[via][1]))
+            if valores:
+                atributos[chave] = valores[0] if len(valores) == 1 else valores
+        if len(cadeia) > 2:
+            atributos["geometry"] = "LINESTRING (" + ", ".join(f"{a} {b}" for a, b in zip(x.tolist(), y.tolist())) + ")"
+        G.add_edge(cadeia[0], cadeia[-1], **atributos)
+
+    for no in G.nodes:
+        lon_no, lat_no = coordenadas[no]
+        G.nodes[no].update(osmid=no, x=lon_no, y=lat_no, street_count=len(adjacencia[no]))
+    return G
+
+
+def montar_features(diretorio, tiles, aneis):
+    """
+    Junta os pontos de ônibus dos tiles numa FeatureCollection GeoJSON (pontos; vias pelo centro),
+    com as tags OSM como propriedades, só os que estão dentro do polígono.
+    """
+    manifesto = ler_manifesto(diretorio)
+    features = []
+    for elemento in _elementos(diretorio, manifesto, tiles, "bus_stops"):
+        ponto = elemento.get("center", elemento)
+        if "lon" not in ponto or "lat" not in ponto:
+            continue
+        features.append({"type": "Feature", "geometry": {"type": "Point", "coordinates": [ponto["lon"], ponto["lat"]]},
+                         "properties": {"element_type": elemento["type"], "osmid": elemento["id"],
+                                        **elemento.get("tags", {})}})
+    if features:
+        lon, lat = np.array([f["geometry"]["coordinates"] for f in features]).T
+        dentro = dentro_do_poligono(lon, lat, aneis, celula=TAMANHO_TILE_PADRAO / CELULAS_POR_TILE)
+        features = [f for f, d in zip(features, dentro.tolist()) if d]
+    return {"type": "FeatureCollection", "features": features}
+
+
+def salvar_graphml(G, caminho):
+    """Salva o grafo em GraphML como o ox.save_graphml (atributos como texto), para o ox.load_graphml."""
+    import networkx as nx
+
+    texto = nx.MultiDiGraph(**{k: str(v) for k, v in G.graph.items()})
+    texto.add_nodes_from((no, {k: str(v) for k, v in dados.items()}) for no, dados in G.nodes(data=True))
+    texto.add_edges_from((u, v, chave, {k: str(valor) for k, valor in dados.items()})
+                         for u, v, chave, dados in G.edges(keys=True, data=True))
+    temporario = f"{caminho}.tmp-{os.getpid()}"
+    nx.write_graphml(texto, temporario, encoding="utf-8")
+    os.replace(temporario, caminho)
+
+
+def baixar_lugar(lugar=PLACE_NAME, diretorio=TILES_DIRPATH, endpoint=OVERPASS_ENDPOINT,
+                 endpoint_nominatim=NOMINATIM_ENDPOINT, tamanho_tile=TAMANHO_TILE_PADRAO,
+                 num_conexoes=NUM_CONEXOES_PADRAO, tentativas=TENTATIVAS_PADRAO, atualizar=(), max_idade_s=None,
+                 arquivo_grafo=GRAPH_FILEPATH, arquivo_features=FEATURES_FILEPATH_GEOJSON, simplificar=True,
+                 espera_base_s=ESPERA_BASE_S, aneis=None):
+    """
+    Etapa de ingestão: divide o polígono do lugar em tiles, baixa-os em paralelo (com novas
+    tentativas e retomada), junta tudo e grava o GraphML e o GeoJSON dos pontos de ônibus nos
+    mesmos arquivos que `carregar_e_preparar_grafo` lê.
+
+    Args:
+        lugar (str): Nome do lugar (para o Nominatim).
+        diretorio (str): Diretório dos tiles.
+        endpoint, endpoint_nominatim (str): URLs do Overpass e do Nominatim.
+        tamanho_tile (float): Lado dos tiles em graus.
+        num_conexoes, tentativas: Ver `baixar_tiles`.
+        atualizar (iterable): IDs de tiles a baixar de novo (atualização incremental).
+        max_idade_s (float): Baixa de novo os tiles salvos há mais que isso.
+        arquivo_grafo, arquivo_features (str): Arquivos de saída.
+        simplificar (bool): Juntar as cadeias de nós de grau 2, como o osmnx faz por padrão.
+        espera_base_s (float): Ver `baixar_tiles`.
+        aneis (list): Polígono já conhecido (anéis lon/lat); se None, vem do manifesto ou de `carregar_poligono`.
+
+    Returns:
+        dict: As estatísticas de `baixar_tiles` mais nos, arestas e pontos_onibus.
+
+    Raises:
+        RuntimeError: Se algum tile falhou depois de todas as tentativas (rodar de novo retoma dali).
+    """
+    os.makedirs(diretorio, exist_ok=True)
+    manifesto = ler_manifesto(diretorio)
+    if aneis is None:
+        if manifesto.get("lugar") == lugar and "poligono" in manifesto:
+            aneis = [np.array(anel) for anel in manifesto["poligono"]]
+        else:
+            aneis = carregar_poligono(lugar, endpoint_nominatim=endpoint_nominatim)
+    manifesto.update(lugar=lugar, poligono=[anel.tolist() for anel in aneis], tamanho_tile=tamanho_tile)
+    _salvar_manifesto(diretorio, manifesto)
+
+    tiles = dividir_em_tiles(aneis, tamanho_tile)
+    forcar = set(atualizar)
+    if max_idade_s is not None:
+        limite = time.time() - max_idade_s
+        forcar |= {tile["id"] for tile in tiles
+                   if any(manifesto["tiles"].get(tile["id"], {}).get(tipo, {}).get("baixado_em", 0) < limite
+                          for tipo in TIPOS)}
+
+    estatisticas = baixar_tiles(tiles, diretorio, endpoint, num_conexoes, tentativas, forcar,
+                                espera_base_s=espera_base_s)
+    if estatisticas["falhas"]:
+        raise RuntimeError(f"{len(estatisticas['falhas'])} downloads de tiles falharam ({', '.join(sorted(estatisticas['falhas']))}); "
+                           f"rode de novo para retomar só os que faltam")
+
+    G = montar_grafo(diretorio, tiles, aneis, tamanho_tile, simplificar)
+    features = montar_features(diretorio, tiles, aneis)
+    salvar_graphml(G, arquivo_grafo)
+    temporario = f"{arquivo_features}.tmp-{os.getpid()}"
+    with open(temporario, "w", encoding="utf-8") as f:
+        json.dump(features, f, ensure_ascii=False)
+    os.replace(temporario, arquivo_features)
+
+    estatisticas.update(nos=G.number_of_nodes(), arestas=G.number_of_edges(), pontos_onibus=len(features["features"]))
+    return estatisticas
+
+
+# --- Overpass local para testes ---
+
+def elementos_de_fixture(caminho_arquivo=None):
+    """
+    Converte o grafo pequeno de `fixtures/` em elementos OSM (nós, uma via por rua e pontos de
+    ônibus como nós com tags), para servir pelo `ServidorOverpassLocal`.
+
+    Returns:
+        tuple: (list, list) com os elementos e os anéis de um polígono que cobre o grafo.
+    """
+    from benchmark import FIXTURE_FILEPATH
+
+    with open(caminho_arquivo or FIXTURE_FILEPATH, encoding="utf-8") as f:
+        dados = json.load(f)
+    elementos = [{"type": "node", "id": node_id, "lon": x, "lat": y} for node_id, x, y in dados["nodes"]]
+    pares = sorted({(min(u, v), max(u, v)) for u, v, _ in dados["edges"] if u != v})
+    elementos += [{"type": "way", "id": i + 1, "nodes": [u, v], "tags": {"highway": "footway"}}
+                  for i, (u, v) in enumerate(pares)]
+    coordenadas = {node_id: (x, y) for node_id, x, y in dados["nodes"]}
+    for i, (node_id, info) in enumerate(dados["bus_stops"].items()):
+        x, y = coordenadas[int(node_id)]
+        elementos.append({"type": "node", "id": 10 ** 12 + i, "lon": x + 1e-5, "lat": y + 1e-5, "tags": dict(info)})
+
+    x, y = np.array(list(coordenadas.values())).T
+    margem = 0.001
+    anel = np.array([[x.min() - margem, y.min() - margem], [x.max() + margem, y.min() - margem],
+                     [x.max() + margem, y.max() + margem], [x.min() - margem, y.max() + margem],
+                     [x.min() - margem, y.min() - margem]])
+    return elementos, [anel]
+
+
+class ServidorOverpassLocal:
+    """
+    Substituto local do Overpass (e do Nominatim) para testar a ingestão sem rede: responde às
+    consultas de `consulta_overpass` a partir de uma lista de elementos OSM, filtrando pela caixa
+    da consulta, e pode injetar falhas (HTTP 429, 504 e erro de execução com HTTP 200).
+
+    Uso:
+        with ServidorOverpassLocal(*elementos_de_fixture(), taxa_falhas=0.2) as servidor:
+            baixar_lugar(endpoint=servidor.endpoint, endpoint_nominatim=servidor.endpoint_nominatim, ...)
+
+    Atributos:
+        requisicoes (int): Consultas recebidas.
+        falhas (int): Consultas respondidas com falha injetada.
+        por_tile (dict): Consultas recebidas por caixa (sul, oeste, norte, leste).
+    """
+
+    _CAIXA = re.compile(r"\((-?[\d.]+),(-?[\d.]+),(-?[\d.]+),(-?[\d.]+)\)")
+
+    def __init__(self, elementos, aneis=None, taxa_falhas=0.0, seed=0, atraso_s=0.0):
+        self.nos = {e["id"]: e for e in elementos if e["type"] == "node"}
+        self.vias = [e for e in elementos if e["type"] == "way"]
+        self.aneis = aneis
+        self.taxa_falhas = taxa_falhas
+        self.atraso_s = atraso_s
+        self.requisicoes = self.falhas = 0
+        self.por_tile = {}
+        self._rng = random.Random(seed)
+        self._trava = threading.Lock()
+        self._servidor = None
+
+    @property
+    def endpoint(self):
+        return f"http://127.0.0.1:{self._servidor.server_port}/api/interpreter"
+
+    @property
+    def endpoint_nominatim(self):
+        return f"http://127.0.0.1:{self._servidor.server_port}/search"
+
+    def __enter__(self):
+        servidor_local = self
+
+        class Manipulador(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _responder(self, status, dados, cabecalhos=()):
+                corpo = json.dumps(dados).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(corpo)))
+                for nome, valor in cabecalhos:
+                    self.send_header(nome, valor)
+                self.end_headers()
+                self.wfile.write(corpo)
+
+            def do_GET(self):
+                anel = servidor_local.aneis[0].tolist() if servidor_local.aneis else []
+                self._responder(200, [{"display_name": PLACE_NAME, "geojson": {"type": "Polygon", "coordinates": [anel]}}])
+
+            def do_POST(self):
+                corpo = self.rfile.read(int(self.headers.get("Content-Length", 0))).decode()
+                consulta = urllib.parse.parse_qs(corpo).get("data", [""])[0]
+                status, dados, cabecalhos = servidor_local._resolver(consulta)
+                self._responder(status, dados, cabecalhos)
+
+        self._servidor = ThreadingHTTPServer(("127.0.0.1", 0), Manipulador)
+        threading.Thread(target=self._servidor.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *excecao):
+        self._servidor.shutdown()
+        self._servidor.server_close()
+
+    def _resolver(self, consulta):
+        caixa = self._CAIXA.search(consulta)
+        if caixa is None:
+            return 400, {"remark": "consulta sem caixa"}, ()
+        sul, oeste, norte, leste = (float(c) for c in caixa.groups())
+        with self._trava:
+            self.requisicoes += 1
+            self.por_tile[(sul, oeste, norte, leste)] = self.por_tile.get((sul, oeste, norte, leste), 0) + 1
+            falhar = self._rng.random() < self.taxa_falhas
+            tipo_falha = self._rng.choice(("429", "504", "remark"))
+            if falhar:
+                self.falhas += 1
+        if self.atraso_s:
+            time.sleep(self.atraso_s)
+        if falhar:
+            if tipo_falha == "429":
+                return 429, {"remark": "rate limited"}, (("Retry-After", "0"),)
+            if tipo_falha == "504":
+                return 504, {"remark": "gateway timeout"}, ()
+            return 200, {"elements": [], "remark": "runtime error: Query timed out"}, ()
+
+        def na_caixa(no):
+            return sul <= no["lat"] <= norte and oeste <= no["lon"] <= leste
+
+        if "bus_stop" in consulta:
+            elementos = [no for no in self.nos.values() if no.get("tags") and na_caixa(no)]
+        else:
+            vias = [via for via in self.vias if "highway" in via.get("tags", {}) and
+                    any(na_caixa(self.nos[no]) for no in via["nodes"])]
+            ids_nos = {no for via in vias for no in via["nodes"]}
+            elementos = vias + [self.nos[no] for no in sorted(ids_nos)]
+        return 200, {"version": 0.6, "generator": "ServidorOverpassLocal", "elements": elementos}, ()
+
+
+if __name__ == "__main__":
+    import argparse
+    import tempfile
+
+    parser = argparse.ArgumentParser(description="Baixa a rede de caminhada e os pontos de ônibus em tiles.")
+    parser.add_argument("--tamanho-tile", type=float, default=TAMANHO_TILE_PADRAO, help="Lado dos tiles em graus")
+    parser.add_argument("-c", "--conexoes", type=int, default=NUM_CONEXOES_PADRAO)
+    parser.add_argument("--tentativas", type=int, default=TENTATIVAS_PADRAO)
+    parser.add_argument("--atualizar", nargs="+", default=[], metavar="TILE", help="IDs de tiles a baixar de novo")
+    parser.add_argument("--atualizar-ponto", nargs=2, type=float, action="append", default=[], metavar=("LAT", "LON"),
+                        help="Baixar de novo o tile que contém o ponto; pode ser repetido")
+    parser.add_argument("--max-idade-h", type=float, help="Baixar de novo os tiles mais antigos que isso (horas)")
+    parser.add_argument("--servidor-local", action="store_true",
+                        help="Testar contra o Overpass local com o grafo da fixture (grava num diretório temporário)")
+    parser.add_argument("--taxa-falhas", type=float, default=0.2, help="Falhas injetadas pelo servidor local")
+    args = parser.parse_args()
+
+    atualizar = list(args.atualizar) + [id_tile(lon, lat, args.tamanho_tile) for lat, lon in args.atualizar_ponto]
+    max_idade_s = args.max_idade_h * 3600 if args.max_idade_h is not None else None
+    try:
+        if args.servidor_local:
+            elementos, aneis_fixture = elementos_de_fixture()
+            saida = tempfile.mkdtemp(prefix="osm_download_")
+            with ServidorOverpassLocal(elementos, aneis_fixture, taxa_falhas=args.taxa_falhas) as servidor:
+                resultado = baixar_lugar(diretorio=os.path.join(saida, "tiles"), endpoint=servidor.endpoint,
+                                         endpoint_nominatim=servidor.endpoint_nominatim,
+                                         tamanho_tile=args.tamanho_tile, num_conexoes=args.conexoes,
+                                         tentativas=args.tentativas, atualizar=atualizar, max_idade_s=max_idade_s,
+                                         arquivo_grafo=os.path.join(saida, "grafo.graphml"),
+                                         arquivo_features=os.path.join(saida, "pontos.geojson"), espera_base_s=0.01,
+                                         aneis=aneis_fixture)
+            print(f"OSM_DOWNLOAD.PY: Servidor local: {servidor.requisicoes} consultas, {servidor.falhas} falhas "
+                  f"injetadas. Saída em {saida}.")
+        else:
+            resultado = baixar_lugar(tamanho_tile=args.tamanho_tile, num_conexoes=args.conexoes,
+                                     tentativas=args.tentativas, atualizar=atualizar, max_idade_s=max_idade_s)
+    except (RuntimeError, ErroOverpass) as e:
+        print(f"OSM_DOWNLOAD.PY: {e}")
+        raise SystemExit(1)
+    print(f"OSM_DOWNLOAD.PY: {resultado['tiles']} tiles ({resultado['baixados']} consultas feitas, "
+          f"{resultado['reaproveitados']} reaproveitadas) em {resultado['tempo_s']} s; "
+          f"{resultado['bytes'] / 1e6:.1f} MB de respostas gravados em {resultado['bytes_comprimidos'] / 1e6:.1f} MB. "
+          f"Grafo: {resultado['nos']} nós, {resultado['arestas']} arestas; {resultado['pontos_onibus']} pontos de ônibus.")
@@ -0,0 +1,563 @@
+# partitioned_graph.py
+import heapq
+import json
+import os
+import random
+import shutil
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from csr_graph import GrafoCSR
+from dijkstra import distancias_a_partir_de, uniform_cost_search
+from search_result import ResultadoBusca, relogio
+from spatial_index import RAIO_TERRA_METROS, IndiceEspacial, e_coordenada
+
+# Incrementar sempre que o formato dos arquivos da partição mudar; partições de outra versão são refeitas.
+VERSAO_PARTICAO = 1
+
+# Lado das células em graus. É metade do tile de osm_download (TAMANHO_TILE_PADRAO) e usa a mesma
+# grade global, então cada tile baixado cobre exatamente 2x2 células e regiões vizinhas se encaixam.
+# Células maiores deixam o grafo de fronteira menor, ao custo de mais nós nas células da origem e do destino.
+TAMANHO_CELULA_PADRAO = 0.025
+
+# Memória máxima das células carregadas em cada processo (LRU). As células da origem e do destino
+# de uma consulta em andamento nunca são descartadas, então o pico é este limite mais essas duas.
+MAX_BYTES_CELULAS_PADRAO = 64 * 1024 * 1024
+
+ARQUIVO_META = "meta.json"
+DIRETORIO_CELULAS = "celulas"
+ARRAYS_CELULA = ("node_ids", "offsets", "alvos", "pesos", "x", "y", "corte_offsets", "corte_alvos", "corte_pesos")
+ARRAYS_FRONTEIRA = ("fronteira_ids", "fronteira_celula", "fronteira_local", "fronteira_offsets", "fronteira_alvos",
+                    "fronteira_pesos")
+
+
+class Celula:
+    """
+    Uma célula carregada da partição.
+
+    Atributos:
+        indice (int): Posição da célula na lista de células da partição.
+        grafo (GrafoCSR): Nós da célula (índices locais, em ordem de ID OSM) e só as arestas internas a ela.
+        corte_offsets, corte_alvos, corte_pesos (numpy.ndarray): Arestas que saem da célula, em CSR
+            sobre os índices locais; os alvos são índices no grafo de fronteira (nós de outras células).
+    """
+
+    def __init__(self, indice, grafo, corte_offsets, corte_alvos, corte_pesos):
+        self.indice = indice
+        self.grafo = grafo
+        self.corte_offsets = corte_offsets
+        self.corte_alvos = corte_alvos
+        self.corte_pesos = corte_pesos
+        self._memoryviews = None
+        self._indice_espacial = None
+
+    def corte(self):
+        """Retorna (corte_offsets, corte_alvos, corte_pesos) como memoryviews."""
+        if self._memoryviews is None:
+            self._memoryviews = (memoryview(self.corte_offsets), memoryview(self.corte_alvos),
+                                 memoryview(self.corte_pesos))
+        return self._memoryviews
+
+    def indice_espacial(self):
+        """Índice espacial (só de nós) da célula, construído na primeira chamada."""
+        if self._indice_espacial is None:
+            self._indice_espacial = IndiceEspacial(self.grafo.node_ids, self.grafo.x, self.grafo.y)
+        return self._indice_espacial
+
+    def nbytes(self):
+        """Memória ocupada pelos arrays da célula, em bytes (o índice espacial, se construído, não entra)."""
+        return self.grafo.nbytes() + self.corte_offsets.nbytes + self.corte_alvos.nbytes + self.corte_pesos.nbytes
+
+
+def _pesos_caminho(grafo, path):
+    """Pesos das arestas de um caminho (IDs OSM) sobre um GrafoCSR, na ordem do caminho."""
+    offsets, alvos, pesos, _ = grafo.adjacencia()
+    indices = [grafo.indice(node_id) for node_id in path]
+    resultado = []
+    for u, v in zip(indices, indices[1:]):
+        for i in range(offsets[u], offsets[u + 1]):
+            if alvos[i] == v:
+                resultado.append(pesos[i])
+                break
+    return resultado
+
+
+class GrafoParticionado:
+    """
+    Grafo de caminhada particionado em células de uma grade de latitude/longitude, carregado sob demanda.
+
+    Cada célula fica em um arquivo próprio com a sua adjacência interna e as arestas de corte (que
+    saem dela). Nós de fronteira são as pontas das arestas de corte. O grafo de fronteira, calculado
+    uma vez em `particionar_grafo`, liga os nós de fronteira de cada célula entre si pela menor
+    distância *dentro* da célula e contém também as arestas de corte.
+
+    Uma consulta carrega só as células da origem e do destino: dentro delas a busca usa todas as
+    arestas e, fora delas, só o grafo de fronteira. Todo caminho mínimo que passa por outra célula
+    entra e sai dela por nós de fronteira, e o trecho entre eles é uma aresta do grafo de fronteira,
+    então o custo é o mesmo de `uniform_cost_search` no grafo inteiro. As arestas de fronteira usadas
+    são desempacotadas (uma busca dentro da célula delas) só na reconstrução do caminho.
+
+    As células carregadas ficam num cache LRU limitado por `max_bytes`. O grafo de fronteira e a
+    tabela nó -> célula são mapeados em memória (somente leitura), compartilhados entre os processos
+    que abrem a mesma partição. Assim a memória própria de cada processo não depende da área coberta.
+
+    Os contadores `acertos`, `carregamentos`, `despejos` e `pico_bytes` ficam em `estatisticas()`.
+    """
+
+    def __init__(self, diretorio, meta, max_bytes=MAX_BYTES_CELULAS_PADRAO):
+        self.diretorio = diretorio
+        self.meta = meta
+        self.max_bytes = max_bytes
+        self.tamanho_celula = meta["tamanho_celula"]
+        self.assinatura_grafo = meta["assinatura_grafo"]
+        self.chaves_celulas = [tuple(chave) for chave in meta["celulas"]]
+        self._celula_por_chave = {chave: c for c, chave in enumerate(self.chaves_celulas)}
+
+        carregar = lambda nome: np.load(os.path.join(diretorio, f"{nome}.npy"), mmap_mode="r")
+        self.node_ids = carregar("node_ids")
+        self.celula_dos_nos = carregar("celula_dos_nos")
+        self.fronteira = tuple(carregar(nome) for nome in ARRAYS_FRONTEIRA)
+        self._fronteira_memoryviews = tuple(memoryview(array) for array in self.fronteira)
+
+        self._celulas = OrderedDict()
+        self.bytes_em_uso = 0
+        self.pico_bytes = 0
+        self.acertos = 0
+        self.carregamentos = 0
+        self.despejos = 0
+
+    @property
+    def num_nos(self):
+        return len(self.node_ids)
+
+    @property
+    def num_celulas(self):
+        return len(self.chaves_celulas)
+
+    def __contains__(self, node_id):
+        return self.celula_do_no(node_id) is not None
+
+    def celula_do_no(self, node_id):
+        """Índice da célula do nó com ID OSM `node_id`, ou None se ele não existir."""
+        i = int(np.searchsorted(self.node_ids, node_id))
+        if i < len(self.node_ids) and self.node_ids[i] == node_id:
+            return int(self.celula_dos_nos[i])
+        return None
+
+    def celula(self, c):
+        """Retorna a célula de índice `c`, carregando-a do disco se preciso, e a marca como usada recentemente."""
+        celula = self._celulas.get(c)
+        if celula is not None:
+            self.acertos += 1
+            self._celulas.move_to_end(c)
+            return celula
+
+        ix, iy = self.chaves_celulas[c]
+        with np.load(os.path.join(self.diretorio, DIRETORIO_CELULAS, f"{ix}_{iy}.npz")) as dados:
+            arrays = {nome: dados[nome] for nome in ARRAYS_CELULA}
+        grafo = GrafoCSR(arrays["node_ids"], arrays["offsets"], arrays["alvos"], arrays["pesos"],
+                         arrays["x"], arrays["y"])
+        celula = Celula(c, grafo, arrays["corte_offsets"], arrays["corte_alvos"], arrays["corte_pesos"])
+        self.carregamentos += 1
+
+        self._celulas[c] = celula
+        self.bytes_em_uso += celula.nbytes()
+        self.pico_bytes = max(self.pico_bytes, self.bytes_em_uso)
+        while self.bytes_em_uso > self.max_bytes and len(self._celulas) > 1:
+            self._remover(next(iter(self._celulas)))
+            self.despejos += 1
+        return celula
+
+    def _remover(self, c):
+        self.bytes_em_uso -= self._celulas.pop(c).nbytes()
+
+    def descartar_celulas(self):
+        """Esvazia o cache de células (o grafo de fronteira continua mapeado)."""
+        for c in list(self._celulas):
+            self._remover(c)
+
+    def ajustar_ponto(self, lat, lon):
+        """
+        Nó mais próximo de (lat, lon), procurado na célula do ponto e nas vizinhas que estejam mais
+        perto do ponto que o melhor nó já encontrado (as demais nem são carregadas).
+
+        Returns:
+            int: O ID OSM do nó, ou None se não houver nenhuma célula em volta do ponto.
+        """
+        tamanho = self.tamanho_celula
+        ix, iy = int(np.floor(lon / tamanho)), int(np.floor(lat / tamanho))
+        metros_por_grau = RAIO_TERRA_METROS * np.pi / 180
+        candidatas = []
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                c = self._celula_por_chave.get((ix + dx, iy + dy))
+                if c is None:
+                    continue
+                # Distância (m) do ponto ao retângulo da célula; 0 para a célula que contém o ponto.
+                oeste, sul = (ix + dx) * tamanho, (iy + dy) * tamanho
+                ddx = max(oeste - lon, 0.0, lon - oeste - tamanho) * np.cos(np.radians(lat))
+                ddy = max(sul - lat, 0.0, lat - sul - tamanho)
+                candidatas.append((float(np.hypot(ddx, ddy)) * metros_por_grau, c))
+
+        melhor_distancia, melhor_no = float('inf'), None
+        for distancia_celula, c in sorted(candidatas):
+            if distancia_celula >= melhor_distancia:
+                break
+            node_ids, distancias = self.celula(c).indice_espacial().ajustar_nos(lat, lon)
+            if len(distancias) and distancias[0] < melhor_distancia:
+                melhor_distancia, melhor_no = float(distancias[0]), int(node_ids[0])
+        return melhor_no
+
+    def consultar(self, start_node_id, goal_node_id, temporizador=None):
+        """
+        Busca de Custo Uniforme sobre as células da origem e do destino mais o grafo de fronteira.
+
+        Returns:
+            ResultadoBusca: Caminho completo em IDs OSM (ou None), custo e contadores da busca.
+        """
+        if temporizador is not None:
+            inicio_fase = relogio()
+
+        resultado = ResultadoBusca(algoritmo="particionado")
+        celula_inicio, celula_objetivo = self.celula_do_no(start_node_id), self.celula_do_no(goal_node_id)
+        if celula_inicio is None or celula_objetivo is None:
+            return resultado
+        if start_node_id == goal_node_id:
+            resultado.path, resultado.custo = [start_node_id], 0
+            return resultado
+
+        # Referências locais: as duas células ficam carregadas até o fim da consulta mesmo se o LRU as descartar.
+        detalhadas = {celula_inicio: self.celula(celula_inicio), celula_objetivo: self.celula(celula_objetivo)}
+        adjacencias = {c: (celula.grafo.adjacencia(), celula.corte()) for c, celula in detalhadas.items()}
+        fronteira_ids, fronteira_celula, fronteira_local, offsets_f, alvos_f, pesos_f = self._fronteira_memoryviews
+
+        priority_queue = [(0, start_node_id)]
+        cost_so_far = {start_node_id: 0}
+        # came_from[v] = (u, peso da aresta, célula da aresta de fronteira a desempacotar ou -1)
+        came_from = {start_node_id: None}
+        # onde[v] = (célula, índice local) nas células detalhadas, ou (-1, índice no grafo de fronteira)
+        onde = {start_node_id: (celula_inicio, detalhadas[celula_inicio].grafo.indice(start_node_id))}
+        nos_assentados = relaxamentos = entradas_obsoletas = pico_fronteira = 0
+        insercoes_fila = 1
+        encontrado = False
+
+        if temporizador is not None:
+            temporizador("preparacao", relogio() - inicio_fase)
+            inicio_fase = relogio()
+
+        while priority_queue:
+            if len(priority_queue) > pico_fronteira:
+                pico_fronteira = len(priority_queue)
+            current_cost, current_node = heapq.heappop(priority_queue)
+
+            if current_node == goal_node_id:
+                encontrado = True
+                break
+
+            if current_cost > cost_so_far[current_node]:
+                entradas_obsoletas += 1
+                continue
+
+            nos_assentados += 1
+            c, i = onde[current_node]
+            if c >= 0:
+                (offsets, alvos, pesos, node_ids), (offsets_corte, alvos_corte, pesos_corte) = adjacencias[c]
+                primeira, ultima = offsets[i], offsets[i + 1]
+                relaxamentos += ultima - primeira
+                for k in range(primeira, ultima):
+                    j = alvos[k]
+                    neighbor = node_ids[j]
+                    new_cost = current_cost + pesos[k]
+                    if new_cost < cost_so_far.get(neighbor, float('inf')):
+                        cost_so_far[neighbor] = new_cost
+                        came_from[neighbor] = (current_node, pesos[k], -1)
+                        onde[neighbor] = (c, j)
+                        heapq.heappush(priority_queue, (new_cost, neighbor))
+                        insercoes_fila += 1
+                celula_atual = -1
+                primeira, ultima = offsets_corte[i], offsets_corte[i + 1]
+                alvos_saida, pesos_saida = alvos_corte, pesos_corte
+            else:
+                celula_atual = fronteira_celula[i]
+                primeira, ultima = offsets_f[i], offsets_f[i + 1]
+                alvos_saida, pesos_saida = alvos_f, pesos_f
+
+            # Arestas de corte e, fora das células detalhadas, arestas de fronteira (alvos no grafo de fronteira).
+            relaxamentos += ultima - primeira
+            for k in range(primeira, ultima):
+                g = alvos_saida[k]
+                neighbor = fronteira_ids[g]
+                new_cost = current_cost + pesos_saida[k]
+                if new_cost < cost_so_far.get(neighbor, float('inf')):
+                    cost_so_far[neighbor] = new_cost
+                    celula_vizinho = fronteira_celula[g]
+                    if celula_vizinho == celula_atual:
+                        # Aresta de fronteira: as duas pontas estão na mesma célula, fora das detalhadas.
+                        came_from[neighbor] = (current_node, pesos_saida[k], celula_atual)
+                        onde[neighbor] = (-1, g)
+                    else:
+                        came_from[neighbor] = (current_node, pesos_saida[k], -1)
+                        onde[neighbor] = (celula_vizinho, fronteira_local[g]) if celula_vizinho in detalhadas \
+                            else (-1, g)
+                    heapq.heappush(priority_queue, (new_cost, neighbor))
+                    insercoes_fila += 1
+
+        if temporizador is not None:
+            temporizador("busca", relogio() - inicio_fase)
+            inicio_fase = relogio()
+
+        resultado.nos_assentados = nos_assentados
+        resultado.relaxamentos = relaxamentos
+        resultado.insercoes_fila = insercoes_fila
+        resultado.entradas_obsoletas = entradas_obsoletas
+        resultado.pico_fronteira = pico_fronteira
+
+        if encontrado:
+            passos = []
+            node_iter = goal_node_id
+            while came_from[node_iter] is not None:
+                u, peso, celula_aresta = came_from[node_iter]
+                passos.append((u, node_iter, peso, celula_aresta))
+                node_iter = u
+            path = [start_node_id]
+            pesos_path = []
+            for u, v, peso, celula_aresta in reversed(passos):
+                if celula_aresta < 0:
+                    path.append(v)
+                    pesos_path.append(peso)
+                else:
+                    grafo_celula = self.celula(celula_aresta).grafo
+                    trecho = uniform_cost_search(grafo_celula, u, v).path
+                    path.extend(trecho[1:])
+                    pesos_path.extend(_pesos_caminho(grafo_celula, trecho))
+            # Soma na ordem do caminho, como o custo acumulado de `uniform_cost_search`.
+            custo = 0
+            for peso in pesos_path:
+                custo += peso
+            resultado.path, resultado.custo = path, custo
+
+        if temporizador is not None:
+            temporizador("reconstrucao", relogio() - inicio_fase)
+        return resultado
+
+    def estatisticas(self):
+        """Contadores da partição e do cache de células, prontos para serem exportados como métricas."""
+        return {"celulas": self.num_celulas, "celulas_carregadas": len(self._celulas),
+                "nos": self.num_nos, "nos_fronteira": len(self.fronteira[0]),
+                "arestas_fronteira": len(self.fronteira[4]), "bytes_em_uso": self.bytes_em_uso,
+                "pico_bytes": self.pico_bytes, "max_bytes": self.max_bytes, "acertos": self.acertos,
+                "carregamentos": self.carregamentos, "despejos": self.despejos}
+
+
+def partitioned_uniform_cost_search(particao, start_node_id, goal_node_id, temporizador=None):
+    """
+    Busca de Custo Uniforme sobre um `GrafoParticionado`, carregando só as células necessárias.
+
+    Args:
+        particao (GrafoParticionado): A partição aberta por `carregar_particao`.
+        start_node_id (int | tuple): O ID do nó de início, ou coordenadas (lat, lon), ajustadas ao
+            nó mais próximo (ver `GrafoParticionado.ajustar_ponto`).
+        goal_node_id (int | tuple): O ID do nó de destino, ou coordenadas (lat, lon).
+        temporizador (callable): Opcional, como em `uniform_cost_search`.
+
+    Returns:
+        ResultadoBusca: O caminho (lista de IDs de nós, no mesmo formato de `uniform_cost_search`,
+                        ou None), o custo (igual ao de `uniform_cost_search`) e os contadores da busca.
+    """
+    if e_coordenada(start_node_id):
+        start_node_id = particao.ajustar_ponto(*start_node_id)
+    if e_coordenada(goal_node_id):
+        goal_node_id = particao.ajustar_ponto(*goal_node_id)
+    if start_node_id is None or goal_node_id is None:
+        return ResultadoBusca(algoritmo="particionado")
+    return particao.consultar(start_node_id, goal_node_id, temporizador)
+
+
+def particionar_grafo(grafo, diretorio, tamanho_celula=TAMANHO_CELULA_PADRAO):
+    """
+    Divide o grafo compilado em células e salva a partição em `diretorio`: um arquivo .npz por
+    célula (em celulas/), o grafo de fronteira, a tabela nó -> célula e um meta.json com a
+    assinatura do grafo. A escrita é feita num diretório temporário que depois substitui o anterior.
+
+    Para cada célula, o grafo de fronteira recebe a distância de cada nó de fronteira a cada outro
+    da mesma célula, calculada só com as arestas internas (uma busca por nó de fronteira).
+
+    Args:
+        grafo (GrafoCSR): O grafo compilado (pode estar mapeado em memória, como o do snapshot).
+        diretorio (str): Diretório de destino.
+        tamanho_celula (float): Lado das células, em graus.
+
+    Returns:
+        GrafoParticionado: A partição aberta a partir do diretório salvo.
+
+    Raises:
+        ValueError: Se algum nó não tiver coordenadas (não há como escolher a célula dele).
+    """
+    x, y = np.asarray(grafo.x), np.asarray(grafo.y)
+    if np.isnan(x).any() or np.isnan(y).any():
+        raise ValueError("Todos os nós precisam de coordenadas (x, y) para serem particionados.")
+
+    inicio_tempo = time.perf_counter()
+    n = grafo.num_nos
+    node_ids = np.asarray(grafo.node_ids)
+    chaves = np.column_stack((np.floor(x / tamanho_celula), np.floor(y / tamanho_celula))).astype(np.int64)
+    chaves_celulas, celula_de = np.unique(chaves, axis=0, return_inverse=True)
+    celula_de = celula_de.reshape(-1).astype(np.int32)
+
+    origens = np.repeat(np.arange(n, dtype=np.int64), np.diff(grafo.offsets))
+    alvos, pesos = np.asarray(grafo.alvos, dtype=np.int64), np.asarray(grafo.pesos)
+    corte = celula_de[origens] != celula_de[alvos]
+
+    fronteira = np.unique(np.concatenate((origens[corte], alvos[corte])))
+    posicao_fronteira = np.full(n, -1, dtype=np.int64)
+    posicao_fronteira[fronteira] = np.arange(len(fronteira))
+    arestas_fronteira = [(posicao_fronteira[origens[corte]], posicao_fronteira[alvos[corte]], pesos[corte])]
+
+    # Índice local de cada nó na sua célula; as arestas ficam agrupadas por célula (e, dentro dela,
+    # em ordem de origem, como no CSR), então cada célula é uma fatia contígua.
+    ordem_nos = np.argsort(celula_de, kind="stable")
+    nos_por_celula = np.bincount(celula_de, minlength=len(chaves_celulas))
+    local = np.empty(n, dtype=np.int64)
+    local[ordem_nos] = np.arange(n) - np.repeat(np.cumsum(nos_por_celula) - nos_por_celula, nos_por_celula)
+    ordem_arestas = np.argsort(celula_de[origens], kind="stable")
+    arestas_por_celula = np.bincount(celula_de[origens], minlength=len(chaves_celulas))
+
+    temporario = f"{diretorio}.tmp-{os.getpid()}"
+    shutil.rmtree(temporario, ignore_errors=True)
+    os.makedirs(os.path.join(temporario, DIRETORIO_CELULAS))
+
+    primeiro_no = primeira_aresta = 0
+    for c, (ix, iy) in enumerate(chaves_celulas.tolist()):
+        nos = ordem_nos[primeiro_no:primeiro_no + nos_por_celula[c]]
+        arestas = ordem_arestas[primeira_aresta:primeira_aresta + arestas_por_celula[c]]
+        primeiro_no += nos_por_celula[c]
+        primeira_aresta += arestas_por_celula[c]
+
+        internas, de_corte = arestas[~corte[arestas]], arestas[corte[arestas]]
+        num_nos = len(nos)
+        offsets = np.zeros(num_nos + 1, dtype=np.int64)
+        np.cumsum(np.bincount(local[origens[internas]], minlength=num_nos), out=offsets[1:])
+        corte_offsets = np.zeros(num_nos + 1, dtype=np.int64)
+        np.cumsum(np.bincount(local[origens[de_corte]], minlength=num_nos), out=corte_offsets[1:])
+        arrays = {"node_ids": node_ids[nos], "offsets": offsets,
+                  "alvos": local[alvos[internas]].astype(np.int32), "pesos": pesos[internas],
+                  "x": x[nos], "y": y[nos], "corte_offsets": corte_offsets,
+                  "corte_alvos": posicao_fronteira[alvos[de_corte]].astype(np.int32), "corte_pesos": pesos[de_corte]}
+        with open(os.path.join(temporario, DIRETORIO_CELULAS, f"{ix}_{iy}.npz"), "wb") as f:
+            np.savez(f, **arrays)
+
+        # Distâncias internas entre os nós de fronteira da célula.
+        grafo_celula = GrafoCSR(arrays["node_ids"], offsets, arrays["alvos"], arrays["pesos"], arrays["x"], arrays["y"])
+        bordas = nos[posicao_fronteira[nos] >= 0]
+        bordas_locais, bordas_fronteira = local[bordas], posicao_fronteira[bordas]
+        for j, borda in enumerate(bordas_locais.tolist()):
+            distancias = distancias_a_partir_de(grafo_celula, [borda])[0][bordas_locais]
+            alcancados = np.isfinite(distancias)
+            alcancados[j] = False
+            arestas_fronteira.append((np.full(alcancados.sum(), bordas_fronteira[j]), bordas_fronteira[alcancados],
+                                      distancias[alcancados]))
+
+    origens_f, alvos_f, pesos_f = (np.concatenate(partes) for partes in zip(*arestas_fronteira))
+    ordem = np.argsort(origens_f, kind="stable")
+    offsets_f = np.zeros(len(fronteira) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(origens_f, minlength=len(fronteira)), out=offsets_f[1:])
+    arrays_globais = {"node_ids": node_ids, "celula_dos_nos": celula_de,
+                      "fronteira_ids": node_ids[fronteira], "fronteira_celula": celula_de[fronteira],
+                      "fronteira_local": local[fronteira].astype(np.int32),
+                      "fronteira_offsets": offsets_f, "fronteira_alvos": alvos_f[ordem].astype(np.int32),
+                      "fronteira_pesos": pesos_f[ordem].astype(np.float64)}
+    for nome, array in arrays_globais.items():
+        np.save(os.path.join(temporario, f"{nome}.npy"), np.ascontiguousarray(array))
+
+    meta = {"versao": VERSAO_PARTICAO, "assinatura_grafo": grafo.assinatura(), "tamanho_celula": tamanho_celula,
+            "celulas": chaves_celulas.tolist(), "nos_por_celula": nos_por_celula.tolist(),
+            "num_nos": n, "num_arestas": grafo.num_arestas, "num_nos_fronteira": len(fronteira),
+            "num_arestas_fronteira": len(ordem)}
+    with open(os.path.join(temporario, ARQUIVO_META), "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+
+    antigo = f"{diretorio}.old-{os.getpid()}"  # troca como em salvar_snapshot
+    shutil.rmtree(antigo, ignore_errors=True)
+    if os.path.exists(diretorio):
+        os.replace(diretorio, antigo)
+    os.replace(temporario, diretorio)
+    shutil.rmtree(antigo, ignore_errors=True)
+    print(f"PARTITIONED_GRAPH.PY: {len(chaves_celulas)} células, {len(fronteira)} nós de fronteira e "
+          f"{len(ordem)} arestas de fronteira em {time.perf_counter() - inicio_tempo:.1f} s.")
+    return GrafoParticionado(diretorio, meta)
+
+
+def carregar_particao(diretorio, grafo=None, max_bytes=MAX_BYTES_CELULAS_PADRAO):
+    """
+    Abre uma partição salva por `particionar_grafo`. Nenhuma célula é lida até a primeira consulta.
+
+    Args:
+        diretorio (str): Diretório da partição.
+        grafo (GrafoCSR): Se informado, a partição só é aceita se tiver sido feita para ele.
+        max_bytes (int): Limite de memória do cache de células.
+
+    Returns:
+        GrafoParticionado: A partição, ou None se não existir, for de outra versão ou não corresponder ao grafo.
+    """
+    try:
+        with open(os.path.join(diretorio, ARQUIVO_META), encoding="utf-8") as f:
+            meta = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    if meta.get("versao") != VERSAO_PARTICAO:
+        return None
+    if grafo is not None and meta.get("assinatura_grafo") != grafo.assinatura():
+        print(f"PARTITIONED_GRAPH.PY: Partição em {diretorio} não corresponde ao grafo atual.")
+        return None
+    return GrafoParticionado(diretorio, meta, max_bytes=max_bytes)
+
+
+def verificar_particao(grafo, particao, num_pares=100, seed=42, tolerancia=1e-6):
+    """
+    Modo de verificação: compara o custo das rotas da partição com o de `uniform_cost_search`
+    em pares aleatórios de nós, sorteados com a mesma semente usada em main.py.
+
+    Returns:
+        int: O número de pares com custos divergentes (0 se a partição estiver correta).
+    """
+    rng = random.Random(seed)
+    node_ids = grafo.node_ids.tolist()
+    divergencias = 0
+    for _ in range(num_pares):
+        start_node_id, goal_node_id = rng.choice(node_ids), rng.choice(node_ids)
+        resultado_ucs = uniform_cost_search(grafo, start_node_id, goal_node_id)
+        resultado = partitioned_uniform_cost_search(particao, start_node_id, goal_node_id)
+        custo_caminho = grafo.custo_caminho(resultado.path) if resultado.path else float('inf')
+        if resultado.path and (resultado.path[0] != start_node_id or resultado.path[-1] != goal_node_id):
+            custo_caminho = float('inf')
+        for custo in (resultado.custo, custo_caminho):
+            if custo != resultado_ucs.custo and abs(custo - resultado_ucs.custo) > tolerancia:
+                divergencias += 1
+                print(f"PARTITIONED_GRAPH.PY: Divergência de {start_node_id} para {goal_node_id}: "
+                      f"UCS {resultado_ucs.custo} x partição {custo}")
+                break
+    print(f"PARTITIONED_GRAPH.PY: Verificação concluída: {num_pares - divergencias}/{num_pares} "
+          f"pares com custo idêntico.")
+    return divergencias
+
+
+if __name__ == "__main__":
+    import sys
+    from snapshot import carregar_grafo_preparado, SNAPSHOT_DIRPATH
+
+    grafo_principal, _ = carregar_grafo_preparado()
+    if grafo_principal is None:
+        print("PARTITIONED_GRAPH.PY: Falha ao carregar o grafo.")
+        sys.exit(1)
+
+    diretorio_particao = os.path.join(SNAPSHOT_DIRPATH, "particao")
+    particao_principal = carregar_particao(diretorio_particao, grafo_principal)
+    if particao_principal is None:
+        particao_principal = particionar_grafo(grafo_principal, diretorio_particao)
+
+    if "--verificar" in sys.argv:
+        divergentes = verificar_particao(grafo_principal, particao_principal)
+        print(f"PARTITIONED_GRAPH.PY: {particao_principal.estatisticas()}")
+        sys.exit(1 if divergentes else 0)
@@ -0,0 +1,482 @@
+# render.py
+import hashlib
+import json
+import math
+import os
+import shutil
+import struct
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from snapshot import SNAPSHOT_DIRPATH, carregar_snapshot
+
+# Diretório padrão do mapa base rasterizado (dentro do snapshot, como as tabelas de landmarks)
+MAPA_BASE_DIRPATH = os.path.join(SNAPSHOT_DIRPATH, "mapa_base")
+
+# Largura da imagem em pixels: 8 polegadas a 300 dpi, como o figsize padrão do ox.plot_graph_route
+# com o dpi usado em main.py. A altura sai da extensão do grafo (proporção corrigida pela latitude).
+LARGURA_PADRAO = 2400
+
+# Espessuras em pixels a 300 dpi (edge_linewidth=0.5 e route_linewidth=3 pontos, aproximadamente)
+ESPESSURA_ARESTAS_PADRAO = 2
+ESPESSURA_ROTA_PADRAO = 12
+
+# Margem em volta do grafo, como fração da extensão (a mesma do osmnx)
+MARGEM = 0.02
+
+# Margem, em pixels, do recorte em volta da rota quando `recortar=True`
+MARGEM_RECORTE_PADRAO = 40
+
+# Linhas de pixels por faixa do PNG pré-comprimida. Cada faixa é um trecho independente do fluxo
+# deflate, então na hora de desenhar uma rota só as faixas que ela toca são comprimidas de novo.
+ALTURA_FAIXA = 32
+
+# Nível do zlib: o mapa base é comprimido uma vez só (vale gastar mais); as faixas refeitas por
+# rota usam o nível mais rápido com a estratégia RLE, que é a mais rápida e comprime bem
+# uma imagem de poucas cores com longos trechos de fundo liso.
+NIVEL_MAPA_BASE = 6
+NIVEL_ROTA = 1
+
+CORES = {"white": (255, 255, 255), "w": (255, 255, 255), "black": (0, 0, 0), "k": (0, 0, 0),
+         "blue": (0, 0, 255), "b": (0, 0, 255), "green": (0, 128, 0), "g": (0, 128, 0),
+         "red": (255, 0, 0), "r": (255, 0, 0), "orange": (255, 165, 0), "gray": (128, 128, 128)}
+COR_FUNDO_PADRAO = "w"
+COR_ARESTAS_PADRAO = "#999999"
+
+_BASE_ADLER = 65521
+
+
+def _cor(valor):
+    """Converte um nome ('blue', 'w'...), '#rrggbb' ou uma tupla RGB em uma tupla de 3 inteiros."""
+    if isinstance(valor, str):
+        if valor.startswith("#") and len(valor) == 7:
+            return tuple(int(valor[i:i + 2], 16) for i in (1, 3, 5))
+        if valor not in CORES:
+            raise ValueError(f"Cor desconhecida: {valor}. Use '#rrggbb' ou um de {sorted(CORES)}.")
+        return CORES[valor]
+    return tuple(int(c) for c in valor)
+
+
+def _assinatura_geometria(grafo):
+    """Hash da topologia e das coordenadas: o desenho não depende dos pesos."""
+    sha = hashlib.sha1()
+    for array in (grafo.node_ids, grafo.offsets, grafo.alvos, grafo.x, grafo.y):
+        sha.update(np.ascontiguousarray(array).data)
+    return sha.hexdigest()
+
+
+def _disco(raio):
+    """Deslocamentos (linha, coluna) dos pixels de um disco de raio `raio`."""
+    r = int(math.ceil(raio))
+    dl, dc = np.mgrid[-r:r + 1, -r:r + 1]
+    dentro = dl * dl + dc * dc <= raio * raio
+    return dl[dentro], dc[dentro]
+
+
+def _pixels_segmentos(c0, l0, c1, l1, espessura, altura, largura):
+    """
+    Pixels cobertos pelos segmentos (c0, l0)-(c1, l1) (em coordenadas de pixel) desenhados com a
+    espessura dada: amostra cada segmento a cada meio raio e carimba um disco em cada amostra.
+
+    Returns:
+        numpy.ndarray[int64]: Índices planos (linha * largura + coluna), com repetições.
+    """
+    raio = max(espessura / 2.0, 0.5)
+    passo = max(raio / 2.0, 0.5)
+    amostras = np.ceil(np.hypot(c1 - c0, l1 - l0) / passo).astype(np.int64) + 1
+    segmento = np.repeat(np.arange(len(c0)), amostras)
+    t = (np.arange(amostras.sum()) - np.repeat(np.cumsum(amostras) - amostras, amostras)) / \
+        np.maximum(np.repeat(amostras, amostras) - 1, 1)
+    colunas = np.rint(c0[segmento] + (c1 - c0)[segmento] * t).astype(np.int64)
+    linhas = np.rint(l0[segmento] + (l1 - l0)[segmento] * t).astype(np.int64)
+    pontos = np.unique(linhas * largura + colunas)
+
+    dl, dc = _disco(raio)
+    linhas = (pontos // largura)[:, None] + dl
+    colunas = (pontos % largura)[:, None] + dc
+    dentro = (linhas >= 0) & (linhas < altura) & (colunas >= 0) & (colunas < largura)
+    return (linhas * largura + colunas)[dentro]
+
+
+def _adler32_combinar(adler1, adler2, tamanho2):
+    """Adler-32 da concatenação de dois blocos a partir do Adler-32 de cada um (como o adler32_combine do zlib)."""
+    resto = tamanho2 % _BASE_ADLER
+    s1a, s2a = adler1 & 0xffff, adler1 >> 16
+    s1b, s2b = adler2 & 0xffff, adler2 >> 16
+    s1 = (s1a + s1b - 1) % _BASE_ADLER
+    s2 = (s2a + s2b + resto * s1a - resto) % _BASE_ADLER
+    return (s2 << 16) | s1
+
+
+def _comprimir_faixa(linhas_rgb, nivel, estrategia=zlib.Z_DEFAULT_STRATEGY):
+    """
+    Comprime um bloco de linhas do PNG (filtro 0) como um trecho deflate independente: termina com
+    Z_FULL_FLUSH, sem referências a dados anteriores nem bloco final, para poder ser concatenado.
+
+    Returns:
+        tuple: (bytes comprimidos, Adler-32 dos dados brutos, tamanho dos dados brutos).
+    """
+    bruto = np.zeros((linhas_rgb.shape[0], linhas_rgb.shape[1] * 3 + 1), dtype=np.uint8)
+    bruto[:, 1:] = linhas_rgb.reshape(linhas_rgb.shape[0], -1)
+    bruto = bruto.tobytes()
+    compressor = zlib.compressobj(nivel, zlib.DEFLATED, -15, 9, estrategia)
+    return compressor.compress(bruto) + compressor.flush(zlib.Z_FULL_FLUSH), zlib.adler32(bruto), len(bruto)
+
+
+def _chunk(tipo, dados):
+    return struct.pack(">I", len(dados)) + tipo + dados + struct.pack(">I", zlib.crc32(tipo + dados))
+
+
+def _png(largura, altura, trechos, adler, titulo=None):
+    """
+    Monta o PNG (RGB, 8 bits) a partir dos trechos deflate já comprimidos e do Adler-32 dos dados brutos.
+    O título vai num bloco tEXt (Title), no lugar do título desenhado por ax.set_title.
+    """
+    partes = [b"\x89PNG\r\n\x1a\n", _chunk(b"IHDR", struct.pack(">IIBBBBB", largura, altura, 8, 2, 0, 0, 0))]
+    if titulo:
+        partes.append(_chunk(b"tEXt", b"Title\x00" + titulo.encode("latin-1", "replace")))
+    # Cabeçalho zlib (0x78 0x01), trechos, bloco final vazio (0x03 0x00) e o Adler-32
+    idat = b"".join([b"\x78\x01", *trechos, b"\x03\x00", struct.pack(">I", adler)])
+    partes += [_chunk(b"IDAT", idat), _chunk(b"IEND", b"")]
+    return b"".join(partes)
+
+
+class MapaBase:
+    """
+    A rede de ruas rasterizada uma vez, com a extensão usada para converter coordenadas em pixels
+    e o PNG já comprimido em faixas de ALTURA_FAIXA linhas.
+
+    Atributos:
+        imagem (numpy.ndarray[uint8]): (altura, largura, 3) em RGB, possivelmente mapeada em memória.
+        extensao (tuple): (lon_min, lon_max, lat_min, lat_max) representada pela imagem.
+        faixas (numpy.ndarray): Por faixa: início e tamanho em `comprimido`, Adler-32 e tamanho bruto.
+        comprimido (numpy.ndarray[uint8]): Os trechos deflate de todas as faixas, concatenados.
+    """
+
+    def __init__(self, imagem, extensao, faixas, comprimido):
+        self.imagem = imagem
+        self.extensao = tuple(float(e) for e in extensao)
+        self.faixas = faixas
+        self.comprimido = comprimido
+        lon_min, lon_max, lat_min, lat_max = self.extensao
+        self._escala_x = (self.largura - 1) / (lon_max - lon_min)
+        self._escala_y = (self.altura - 1) / (lat_max - lat_min)
+
+    @property
+    def altura(self):
+        return self.imagem.shape[0]
+
+    @property
+    def largura(self):
+        return self.imagem.shape[1]
+
+    def para_pixels(self, x, y):
+        """Converte longitudes/latitudes em (colunas, linhas) de pixel, em ponto flutuante."""
+        lon_min, _, _, lat_max = self.extensao
+        return ((np.asarray(x, dtype=np.float64) - lon_min) * self._escala_x,
+                (lat_max - np.asarray(y, dtype=np.float64)) * self._escala_y)
+
+    def png(self, titulo=None):
+        """O mapa base sem rota, como PNG."""
+        trechos = [self._trecho(f) for f in range(len(self.faixas))]
+        adler = 1
+        for _, _, adler_faixa, tamanho in self.faixas.tolist():
+            adler = _adler32_combinar(adler, adler_faixa, tamanho)
+        return _png(self.largura, self.altura, trechos, adler, titulo)
+
+    def _trecho(self, f):
+        inicio, tamanho = int(self.faixas[f, 0]), int(self.faixas[f, 1])
+        return self.comprimido[inicio:inicio + tamanho].tobytes()
+
+
+def _rasterizar(grafo, largura, espessura, cor_arestas, cor_fundo):
+    """Desenha todas as arestas do grafo; retorna a imagem RGB e a extensão."""
+    x, y = np.asarray(grafo.x), np.asarray(grafo.y)
+    validos = ~(np.isnan(x) | np.isnan(y))
+    lon_min, lon_max = float(x[validos].min()), float(x[validos].max())
+    lat_min, lat_max = float(y[validos].min()), float(y[validos].max())
+    margem_x = max(lon_max - lon_min, 1e-9) * MARGEM
+    margem_y = max(lat_max - lat_min, 1e-9) * MARGEM
+    extensao = (lon_min - margem_x, lon_max + margem_x, lat_min - margem_y, lat_max + margem_y)
+
+    # Proporção equirretangular: um grau de longitude vale cos(latitude) graus de latitude.
+    correcao = math.cos(math.radians((extensao[2] + extensao[3]) / 2))
+    altura = max(1, int(round(largura * (extensao[3] - extensao[2]) / ((extensao[1] - extensao[0]) * correcao))))
+    imagem = np.empty((altura, largura, 3), dtype=np.uint8)
+    imagem[:] = _cor(cor_fundo)
+    mapa = MapaBase(imagem, extensao, None, None)
+
+    # Cada rua de mão dupla aparece como u->v e v->u; desenha só uma vez.
+    origens = np.repeat(np.arange(grafo.num_nos), np.diff(np.asarray(grafo.offsets)))
+    alvos = np.asarray(grafo.alvos)
+    u, v = np.minimum(origens, alvos), np.maximum(origens, alvos)
+    pares = np.unique(u.astype(np.int64) * grafo.num_nos + v)
+    u, v = pares // grafo.num_nos, pares % grafo.num_nos
+    desenhaveis = validos[u] & validos[v]
+    c, l = mapa.para_pixels(x, y)
+    plano = imagem.reshape(-1, 3)
+    cor = _cor(cor_arestas)
+    for inicio in range(0, int(desenhaveis.sum()), 100_000):
+        lote = slice(inicio, inicio + 100_000)
+        uu, vv = u[desenhaveis][lote], v[desenhaveis][lote]
+        plano[_pixels_segmentos(c[uu], l[uu], c[vv], l[vv], espessura, altura, largura)] = cor
+    return imagem, extensao
+
+
+def preparar_mapa_base(grafo, diretorio=MAPA_BASE_DIRPATH, largura=LARGURA_PADRAO,
+                       espessura=ESPESSURA_ARESTAS_PADRAO, cor_arestas=COR_ARESTAS_PADRAO,
+                       cor_fundo=COR_FUNDO_PADRAO):
+    """
+    Rasteriza a rede de ruas e salva em `diretorio` a imagem (imagem.npy), as faixas do PNG já
+    comprimidas (faixas.npy, comprimido.npy) e o meta.json com a extensão e os parâmetros.
+
+    Args:
+        grafo (GrafoCSR): O grafo compilado.
+        diretorio (str): Diretório de destino.
+        largura (int): Largura da imagem em pixels.
+        espessura (float): Espessura das ruas em pixels.
+        cor_arestas, cor_fundo: Cores das ruas e do fundo (nome, '#rrggbb' ou tupla RGB).
+
+    Returns:
+        MapaBase: O mapa pronto para uso.
+    """
+    imagem, extensao = _rasterizar(grafo, largura, espessura, cor_arestas, cor_fundo)
+
+    faixas = np.zeros(((imagem.shape[0] + ALTURA_FAIXA - 1) // ALTURA_FAIXA, 4), dtype=np.int64)
+    trechos = []
+    posicao = 0
+    for f in range(len(faixas)):
+        trecho, adler, tamanho = _comprimir_faixa(imagem[f * ALTURA_FAIXA:(f + 1) * ALTURA_FAIXA], NIVEL_MAPA_BASE)
+        faixas[f] = (posicao, len(trecho), adler, tamanho)
+        trechos.append(trecho)
+        posicao += len(trecho)
+    comprimido = np.frombuffer(b"".join(trechos), dtype=np.uint8)
+
+    # Escrita num diretório temporário que depois substitui o anterior, como em salvar_snapshot.
+    temporario = f"{diretorio}.tmp-{os.getpid()}"
+    shutil.rmtree(temporario, ignore_errors=True)
+    os.makedirs(temporario)
+    np.save(os.path.join(temporario, "imagem.npy"), imagem)
+    np.save(os.path.join(temporario, "faixas.npy"), faixas)
+    np.save(os.path.join(temporario, "comprimido.npy"), comprimido)
+    with open(os.path.join(temporario, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump({"assinatura_geometria": _assinatura_geometria(grafo), "extensao": extensao,
+                   "parametros": _parametros(largura, espessura, cor_arestas, cor_fundo)}, f)
+    antigo = f"{diretorio}.old-{os.getpid()}"
+    shutil.rmtree(antigo, ignore_errors=True)
+    if os.path.exists(diretorio):
+        os.replace(diretorio, antigo)
+    os.replace(temporario, diretorio)
+    shutil.rmtree(antigo, ignore_errors=True)
+
+    return MapaBase(imagem, extensao, faixas, comprimido)
+
+
+def _parametros(largura, espessura, cor_arestas, cor_fundo):
+    return {"largura": largura, "espessura": espessura, "cor_arestas": list(_cor(cor_arestas)),
+            "cor_fundo": list(_cor(cor_fundo)), "altura_faixa": ALTURA_FAIXA}
+
+
+def carregar_mapa_base(grafo, diretorio=MAPA_BASE_DIRPATH, largura=LARGURA_PADRAO,
+                       espessura=ESPESSURA_ARESTAS_PADRAO, cor_arestas=COR_ARESTAS_PADRAO,
+                       cor_fundo=COR_FUNDO_PADRAO):
+    """
+    Carrega o mapa base de `diretorio` (mapeado em memória). Se ele não existir, tiver outros
+    parâmetros ou tiver sido desenhado para outro grafo, é rasterizado e salvo de novo.
+
+    Returns:
+        MapaBase: O mapa pronto para uso.
+    """
+    try:
+        with open(os.path.join(diretorio, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("assinatura_geometria") == _assinatura_geometria(grafo) and \
+                meta.get("parametros") == _parametros(largura, espessura, cor_arestas, cor_fundo):
+            return MapaBase(np.load(os.path.join(diretorio, "imagem.npy"), mmap_mode="r"), meta["extensao"],
+                            np.load(os.path.join(diretorio, "faixas.npy")),
+                            np.load(os.path.join(diretorio, "comprimido.npy"), mmap_mode="r"))
+        print(f"RENDER.PY: Mapa base em {diretorio} não corresponde ao grafo atual. Rasterizando...")
+    except (FileNotFoundError, json.JSONDecodeError, ValueError, KeyError):
+        print(f"RENDER.PY: Mapa base não encontrado em {diretorio}. Rasterizando...")
+
+    return preparar_mapa_base(grafo, diretorio, largura, espessura, cor_arestas, cor_fundo)
+
+
+def renderizar_rota(mapa, grafo, path, arquivo=None, cor="blue", espessura=ESPESSURA_ROTA_PADRAO,
+                    recortar=False, margem=MARGEM_RECORTE_PADRAO, titulo=None):
+    """
+    Desenha a rota sobre o mapa base, no lugar de ox.plot_graph_route: só a polilinha da rota
+    (e os marcadores de origem e destino) é rasterizada. Na imagem inteira, apenas as faixas do
+    PNG tocadas pela rota são comprimidas de novo; as demais são copiadas do cache.
+
+    Args:
+        mapa (MapaBase): O mapa base (ver `carregar_mapa_base`).
+        grafo (GrafoCSR): O grafo de onde vêm as coordenadas dos nós.
+        path (list): A rota como lista de IDs OSM (como em `ResultadoBusca.path`).
+        arquivo (str): Se informado, o PNG também é salvo nesse arquivo.
+        cor: Cor da rota (nome, '#rrggbb' ou tupla RGB).
+        espessura (float): Espessura da rota em pixels.
+        recortar (bool): Se True, a imagem é recortada no retângulo da rota mais `margem` pixels.
+        margem (int): Margem do recorte, em pixels.
+        titulo (str): Título gravado nos metadados do PNG.
+
+    Returns:
+        bytes: O PNG.
+
+    Raises:
+        KeyError: Se algum nó da rota não existir no grafo.
+    """
+    indices = []
+    for node_id in path or []:
+        i = grafo.indice(node_id)
+        if i is None:
+            raise KeyError(f"Nó {node_id} não existe no grafo")
+        indices.append(i)
+    indices = np.array(indices, dtype=np.int64)
+    c, l = mapa.para_pixels(np.asarray(grafo.x)[indices], np.asarray(grafo.y)[indices])
+    altura, largura = mapa.altura, mapa.largura
+
+    pixels = _pixels_segmentos(c[:-1], l[:-1], c[1:], l[1:], espessura, altura, largura)
+    if len(indices):
+        # Marcadores de origem e destino, um pouco mais largos que a linha
+        extremos = [0, len(indices) - 1]
+        pixels = np.concatenate((pixels, _pixels_segmentos(c[extremos], l[extremos], c[extremos], l[extremos],
+                                                           espessura * 1.6, altura, largura)))
+    linhas, colunas = pixels // largura, pixels % largura
+    cor = _cor(cor)
+
+    if recortar and len(pixels):
+        l0, l1 = max(int(linhas.min()) - margem, 0), min(int(linhas.max()) + margem + 1, altura)
+        c0, c1 = max(int(colunas.min()) - margem, 0), min(int(colunas.max()) + margem + 1, largura)
+        recorte = np.array(mapa.imagem[l0:l1, c0:c1])
+        recorte[linhas - l0, colunas - c0] = cor
+        trecho, adler, _ = _comprimir_faixa(recorte, NIVEL_ROTA, zlib.Z_RLE)
+        dados = _png(c1 - c0, l1 - l0, [trecho], adler, titulo)
+    else:
+        trechos = [None] * len(mapa.faixas)
+        adlers = mapa.faixas[:, 2].tolist()
+        if len(pixels):
+            f0, f1 = int(linhas.min()) // ALTURA_FAIXA, int(linhas.max()) // ALTURA_FAIXA + 1
+            bloco = np.array(mapa.imagem[f0 * ALTURA_FAIXA:f1 * ALTURA_FAIXA])
+            bloco[linhas - f0 * ALTURA_FAIXA, colunas] = cor
+            tocadas = np.zeros(f1 - f0, dtype=bool)
+            tocadas[np.unique(linhas // ALTURA_FAIXA - f0)] = True
+            for f in np.flatnonzero(tocadas).tolist():
+                trechos[f0 + f], adlers[f0 + f], _ = _comprimir_faixa(
+                    bloco[f * ALTURA_FAIXA:(f + 1) * ALTURA_FAIXA], NIVEL_ROTA, zlib.Z_RLE)
+        adler = 1
+        for f, tamanho in enumerate(mapa.faixas[:, 3].tolist()):
+            adler = _adler32_combinar(adler, adlers[f], tamanho)
+            if trechos[f] is None:
+                trechos[f] = mapa._trecho(f)
+        dados = _png(largura, altura, trechos, adler, titulo)
+
+    if arquivo:
+        with open(arquivo, "wb") as f:
+            f.write(dados)
+    return dados
+
+
+# Grafo e mapa base do processo trabalhador (carregados uma vez por processo)
+_GRAFO = None
+_MAPA = None
+
+
+def _inicializar_trabalhador(diretorio_snapshot, diretorio_mapa, parametros):
+    """Abre o snapshot e o mapa base mapeados em memória, compartilhados entre os processos."""
+    global _GRAFO, _MAPA
+    _GRAFO, _ = carregar_snapshot(diretorio_snapshot, mmap=True)
+    _MAPA = carregar_mapa_base(_GRAFO, diretorio_mapa, **parametros)
+
+
+def _renderizar_tarefa(tarefa):
+    inicio = time.perf_counter()
+    renderizar_rota(_MAPA, _GRAFO, **tarefa)
+    return tarefa["arquivo"], round((time.perf_counter() - inicio) * 1000, 3)
+
+
+def renderizar_rotas(tarefas, grafo=None, num_processos=None, diretorio_snapshot=SNAPSHOT_DIRPATH,
+                     diretorio_mapa=MAPA_BASE_DIRPATH, **parametros_mapa):
+    """
+    Renderiza muitas rotas em paralelo, num pool de processos que abrem o snapshot e o mapa base
+    uma vez cada (como em batch.py).
+
+    Args:
+        tarefas (iterable): Dicionários com os argumentos de `renderizar_rota` (path, arquivo e,
+            opcionalmente, cor, espessura, recortar, margem, titulo). `arquivo` é obrigatório.
+        grafo (GrafoCSR): Se informado, garante antes que o mapa base exista e esteja atualizado,
+            para que os trabalhadores não o rasterizem cada um.
+        num_processos (int): Número de processos (padrão: os.cpu_count()).
+        diretorio_snapshot (str): Snapshot aberto por cada trabalhador.
+        diretorio_mapa (str): Diretório do mapa base.
+        **parametros_mapa: largura, espessura, cor_arestas e cor_fundo do mapa base.
+
+    Returns:
+        dict: Estatísticas (rotas, tempo_s, rotas_por_s, tempo_ms_medio).
+    """
+    if grafo is not None:
+        carregar_mapa_base(grafo, diretorio_mapa, **parametros_mapa)
+    inicio = time.perf_counter()
+    tempos = []
+    with ProcessPoolExecutor(max_workers=num_processos or os.cpu_count(), initializer=_inicializar_trabalhador,
+                             initargs=(diretorio_snapshot, diretorio_mapa, parametros_mapa)) as executor:
+        for _, tempo_ms in executor.map(_renderizar_tarefa, tarefas, chunksize=8):
+            tempos.append(tempo_ms)
+    tempo_s = time.perf_counter() - inicio
+    return {"rotas": len(tempos), "tempo_s": round(tempo_s, 3),
+            "rotas_por_s": round(len(tempos) / tempo_s, 1) if tempo_s > 0 else None,
+            "tempo_ms_medio": round(sum(tempos) / len(tempos), 3) if tempos else None}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from a_star import a_star_search, haversine_heuristic
+    from batch import ler_pares
+    from snapshot import carregar_grafo_preparado
+
+    parser = argparse.ArgumentParser(description="Desenha rotas sobre o mapa base rasterizado em cache.")
+    parser.add_argument("origem", type=int, nargs="?")
+    parser.add_argument("destino", type=int, nargs="?")
+    parser.add_argument("--pares", help="Arquivo JSONL/CSV de pares (IDs OSM) para renderizar em lote")
+    parser.add_argument("--saida", default=".", help="Diretório dos PNGs")
+    parser.add_argument("--recortar", action="store_true", help="Recortar a imagem em volta da rota")
+    parser.add_argument("-p", "--processos", type=int, default=None)
+    parser.add_argument("--reconstruir", action="store_true", help="Rasterizar o mapa base de novo")
+    args = parser.parse_args()
+
+    grafo_principal, _ = carregar_grafo_preparado()
+    if grafo_principal is None:
+        print("RENDER.PY: Falha ao carregar o grafo.")
+        raise SystemExit(1)
+
+    inicio_mapa = time.perf_counter()
+    if args.reconstruir:
+        mapa_base = preparar_mapa_base(grafo_principal)
+    else:
+        mapa_base = carregar_mapa_base(grafo_principal)
+    print(f"RENDER.PY: Mapa base {mapa_base.largura}x{mapa_base.altura} pronto em "
+          f"{time.perf_counter() - inicio_mapa:.2f} s.")
+
+    pares = list(ler_pares(args.pares)) if args.pares else [(0, args.origem, args.destino)]
+    tarefas = []
+    for id_par, origem, destino in pares:
+        busca = a_star_search(grafo_principal, origem, destino, heuristic_func=haversine_heuristic)
+        if not busca.path:
+            print(f"RENDER.PY: Nenhum caminho de {origem} para {destino}.")
+            continue
+        tarefas.append({"path": busca.path, "recortar": args.recortar,
+                        "arquivo": os.path.join(args.saida, f"rota_{origem}_para_{destino}.png"),
+                        "titulo": f"Rota de {origem} para {destino} - Custo: {busca.custo:.0f}m"})
+
+    if len(tarefas) == 1:
+        inicio_rota = time.perf_counter()
+        renderizar_rota(mapa_base, grafo_principal, **tarefas[0])
+        print(f"RENDER.PY: {tarefas[0]['arquivo']} salvo em {(time.perf_counter() - inicio_rota) * 1000:.1f} ms.")
+    elif tarefas:
+        estatisticas = renderizar_rotas(tarefas, num_processos=args.processos)
+        print(f"RENDER.PY: {estatisticas['rotas']} rotas em {estatisticas['tempo_s']} s "
+              f"({estatisticas['tempo_ms_medio']} ms por rota, {estatisticas['rotas_por_s']} rotas/s).")
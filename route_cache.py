@@ -0,0 +1,345 @@
+# route_cache.py
+import heapq
+import sys
+from collections import OrderedDict
+
+from a_star import _heuristica_por_indice, haversine_heuristic
+from edge_overlay import SobreposicaoPesos
+from spatial_index import e_coordenada, indice_espacial_de, resolver_ponto
+
+ALGORITMOS = ("ucs", "astar")
+
+# Limite padrão de memória das árvores guardadas no cache (em bytes)
+MAX_BYTES_PADRAO = 256 * 1024 * 1024
+
+# Tamanho aproximado de um float e de um int do Python guardados nos dicionários da árvore
+_BYTES_POR_NUMERO = sys.getsizeof(1.5) + sys.getsizeof(2**40)
+
+
+class ArvoreCaminhosMinimos:
+    """
+    Árvore de caminhos mínimos a partir de uma origem fixa, que pode ser retomada.
+
+    Em vez de descartar `cost_so_far` e `came_from` ao fim de cada busca, a árvore guarda
+    também a fila de prioridade. Uma consulta a um destino já assentado é respondida direto
+    da árvore; para um destino novo, a busca continua de onde parou.
+
+    Com algoritmo "astar", ao mudar de destino as chaves da fila são recalculadas com a
+    heurística do novo destino: os nós assentados têm distância exata e a fronteira guarda o
+    melhor custo via nós assentados, então continuar o A* (com heurística consistente) é correto.
+
+    O mesmo invariante permite reparar a árvore quando o peso de uma aresta muda (ver
+    `aresta_alterada`): só os nós cuja distância pode ter mudado são descartados e voltam à
+    fronteira com o melhor custo via os nós que continuam assentados.
+    """
+
+    def __init__(self, grafo, inicio, algoritmo="ucs", heuristic_func=haversine_heuristic):
+        if algoritmo not in ALGORITMOS:
+            raise ValueError(f"Algoritmo desconhecido: {algoritmo}. Use um de {ALGORITMOS}.")
+        self.grafo = grafo
+        self.inicio = inicio
+        self.algoritmo = algoritmo
+        self.heuristic_func = heuristic_func
+        self.cost_so_far = {inicio: 0}
+        self.came_from = {inicio: -1}
+        self.assentados = set()
+        # Tuplas (chave, no, g_score); chave = g_score na UCS e g_score + h no A*
+        self.priority_queue = [(0, inicio, 0)]
+        self.objetivo_atual = None
+        self.completa = False
+        self.retomadas = 0
+
+    def _redirecionar(self, objetivo):
+        """Recalcula as chaves da fila do A* para a heurística do novo destino."""
+        heuristica = _heuristica_por_indice(self.heuristic_func, self.grafo, objetivo)
+        self.priority_queue = [(g + heuristica(no), no, g) for _, no, g in self.priority_queue
+                               if no not in self.assentados and g <= self.cost_so_far[no]]
+        heapq.heapify(self.priority_queue)
+        self.objetivo_atual = objetivo
+        return heuristica
+
+    def expandir_ate(self, objetivo):
+        """
+        Continua a busca até que `objetivo` (índice denso) esteja assentado ou o grafo alcançável acabe.
+
+        Returns:
+            bool: True se o objetivo foi alcançado.
+        """
+        if objetivo in self.assentados:
+            return True
+        if self.completa:
+            return False
+        self.retomadas += 1
+
+        offsets, alvos, pesos, _ = self.grafo.adjacencia()
+        priority_queue, cost_so_far, came_from, assentados = (self.priority_queue, self.cost_so_far,
+                                                              self.came_from, self.assentados)
+        heuristica = None
+        if self.algoritmo == "astar":
+            heuristica = self._redirecionar(objetivo)
+            priority_queue = self.priority_queue
+
+        while priority_queue:
+            _, current_node, current_cost = heapq.heappop(priority_queue)
+            if current_node in assentados or current_cost > cost_so_far[current_node]:
+                continue
+            assentados.add(current_node)
+
+            for i in range(offsets[current_node], offsets[current_node + 1]):
+                neighbor = alvos[i]
+                new_cost = current_cost + pesos[i]
+                if new_cost < cost_so_far.get(neighbor, float('inf')):
+                    cost_so_far[neighbor] = new_cost
+                    came_from[neighbor] = current_node
+                    chave = new_cost if heuristica is None else new_cost + heuristica(neighbor)
+                    heapq.heappush(priority_queue, (chave, neighbor, new_cost))
+
+            if current_node == objetivo:
+                return True
+
+        self.completa = True
+        return False
+
+    def aresta_alterada(self, u, v, peso_antigo, peso_novo):
+        """
+        Repara a árvore depois que o peso da aresta u->v (índices densos) mudou no grafo.
+
+        Se o peso aumentou, só importa se a árvore usa a aresta (came_from[v] == u): a subárvore
+        de v é descartada. Se diminuiu, nada muda se v já tem custo menor ou igual ao de qualquer
+        caminho pela aresta; senão a aresta é relaxada e, se houver nós assentados com custo acima
+        desse limite, só eles (e a fronteira acima do limite) são descartados.
+
+        Returns:
+            int: Quantos nós foram descartados ou tiveram o custo alterado (0 se a árvore não foi afetada).
+        """
+        if peso_novo > peso_antigo:
+            if u not in self.assentados or self.came_from.get(v) != u:
+                return 0
+            descartados = self._subarvore(v)
+        else:
+            # Nenhum caminho pela aresta custa menos que `limite`: a distância exata de u mais o peso
+            # novo ou, se u ainda não foi assentado, o menor custo da fronteira (um limite inferior).
+            if u in self.assentados:
+                limite = self.cost_so_far[u] + peso_novo
+            else:
+                limite = min((g for _, _, g in self.priority_queue), default=float('inf')) + peso_novo
+            if limite >= self.cost_so_far.get(v, float('inf')):
+                return 0
+            alterados = 0
+            if u in self.assentados and v not in self.assentados:
+                self.cost_so_far[v] = limite
+                self.came_from[v] = u
+                heapq.heappush(self.priority_queue, (limite, v, limite))
+                self.completa = False
+                alterados = 1
+            # No A* os assentados não formam uma bola ao redor da origem: qualquer um com custo
+            # acima do limite pode melhorar passando pela aresta.
+            descartados = [no for no, custo in self.cost_so_far.items() if custo > limite]
+            if not any(no in self.assentados for no in descartados):
+                return alterados
+        self._descartar(descartados)
+        return len(descartados)
+
+    def _subarvore(self, raiz):
+        """Nós (assentados ou na fronteira) cujo caminho na árvore passa por `raiz`."""
+        offsets, alvos, _, _ = self.grafo.adjacencia()
+        came_from = self.came_from
+        subarvore = [raiz]
+        for no in subarvore:
+            for i in range(offsets[no], offsets[no + 1]):
+                if came_from.get(alvos[i]) == no:
+                    subarvore.append(alvos[i])
+        return subarvore
+
+    def _descartar(self, nos):
+        """
+        Tira `nos` da árvore e os devolve à fronteira com o melhor custo via os nós que continuam
+        assentados (pelas arestas de entrada do grafo reverso). A fila é refeita só com a fronteira.
+        """
+        offsets, alvos, pesos, _ = self.grafo.reverso().adjacencia()
+        cost_so_far, came_from, assentados = self.cost_so_far, self.came_from, self.assentados
+        for no in nos:
+            assentados.discard(no)
+            del cost_so_far[no]
+            del came_from[no]
+        for no in nos:
+            for i in range(offsets[no], offsets[no + 1]):
+                anterior = alvos[i]
+                if anterior in assentados:
+                    novo_custo = cost_so_far[anterior] + pesos[i]
+                    if novo_custo < cost_so_far.get(no, float('inf')):
+                        cost_so_far[no] = novo_custo
+                        came_from[no] = anterior
+        # Com algoritmo "astar" a chave é refeita por `_redirecionar` na próxima expansão.
+        self.priority_queue = [(custo, no, custo) for no, custo in cost_so_far.items() if no not in assentados]
+        heapq.heapify(self.priority_queue)
+        self.completa = False
+
+    def caminho(self, objetivo):
+        """Caminho (índices densos) da origem até `objetivo`, que precisa estar assentado."""
+        path = []
+        node_iter = objetivo
+        while node_iter != -1:
+            path.append(node_iter)
+            node_iter = self.came_from[node_iter]
+        return path[::-1]
+
+    def nbytes(self):
+        """Estimativa da memória ocupada pela árvore (contêineres e os números guardados neles)."""
+        conteineres = (sys.getsizeof(self.cost_so_far) + sys.getsizeof(self.came_from) +
+                       sys.getsizeof(self.assentados) + sys.getsizeof(self.priority_queue))
+        return (conteineres + len(self.cost_so_far) * _BYTES_POR_NUMERO +
+                len(self.priority_queue) * (sys.getsizeof((0.0, 0, 0.0)) + _BYTES_POR_NUMERO))
+
+
+class CacheRotas:
+    """
+    Cache LRU de árvores de caminhos mínimos, limitado pela memória estimada das árvores.
+
+    A chave é (origem, algoritmo). Consultas com uma origem já vista reaproveitam (ou retomam)
+    a árvore existente em vez de buscar de novo. Os contadores `acertos`, `falhas`,
+    `despejos`, `retomadas` e `reparos` ficam disponíveis em `estatisticas()`.
+
+    Sobre uma `edge_overlay.SobreposicaoPesos`, o cache se inscreve nela e, a cada alteração de
+    peso, repara apenas as árvores que usam a aresta alterada (ver `ArvoreCaminhosMinimos.aresta_alterada`).
+    """
+
+    def __init__(self, grafo, max_bytes=MAX_BYTES_PADRAO, heuristic_func=haversine_heuristic):
+        self.grafo = grafo
+        self.max_bytes = max_bytes
+        self.heuristic_func = heuristic_func
+        self._arvores = OrderedDict()
+        self._bytes = {}
+        self.bytes_em_uso = 0
+        self.acertos = 0
+        self.falhas = 0
+        self.despejos = 0
+        self.retomadas = 0
+        self.reparos = 0
+        if isinstance(grafo, SobreposicaoPesos):
+            grafo.inscrever(self)
+
+    def __len__(self):
+        return len(self._arvores)
+
+    def arvore(self, start_node_id, algoritmo="ucs"):
+        """
+        Retorna a árvore da origem (criando-a em caso de falha) e a marca como usada recentemente.
+        A origem pode ser um ID de nó ou coordenadas (lat, lon), ajustadas ao nó mais próximo.
+        """
+        start_node_id = resolver_ponto(self.grafo, start_node_id)
+        chave = (start_node_id, algoritmo)
+        arvore = self._arvores.get(chave)
+        if arvore is not None:
+            self.acertos += 1
+            self._arvores.move_to_end(chave)
+            return arvore
+
+        self.falhas += 1
+        inicio = self.grafo.indice(start_node_id)
+        if inicio is None:
+            return None
+        arvore = ArvoreCaminhosMinimos(self.grafo, inicio, algoritmo, self.heuristic_func)
+        self._arvores[chave] = arvore
+        self._bytes[chave] = 0
+        return arvore
+
+    def _contabilizar(self, chave):
+        """Atualiza a memória da árvore `chave` e despeja as menos usadas se o limite foi excedido."""
+        novo = self._arvores[chave].nbytes()
+        self.bytes_em_uso += novo - self._bytes[chave]
+        self._bytes[chave] = novo
+        while self.bytes_em_uso > self.max_bytes and len(self._arvores) > 1:
+            chave_antiga = next(iter(self._arvores))
+            if chave_antiga == chave:
+                # A árvore em uso é a mais antiga restante: move para o fim e despeja a próxima.
+                self._arvores.move_to_end(chave)
+                continue
+            self._remover(chave_antiga)
+            self.despejos += 1
+
+    def _remover(self, chave):
+        del self._arvores[chave]
+        self.bytes_em_uso -= self._bytes.pop(chave)
+
+    def invalidar(self, start_node_id=None, algoritmo=None):
+        """Remove do cache as árvores da origem/algoritmo informados (ou todas, se nada for informado)."""
+        for chave in list(self._arvores):
+            if (start_node_id is None or chave[0] == start_node_id) and (algoritmo is None or chave[1] == algoritmo):
+                self._remover(chave)
+
+    def aresta_alterada(self, grafo, u, v, peso_antigo, peso_novo):
+        """Chamado pela sobreposição de pesos: repara as árvores afetadas pela aresta u->v."""
+        for chave, arvore in list(self._arvores.items()):
+            if arvore.aresta_alterada(u, v, peso_antigo, peso_novo):
+                self.reparos += 1
+                self._contabilizar(chave)
+
+    def um_para_muitos(self, start_node_id, goal_node_ids, algoritmo="ucs"):
+        """
+        Responde vários destinos a partir da mesma origem usando uma única árvore.
+
+        Args:
+            start_node_id (int | tuple): O ID do nó de início, ou coordenadas (lat, lon).
+            goal_node_ids (iterable): IDs dos nós de destino e/ou coordenadas (lat, lon), ajustadas
+                ao nó mais próximo todas de uma vez.
+            algoritmo (str): "ucs" ou "astar".
+
+        Returns:
+            dict: {goal_node_id: (caminho em IDs OSM, custo)}, com (None, inf) para destinos inalcançáveis.
+                  Destinos dados como coordenadas aparecem como a tupla (lat, lon).
+        """
+        start_node_id = resolver_ponto(self.grafo, start_node_id)
+        destinos = [tuple(goal) if e_coordenada(goal) else goal for goal in goal_node_ids]
+        coordenadas = [goal for goal in destinos if e_coordenada(goal)]
+        ajustados = {}
+        if coordenadas:
+            lats, lons = zip(*coordenadas)
+            ajustados = dict(zip(coordenadas, indice_espacial_de(self.grafo).ajustar_nos(lats, lons)[0].tolist()))
+
+        arvore = self.arvore(start_node_id, algoritmo)
+        resultados = {}
+        if arvore is None:
+            return {goal_node_id: (None, float('inf')) for goal_node_id in destinos}
+
+        retomadas_antes = arvore.retomadas
+        for goal_node_id in destinos:
+            objetivo = self.grafo.indice(ajustados.get(goal_node_id, goal_node_id))
+            if objetivo is None or not arvore.expandir_ate(objetivo):
+                resultados[goal_node_id] = (None, float('inf'))
+            else:
+                resultados[goal_node_id] = (self.grafo.ids_osm(arvore.caminho(objetivo)),
+                                            arvore.cost_so_far[objetivo])
+        self.retomadas += arvore.retomadas - retomadas_antes
+        self._contabilizar((start_node_id, algoritmo))
+        return resultados
+
+    def rota(self, start_node_id, goal_node_id, algoritmo="ucs"):
+        """Atalho para um único destino: retorna (caminho em IDs OSM, custo)."""
+        resultados = self.um_para_muitos(start_node_id, [goal_node_id], algoritmo)
+        return next(iter(resultados.values()))
+
+    def estatisticas(self):
+        """Contadores do cache, prontos para serem exportados como métricas."""
+        return {"arvores": len(self._arvores), "bytes_em_uso": self.bytes_em_uso, "max_bytes": self.max_bytes,
+                "acertos": self.acertos, "falhas": self.falhas, "despejos": self.despejos,
+                "retomadas": self.retomadas, "reparos": self.reparos}
+
+
+def um_para_muitos(grafo, start_node_id, goal_node_ids, algoritmo="ucs", cache=None):
+    """
+    Busca de uma origem para vários destinos assentando a árvore de caminhos mínimos uma só vez.
+
+    Args:
+        grafo (GrafoCSR): O grafo compilado.
+        start_node_id (int | tuple): O ID do nó de início, ou coordenadas (lat, lon).
+        goal_node_ids (iterable): IDs dos nós de destino e/ou coordenadas (lat, lon).
+        algoritmo (str): "ucs" ou "astar".
+        cache (CacheRotas): Cache a ser usado; sem cache, a árvore é descartada ao final.
+
+    Returns:
+        dict: {goal_node_id: (caminho em IDs OSM, custo)}, com (None, inf) para destinos inalcançáveis.
+    """
+    if cache is None:
+        cache = CacheRotas(grafo, max_bytes=float('inf'))
+    return cache.um_para_muitos(start_node_id, goal_node_ids, algoritmo)
@@ -0,0 +1,77 @@
+# search_result.py
+import time
+
+# Relógio usado pelos ganchos de tempo das buscas (só é consultado quando há um temporizador)
+relogio = time.perf_counter
+
+
+class ResultadoBusca:
+    """
+    Resultado de uma busca de caminho: o caminho, o custo e os contadores da execução.
+
+    Avalia como verdadeiro somente se um caminho foi encontrado, então `if resultado:`
+    funciona como o antigo `if path:`.
+
+    Atributos:
+        path (list): IDs dos nós da origem ao destino, ou None se não houver caminho.
+        custo (float): Soma dos 'length' do caminho (inf se não houver caminho).
+        algoritmo (str): Nome da busca que produziu o resultado.
+        nos_assentados (int): Nós retirados da fila e expandidos.
+        relaxamentos (int): Arestas examinadas a partir dos nós expandidos.
+        insercoes_fila (int): Inserções na fila de prioridade (heappush e a entrada inicial).
+        entradas_obsoletas (int): Entradas retiradas da fila que já tinham sido superadas.
+        pico_fronteira (int): Maior tamanho que a(s) fila(s) de prioridade atingiu(ram).
+    """
+
+    __slots__ = ("path", "custo", "algoritmo", "nos_assentados", "relaxamentos",
+                 "insercoes_fila", "entradas_obsoletas", "pico_fronteira")
+
+    def __init__(self, path=None, custo=float('inf'), algoritmo="", nos_assentados=0, relaxamentos=0,
+                 insercoes_fila=0, entradas_obsoletas=0, pico_fronteira=0):
+        self.path = path
+        self.custo = custo
+        self.algoritmo = algoritmo
+        self.nos_assentados = nos_assentados
+        self.relaxamentos = relaxamentos
+        self.insercoes_fila = insercoes_fila
+        self.entradas_obsoletas = entradas_obsoletas
+        self.pico_fronteira = pico_fronteira
+
+    def __bool__(self):
+        return self.path is not None
+
+    def __repr__(self):
+        passos = len(self.path) if self.path is not None else 0
+        return (f"ResultadoBusca(algoritmo={self.algoritmo!r}, custo={self.custo}, passos={passos}, "
+                f"nos_assentados={self.nos_assentados})")
+
+    def como_dict(self, incluir_caminho=False):
+        """Representação em dicionário (serializável em JSON) para exportar como métrica."""
+        dados = {nome: getattr(self, nome) for nome in self.__slots__ if nome != "path"}
+        if dados["custo"] == float('inf'):
+            dados["custo"] = None
+        dados["passos"] = len(self.path) if self.path is not None else 0
+        if incluir_caminho:
+            dados["path"] = self.path
+        return dados
+
+
+class MedidorFases:
+    """
+    Temporizador que pode ser passado como `temporizador` às buscas.
+
+    As buscas chamam `temporizador(fase, segundos)` ao fim de cada fase ("preparacao",
+    "busca" e "reconstrucao"). Sem temporizador (o padrão), o relógio nem é consultado.
+    """
+
+    def __init__(self):
+        self.totais = {}
+        self.contagens = {}
+
+    def __call__(self, fase, segundos):
+        self.totais[fase] = self.totais.get(fase, 0.0) + segundos
+        self.contagens[fase] = self.contagens.get(fase, 0) + 1
+
+    def como_dict(self):
+        """{fase: {"total_s": ..., "chamadas": ...}}"""
+        return {fase: {"total_s": total, "chamadas": self.contagens[fase]} for fase, total in self.totais.items()}
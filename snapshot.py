@@ -0,0 +1,179 @@
+# snapshot.py
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+
+from csr_graph import GrafoCSR, compilar_grafo
+from nearest_stop import calcular_campo_pontos, salvar_campo
+from spatial_index import construir_indice, salvar_indice
+from graph import GRAPH_FILEPATH, FEATURES_FILEPATH_GEOJSON, PLACE_FILE_PREFIX, carregar_e_preparar_grafo
+
+# Diretório do snapshot binário do grafo já preparado (topologia CSR, pesos, coordenadas e pontos de ônibus)
+SNAPSHOT_DIRPATH = f"{PLACE_FILE_PREFIX}_walk.snapshot"
+
+# Incrementar sempre que o formato dos arquivos mudar; snapshots de outra versão são reconstruídos.
+VERSAO_SNAPSHOT = 3
+
+ARQUIVO_META = "meta.json"
+ARRAYS_GRAFO = ("node_ids", "offsets", "alvos", "pesos", "x", "y")
+
+
+def checksum_fontes(caminhos=(GRAPH_FILEPATH, FEATURES_FILEPATH_GEOJSON)):
+    """
+    Calcula o checksum dos arquivos de origem (GraphML e GeoJSON) a partir do nome,
+    tamanho e data de modificação de cada um. Não lê o conteúdo, para que validar o
+    snapshot custe apenas alguns `os.stat`.
+
+    Returns:
+        str: O checksum em hexadecimal, ou None se algum arquivo de origem não existir.
+    """
+    sha = hashlib.sha256()
+    for caminho in caminhos:
+        try:
+            info = os.stat(caminho)
+        except FileNotFoundError:
+            return None
+        sha.update(f"{os.path.basename(caminho)}:{info.st_size}:{info.st_mtime_ns};".encode())
+    return sha.hexdigest()
+
+
+def salvar_snapshot(grafo, bus_stop_node_ids, diretorio=SNAPSHOT_DIRPATH, checksum=None):
+    """
+    Salva o grafo compilado em um diretório de arquivos .npy (um por array) mais um meta.json,
+    junto com o campo de pontos de ônibus mais próximos (ver nearest_stop.py) e o índice
+    espacial de nós e arestas (ver spatial_index.py).
+    A escrita é feita em um diretório temporário que depois substitui o anterior, para que
+    um processo lendo o snapshot nunca veja arquivos pela metade; o anterior só é apagado
+    depois da troca.
+
+    Args:
+        grafo (GrafoCSR): O grafo compilado.
+        bus_stop_node_ids (list): IDs dos nós que são pontos de ônibus (como em `carregar_e_preparar_grafo`).
+        diretorio (str): Diretório de destino.
+        checksum (str): Checksum das fontes (ver `checksum_fontes`).
+    """
+    temporario = f"{diretorio}.tmp-{os.getpid()}"
+    shutil.rmtree(temporario, ignore_errors=True)
+    os.makedirs(temporario)
+
+    for nome in ARRAYS_GRAFO:
+        np.save(os.path.join(temporario, f"{nome}.npy"), np.ascontiguousarray(getattr(grafo, nome)))
+    np.save(os.path.join(temporario, "bus_stop_node_ids.npy"), np.asarray(bus_stop_node_ids, dtype=np.int64))
+    salvar_campo(calcular_campo_pontos(grafo, bus_stop_node_ids), temporario)
+    salvar_indice(construir_indice(grafo), temporario)
+
+    meta = {
+        "versao": VERSAO_SNAPSHOT,
+        "checksum_fontes": checksum,
+        "num_nos": grafo.num_nos,
+        "num_arestas": grafo.num_arestas,
+        # Chaves JSON são strings; convertidas de volta para int em carregar_snapshot.
+        "bus_stops": {str(node_id): info for node_id, info in grafo.bus_stops.items()},
+    }
+    with open(os.path.join(temporario, ARQUIVO_META), "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, default=str)
+
+    # O diretório anterior é afastado antes da troca e só então apagado: sem ele some apenas
+    # entre duas renomeações, e não durante todo o rmtree.
+    antigo = f"{diretorio}.old-{os.getpid()}"
+    shutil.rmtree(antigo, ignore_errors=True)
+    if os.path.exists(diretorio):
+        os.replace(diretorio, antigo)
+    os.replace(temporario, diretorio)
+    shutil.rmtree(antigo, ignore_errors=True)
+
+
+def ler_meta(diretorio=SNAPSHOT_DIRPATH):
+    """Lê o meta.json do snapshot. Retorna None se ele não existir ou estiver corrompido."""
+    try:
+        with open(os.path.join(diretorio, ARQUIVO_META), encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def carregar_snapshot(diretorio=SNAPSHOT_DIRPATH, mmap=True):
+    """
+    Carrega um snapshot salvo por `salvar_snapshot`.
+
+    Args:
+        diretorio (str): Diretório do snapshot.
+        mmap (bool): Se True, os arrays são mapeados em memória (somente leitura) em vez de lidos,
+                     o que torna a carga quase instantânea e permite que vários processos
+                     compartilhem as mesmas páginas.
+
+    Returns:
+        tuple: (GrafoCSR, list) com o grafo e os IDs dos nós que são pontos de ônibus,
+               ou (None, []) se o snapshot não existir ou for de outra versão.
+    """
+    meta = ler_meta(diretorio)
+    if meta is None or meta.get("versao") != VERSAO_SNAPSHOT:
+        return None, []
+
+    mmap_mode = "r" if mmap else None
+    try:
+        arrays = {nome: np.load(os.path.join(diretorio, f"{nome}.npy"), mmap_mode=mmap_mode)
+                  for nome in ARRAYS_GRAFO}
+        bus_stop_node_ids = np.load(os.path.join(diretorio, "bus_stop_node_ids.npy")).tolist()
+    except (FileNotFoundError, ValueError) as e:
+        print(f"SNAPSHOT.PY: Snapshot em {diretorio} incompleto ou corrompido: {e}")
+        return None, []
+
+    bus_stops = {int(node_id): info for node_id, info in meta["bus_stops"].items()}
+    grafo = GrafoCSR(bus_stops=bus_stops, **arrays)
+    grafo.diretorio = diretorio
+    return grafo, bus_stop_node_ids
+
+
+def carregar_grafo_preparado(diretorio=SNAPSHOT_DIRPATH, forcar_reconstrucao=False, mmap=True):
+    """
+    Carrega o grafo já preparado (compilado, com os pontos de ônibus associados) a partir do
+    snapshot binário. Se o snapshot não existir, for de outra versão ou os arquivos de origem
+    tiverem mudado, ele é reconstruído via `carregar_e_preparar_grafo` e salvo novamente.
+
+    Args:
+        diretorio (str): Diretório do snapshot.
+        forcar_reconstrucao (bool): Se True, ignora o snapshot existente.
+        mmap (bool): Repassado para `carregar_snapshot`.
+
+    Returns:
+        tuple: (GrafoCSR, list) com o grafo compilado e os IDs dos nós que são pontos de ônibus.
+               Retorna (None, []) em caso de falha no carregamento do grafo.
+    """
+    checksum = checksum_fontes()
+
+    if not forcar_reconstrucao:
+        meta = ler_meta(diretorio)
+        if meta is not None and meta.get("versao") == VERSAO_SNAPSHOT:
+            if checksum is None or meta.get("checksum_fontes") == checksum:
+                inicio = time.perf_counter()
+                grafo, bus_stop_node_ids = carregar_snapshot(diretorio, mmap=mmap)
+                if grafo is not None:
+                    print(f"SNAPSHOT.PY: Grafo carregado do snapshot {diretorio} em "
+                          f"{(time.perf_counter() - inicio) * 1000:.1f} ms "
+                          f"({grafo.num_nos} nós, {grafo.num_arestas} arestas).")
+                    return grafo, bus_stop_node_ids
+            else:
+                print("SNAPSHOT.PY: Arquivos de origem mudaram desde o snapshot. Reconstruindo...")
+
+    G, bus_stop_node_ids = carregar_e_preparar_grafo(plotar_grafo_geral=False)
+    if G is None:
+        return None, []
+
+    grafo = compilar_grafo(G)
+    # O checksum é recalculado: carregar_e_preparar_grafo pode ter baixado/salvo as fontes agora.
+    salvar_snapshot(grafo, bus_stop_node_ids, diretorio, checksum=checksum_fontes())
+    print(f"SNAPSHOT.PY: Snapshot salvo em {diretorio}.")
+    return grafo, bus_stop_node_ids
+
+
+if __name__ == "__main__":
+    grafo_principal, ids_pontos_onibus = carregar_grafo_preparado(forcar_reconstrucao=True)
+    if grafo_principal is not None:
+        print(f"Snapshot gerado: {grafo_principal.num_nos} nós, {len(ids_pontos_onibus)} pontos de ônibus.")
+    else:
+        print("Falha ao gerar o snapshot.")
@@ -0,0 +1,372 @@
+# spatial_index.py
+import os
+import pickle
+
+import numpy as np
+
+from csr_graph import GrafoCSR
+
+# Raio médio da Terra em metros (o mesmo usado pelo osmnx para calcular o 'length' das arestas)
+RAIO_TERRA_METROS = 6371009
+
+# Incrementar sempre que o conteúdo salvo do índice mudar; índices de outra versão são reconstruídos.
+VERSAO_INDICE = 1
+
+ARQUIVO_INDICE = "indice_espacial.pickle"
+
+# Arestas longas são divididas em pedaços de no máximo este comprimento (m) na árvore de arestas,
+# para que a busca pela aresta mais próxima só precise olhar poucos candidatos.
+COMPRIMENTO_MAXIMO_PEDACO = 50.0
+
+# Pedaços de aresta mais próximos avaliados de uma vez para cada ponto em `ajustar_arestas`
+CANDIDATOS_ARESTA = 8
+
+# Pontos processados por vez nos ajustes em massa (limita a memória dos arrays temporários)
+TAMANHO_BLOCO = 1 << 18
+
+
+def e_coordenada(ponto):
+    """True se `ponto` é um par (lat, lon) em vez de um ID de nó."""
+    return isinstance(ponto, (tuple, list))
+
+
+class IndiceEspacial:
+    """
+    Índice espacial (KD-trees do SciPy) sobre as coordenadas dos nós e, opcionalmente, das arestas.
+
+    As coordenadas são projetadas em metros com uma projeção equirretangular em torno da
+    latitude média do grafo, precisa o bastante na escala de uma cidade. Todas as consultas
+    são vetorizadas: recebem arrays de latitudes e longitudes.
+
+    Atributos:
+        node_ids (numpy.ndarray[int64]): IDs OSM dos nós, na ordem dos índices densos.
+        cos_referencia (float): Cosseno da latitude de referência da projeção.
+        indices_nos (numpy.ndarray[int64]): Índice denso de cada ponto da árvore de nós.
+        segmentos (numpy.ndarray[int32]): (m, 2) com os nós (u < v) de cada aresta, sem repetir sentidos.
+        peso_ida, peso_volta (numpy.ndarray[float64]): 'length' de u->v e de v->u (inf se o sentido não existir).
+        assinatura_grafo (str): Assinatura do GrafoCSR usado na construção (ou None).
+    """
+
+    def __init__(self, node_ids, x, y, origens=None, alvos=None, pesos=None, assinatura_grafo=None):
+        from scipy.spatial import cKDTree
+
+        self.node_ids = np.asarray(node_ids)
+        self.assinatura_grafo = assinatura_grafo
+        self.cos_referencia = float(np.cos(np.radians(np.nanmean(y))))
+        self._pontos = np.column_stack(self._projetar(np.asarray(y), np.asarray(x)))
+        self.indices_nos = np.flatnonzero(~np.isnan(self._pontos).any(axis=1))
+        self.arvore_nos = cKDTree(self._pontos[self.indices_nos])
+
+        self.segmentos = self.arvore_pedacos = None
+        if origens is not None:
+            self._construir_arestas(np.asarray(origens), np.asarray(alvos), np.asarray(pesos))
+
+    def _projetar(self, lats, lons):
+        """Converte (lat, lon) em graus para (x, y) em metros na projeção do índice."""
+        escala = RAIO_TERRA_METROS * np.pi / 180
+        return np.asarray(lons) * (escala * self.cos_referencia), np.asarray(lats) * escala
+
+    def _construir_arestas(self, origens, alvos, pesos):
+        from scipy.spatial import cKDTree
+
+        # Um segmento por par de nós, com o peso de cada sentido (o menor, se houver repetições).
+        validos = (origens != alvos) & ~np.isnan(self._pontos[origens]).any(axis=1) & \
+            ~np.isnan(self._pontos[alvos]).any(axis=1)
+        origens, alvos, pesos = origens[validos], alvos[validos], pesos[validos]
+        u, v = np.minimum(origens, alvos), np.maximum(origens, alvos)
+        chaves = u.astype(np.int64) * len(self._pontos) + v
+        unicas, posicao = np.unique(chaves, return_inverse=True)
+        self.segmentos = np.column_stack((unicas // len(self._pontos), unicas % len(self._pontos))).astype(np.int32)
+        self.peso_ida = np.full(len(unicas), np.inf)
+        self.peso_volta = np.full(len(unicas), np.inf)
+        ida = origens < alvos
+        np.minimum.at(self.peso_ida, posicao[ida], pesos[ida])
+        np.minimum.at(self.peso_volta, posicao[~ida], pesos[~ida])
+
+        # Pedaços de no máximo COMPRIMENTO_MAXIMO_PEDACO; a árvore guarda o ponto médio de cada um.
+        a, b = self._pontos[self.segmentos[:, 0]], self._pontos[self.segmentos[:, 1]]
+        comprimentos = np.hypot(*(b - a).T)
+        num_pedacos = np.maximum(1, np.ceil(comprimentos / COMPRIMENTO_MAXIMO_PEDACO)).astype(np.int64)
+        self.segmento_do_pedaco = np.repeat(np.arange(len(self.segmentos), dtype=np.int32), num_pedacos)
+        inicio_pedaco = np.arange(len(self.segmento_do_pedaco)) - np.repeat(np.cumsum(num_pedacos) - num_pedacos,
+                                                                           num_pedacos)
+        fracao_meio = (inicio_pedaco + 0.5) / num_pedacos[self.segmento_do_pedaco]
+        a_p, b_p = a[self.segmento_do_pedaco], b[self.segmento_do_pedaco]
+        self.arvore_pedacos = cKDTree(a_p + (b_p - a_p) * fracao_meio[:, None])
+        self.meio_pedaco_maximo = float(np.max(comprimentos / num_pedacos / 2)) if len(comprimentos) else 0.0
+
+    @property
+    def tem_arestas(self):
+        return self.arvore_pedacos is not None
+
+    def ajustar_indices(self, lats, lons):
+        """
+        Nó mais próximo de cada ponto, em índices densos.
+
+        Returns:
+            tuple: (numpy.ndarray[int64], numpy.ndarray[float64]) com os índices dos nós e as
+                   distâncias (m) dos pontos até eles.
+        """
+        lats, lons = np.atleast_1d(np.asarray(lats, dtype=np.float64)), np.atleast_1d(np.asarray(lons, dtype=np.float64))
+        indices = np.empty(len(lats), dtype=np.int64)
+        distancias = np.empty(len(lats))
+        for inicio in range(0, len(lats), TAMANHO_BLOCO):
+            fim = inicio + TAMANHO_BLOCO
+            pontos = np.column_stack(self._projetar(lats[inicio:fim], lons[inicio:fim]))
+            distancias[inicio:fim], posicoes = self.arvore_nos.query(pontos, workers=-1)
+            indices[inicio:fim] = self.indices_nos[posicoes]
+        return indices, distancias
+
+    def ajustar_nos(self, lats, lons):
+        """
+        Ajuste em massa de coordenadas ao nó mais próximo.
+
+        Args:
+            lats, lons (array-like): Latitudes e longitudes em graus (escalares ou arrays de qualquer tamanho).
+
+        Returns:
+            tuple: (numpy.ndarray[int64], numpy.ndarray[float64]) com os IDs OSM dos nós mais
+                   próximos e as distâncias (m) até eles.
+        """
+        indices, distancias = self.ajustar_indices(lats, lons)
+        return self.node_ids[indices], distancias
+
+    def _distancias_segmentos(self, pontos, segmentos):
+        """Distância de cada ponto a cada segmento candidato e a fração (0..1) do ponto projetado sobre ele."""
+        a, b = self._pontos[self.segmentos[segmentos, 0]], self._pontos[self.segmentos[segmentos, 1]]
+        ab = b - a
+        comprimento2 = np.einsum('...i,...i->...', ab, ab)
+        fracao = np.einsum('...i,...i->...', pontos - a, ab) / np.where(comprimento2 > 0, comprimento2, 1.0)
+        fracao = np.clip(fracao, 0.0, 1.0)
+        distancia = np.hypot(*np.moveaxis(pontos - (a + ab * fracao[..., None]), -1, 0))
+        return distancia, fracao
+
+    def ajustar_segmentos(self, lats, lons):
+        """
+        Aresta mais próxima de cada ponto (ver `ajustar_arestas`), em índices de `segmentos`.
+
+        Returns:
+            tuple: (segmento, fracao, distancia), arrays com um elemento por ponto.
+        """
+        if not self.tem_arestas:
+            raise ValueError("Este índice espacial foi construído sem as arestas do grafo.")
+        lats, lons = np.atleast_1d(np.asarray(lats, dtype=np.float64)), np.atleast_1d(np.asarray(lons, dtype=np.float64))
+        segmento = np.empty(len(lats), dtype=np.int64)
+        fracao = np.empty(len(lats))
+        distancia = np.empty(len(lats))
+        k = min(CANDIDATOS_ARESTA, len(self.segmento_do_pedaco))
+
+        for inicio in range(0, len(lats), TAMANHO_BLOCO):
+            fim = inicio + TAMANHO_BLOCO
+            pontos = np.column_stack(self._projetar(lats[inicio:fim], lons[inicio:fim]))
+            distancia_pedacos, pedacos = self.arvore_pedacos.query(pontos, k=k, workers=-1)
+            distancia_pedacos, pedacos = distancia_pedacos.reshape(len(pontos), k), pedacos.reshape(len(pontos), k)
+            candidatos = self.segmento_do_pedaco[pedacos]
+            d, f = self._distancias_segmentos(pontos[:, None, :], candidatos)
+            melhor = np.argmin(d, axis=1)
+            linhas = np.arange(len(pontos))
+            bloco_segmento, bloco_fracao, bloco_distancia = candidatos[linhas, melhor], f[linhas, melhor], d[linhas, melhor]
+
+            # Um pedaço fora dos k candidatos está a pelo menos (distância do k-ésimo - meio pedaço)
+            # do ponto; se a melhor aresta não está garantidamente mais perto, verifica todos os
+            # pedaços dentro desse raio.
+            duvidosos = np.flatnonzero(bloco_distancia > distancia_pedacos[:, -1] - self.meio_pedaco_maximo)
+            if k == len(self.segmento_do_pedaco):
+                duvidosos = ()
+            for i in duvidosos:
+                proximos = self.arvore_pedacos.query_ball_point(pontos[i], bloco_distancia[i] + self.meio_pedaco_maximo)
+                candidatos_i = np.unique(self.segmento_do_pedaco[proximos])
+                d_i, f_i = self._distancias_segmentos(pontos[i], candidatos_i)
+                j = np.argmin(d_i)
+                bloco_segmento[i], bloco_fracao[i], bloco_distancia[i] = candidatos_i[j], f_i[j], d_i[j]
+
+            segmento[inicio:fim], fracao[inicio:fim], distancia[inicio:fim] = bloco_segmento, bloco_fracao, bloco_distancia
+        return segmento, fracao, distancia
+
+    def ajustar_arestas(self, lats, lons):
+        """
+        Ajuste em massa de coordenadas ao ponto mais próximo sobre as arestas do grafo.
+
+        O ponto ajustado fica a uma fração `fracao` do caminho de u até v. Os custos de entrada
+        são interpolados pelo 'length' da aresta: sair do ponto até u custa fracao * length(v->u)
+        e até v custa (1 - fracao) * length(u->v); inf se o sentido não existir (mão única).
+
+        Returns:
+            dict: Arrays "u" e "v" (IDs OSM), "fracao", "distancia" (m do ponto até a aresta),
+                  "custo_ate_u" e "custo_ate_v".
+        """
+        segmento, fracao, distancia = self.ajustar_segmentos(lats, lons)
+        u, v = self.segmentos[segmento, 0], self.segmentos[segmento, 1]
+        custo_ate_u, custo_ate_v = self.custos_trecho(segmento, fracao)
+        return {"u": self.node_ids[u], "v": self.node_ids[v], "fracao": fracao, "distancia": distancia,
+                "custo_ate_u": custo_ate_u, "custo_ate_v": custo_ate_v}
+
+    def custos_trecho(self, segmento, fracao, ate=1.0):
+        """
+        Custo de ir do ponto a uma fração `fracao` do segmento até a fração `ate` (padrão: a ponta v)
+        e até a ponta u, interpolado pelo 'length' de cada sentido. inf se o sentido não existir.
+
+        Returns:
+            tuple: (custo até u, custo até `ate`).
+        """
+        ida, volta = self.peso_ida[segmento], self.peso_volta[segmento]
+        # 0 * inf daria NaN; um trecho de comprimento zero custa 0 mesmo numa mão única.
+        with np.errstate(invalid="ignore"):
+            ate_u = np.where(fracao > 0, fracao * volta, 0.0)
+            ate_fim = np.where(ate > fracao, (ate - fracao) * ida, np.where(ate < fracao, (fracao - ate) * volta, 0.0))
+        return ate_u, ate_fim
+
+    def nbytes(self):
+        """Memória aproximada do índice (pontos projetados e árvores), em bytes."""
+        total = self._pontos.nbytes + self.indices_nos.nbytes + self.arvore_nos.data.nbytes
+        if self.tem_arestas:
+            total += (self.segmentos.nbytes + self.peso_ida.nbytes + self.peso_volta.nbytes +
+                      self.segmento_do_pedaco.nbytes + self.arvore_pedacos.data.nbytes)
+        return total
+
+
+def construir_indice(graph, com_arestas=True):
+    """
+    Constrói o índice espacial de um GrafoCSR (nós e arestas) ou de um MultiDiGraph do osmnx (só nós).
+
+    Args:
+        graph (GrafoCSR | networkx.MultiDiGraph): O grafo.
+        com_arestas (bool): Se True (e o grafo for um GrafoCSR), indexa também as arestas.
+
+    Returns:
+        IndiceEspacial: O índice.
+    """
+    if isinstance(graph, GrafoCSR):
+        if not com_arestas:
+            return IndiceEspacial(graph.node_ids, graph.x, graph.y, assinatura_grafo=graph.assinatura())
+        origens = np.repeat(np.arange(graph.num_nos, dtype=np.int32), np.diff(graph.offsets))
+        return IndiceEspacial(graph.node_ids, graph.x, graph.y, origens, graph.alvos, graph.pesos,
+                              assinatura_grafo=graph.assinatura())
+    nos = list(graph.nodes(data=True))
+    return IndiceEspacial([node_id for node_id, _ in nos],
+                          [dados.get('x', np.nan) for _, dados in nos],
+                          [dados.get('y', np.nan) for _, dados in nos])
+
+
+def salvar_indice(indice, diretorio):
+    """Salva o índice (com as árvores já construídas) em `diretorio`, normalmente o diretório do snapshot."""
+    with open(os.path.join(diretorio, ARQUIVO_INDICE), "wb") as f:
+        pickle.dump({"versao": VERSAO_INDICE, "indice": indice}, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def carregar_indice(grafo, diretorio):
+    """
+    Carrega o índice salvo por `salvar_indice`, ou None se o arquivo não existir, for de outra
+    versão ou tiver sido construído para outro grafo. Carregar as árvores prontas é bem mais
+    rápido que reconstruí-las.
+    """
+    try:
+        with open(os.path.join(diretorio, ARQUIVO_INDICE), "rb") as f:
+            dados = pickle.load(f)
+    except (FileNotFoundError, pickle.UnpicklingError, EOFError):
+        return None
+    if dados.get("versao") != VERSAO_INDICE or dados["indice"].assinatura_grafo != grafo.assinatura():
+        return None
+    return dados["indice"]
+
+
+def indice_espacial_de(graph):
+    """
+    Índice espacial do grafo, guardado junto dele após a primeira chamada.
+
+    Para um GrafoCSR carregado de um snapshot, o índice salvo no snapshot é usado; se não
+    houver, o índice é construído. Para um MultiDiGraph, o índice (só de nós) fica em graph.graph.
+    """
+    if isinstance(graph, GrafoCSR):
+        if graph._indice_espacial is None:
+            if graph.diretorio is not None:
+                graph._indice_espacial = carregar_indice(graph, graph.diretorio)
+            if graph._indice_espacial is None:
+                graph._indice_espacial = construir_indice(graph)
+        return graph._indice_espacial
+    if "indice_espacial" not in graph.graph:
+        graph.graph["indice_espacial"] = construir_indice(graph)
+    return graph.graph["indice_espacial"]
+
+
+def resolver_ponto(graph, ponto):
+    """
+    Converte `ponto` em um ID de nó: IDs são retornados como estão e coordenadas (lat, lon)
+    são ajustadas ao nó mais próximo. É o que permite às buscas receberem coordenadas.
+    """
+    if not e_coordenada(ponto):
+        return ponto
+    if graph is None:
+        raise ValueError("Coordenadas exigem o grafo para serem ajustadas a um nó.")
+    lat, lon = ponto
+    return int(indice_espacial_de(graph).ajustar_nos(lat, lon)[0][0])
+
+
+def resolver_pontos(graph, start_node_id, goal_node_id):
+    """Aplica `resolver_ponto` à origem e ao destino de uma busca."""
+    return resolver_ponto(graph, start_node_id), resolver_ponto(graph, goal_node_id)
+
+
+def ajustar_csv(caminho_entrada, caminho_saida, grafo, arestas=False, linhas_por_bloco=1_000_000):
+    """
+    Ajusta em massa as coordenadas de um CSV (colunas lat e lon) aos nós ou arestas do grafo,
+    em blocos, de modo que arquivos com milhões de pontos não precisem caber na memória.
+
+    As colunas do arquivo de entrada são mantidas; são acrescentadas node_id e distancia_m
+    (ou u, v, fracao, distancia_m, custo_ate_u e custo_ate_v, com `arestas=True`).
+
+    Returns:
+        int: O número de pontos ajustados.
+    """
+    import pandas as pd
+
+    indice = indice_espacial_de(grafo)
+    total = 0
+    for numero, bloco in enumerate(pd.read_csv(caminho_entrada, chunksize=linhas_por_bloco)):
+        lats, lons = bloco["lat"].to_numpy(dtype=np.float64), bloco["lon"].to_numpy(dtype=np.float64)
+        if arestas:
+            ajuste = indice.ajustar_arestas(lats, lons)
+            bloco = bloco.assign(u=ajuste["u"], v=ajuste["v"], fracao=ajuste["fracao"],
+                                 distancia_m=ajuste["distancia"], custo_ate_u=ajuste["custo_ate_u"],
+                                 custo_ate_v=ajuste["custo_ate_v"])
+        else:
+            node_ids, distancias = indice.ajustar_nos(lats, lons)
+            bloco = bloco.assign(node_id=node_ids, distancia_m=distancias)
+        bloco.to_csv(caminho_saida, mode="w" if numero == 0 else "a", header=numero == 0, index=False)
+        total += len(bloco)
+    return total
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    from snapshot import SNAPSHOT_DIRPATH, carregar_grafo_preparado
+
+    parser = argparse.ArgumentParser(description="Constrói o índice espacial ou ajusta coordenadas de um CSV (lat, lon).")
+    parser.add_argument("entrada", nargs="?", help="CSV com colunas lat e lon (sem arquivo: só constrói o índice)")
+    parser.add_argument("-o", "--saida", help="CSV de saída (padrão: <entrada>.ajustado.csv)")
+    parser.add_argument("--arestas", action="store_true", help="Ajustar à aresta mais próxima em vez do nó")
+    args = parser.parse_args()
+
+    grafo_principal, _ = carregar_grafo_preparado()
+    if grafo_principal is None:
+        print("SPATIAL_INDEX.PY: Falha ao carregar o grafo.")
+        raise SystemExit(1)
+
+    inicio_tempo = time.perf_counter()
+    indice_principal = indice_espacial_de(grafo_principal)
+    print(f"SPATIAL_INDEX.PY: Índice com {len(indice_principal.indices_nos)} nós e "
+          f"{len(indice_principal.segmentos)} arestas pronto em {time.perf_counter() - inicio_tempo:.2f} s "
+          f"({indice_principal.nbytes() / 1e6:.1f} MB).")
+    if carregar_indice(grafo_principal, SNAPSHOT_DIRPATH) is None:
+        salvar_indice(indice_principal, SNAPSHOT_DIRPATH)
+        print(f"SPATIAL_INDEX.PY: Índice salvo em {SNAPSHOT_DIRPATH}.")
+
+    if args.entrada:
+        saida = args.saida or f"{os.path.splitext(args.entrada)[0]}.ajustado.csv"
+        inicio_tempo = time.perf_counter()
+        total = ajustar_csv(args.entrada, saida, grafo_principal, arestas=args.arestas)
+        tempo = time.perf_counter() - inicio_tempo
+        print(f"SPATIAL_INDEX.PY: {total} pontos ajustados em {tempo:.1f} s "
+              f"({total / tempo if tempo > 0 else 0:.0f} pontos/s), salvos em {saida}.")
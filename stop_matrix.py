@@ -0,0 +1,241 @@
+# stop_matrix.py
+import json
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# Limite de memória (bytes) da matriz temporária de um lote: csgraph.dijkstra devolve as
+# distâncias de cada origem do lote para todos os nós do grafo (lote x num_nos float64).
+MEMORIA_LOTE_PADRAO = 64 * 1024 * 1024
+
+ARQUIVO_META = "meta.json"
+
+# Matriz de distâncias do processo trabalhador (montada uma vez por processo em _inicializar_trabalhador)
+_MATRIZ = None
+_COLUNAS = None
+
+
+def matriz_esparsa(grafo):
+    """
+    Exporta o GrafoCSR para uma scipy.sparse.csr_matrix (num_nos x num_nos) com os pesos das
+    arestas, sem copiar a topologia: os arrays CSR do grafo já estão no formato do SciPy.
+    Arestas de comprimento 0 continuam sendo arestas (zeros explícitos não são removidos).
+    """
+    from scipy.sparse import csr_matrix
+
+    return csr_matrix((np.asarray(grafo.pesos), np.asarray(grafo.alvos), np.asarray(grafo.offsets)),
+                      shape=(grafo.num_nos, grafo.num_nos))
+
+
+def _inicializar_trabalhador(matriz, colunas):
+    global _MATRIZ, _COLUNAS
+    _MATRIZ = matriz
+    _COLUNAS = colunas
+
+
+def _distancias_lote(origens, corte):
+    """Distâncias (float32) das `origens` até os pontos de ônibus (_COLUNAS), via csgraph.dijkstra."""
+    from scipy.sparse.csgraph import dijkstra
+
+    distancias = dijkstra(_MATRIZ, directed=True, indices=origens, limit=np.inf if corte is None else corte)
+    return distancias[:, _COLUNAS].astype(np.float32)
+
+
+def _lote_esparso(origens, corte):
+    """Como `_distancias_lote`, mas devolve só as entradas finitas: (contagem por linha, colunas, valores)."""
+    bloco = _distancias_lote(origens, corte)
+    linhas, colunas = np.nonzero(np.isfinite(bloco))
+    return np.bincount(linhas, minlength=len(bloco)), colunas.astype(np.int32), bloco[linhas, colunas]
+
+
+class MatrizPontos:
+    """
+    Matriz de distâncias de caminhada entre pontos de ônibus, como gravada por `calcular_matriz`.
+
+    A linha i e a coluna j correspondem a `ids[i]` e `ids[j]`; a distância é a de i até j
+    (a rede de caminhada pode ter mãos únicas, então a matriz não é necessariamente simétrica).
+
+    Atributos:
+        ids (numpy.ndarray[int64]): IDs OSM dos pontos, em ordem crescente (índice da matriz).
+        corte (float): Distância máxima gravada (None se não houver corte).
+        densa (numpy.ndarray[float32]): Matriz k x k mapeada em memória (inf = inalcançável), ou None.
+        esparsa (scipy.sparse.csr_matrix): Entradas dentro do corte, ou None. Ausente = além do corte.
+    """
+
+    def __init__(self, ids, corte=None, densa=None, esparsa=None):
+        self.ids = ids
+        self.corte = corte
+        self.densa = densa
+        self.esparsa = esparsa
+
+    def __len__(self):
+        return len(self.ids)
+
+    def indice(self, node_id):
+        """Posição do ponto `node_id` na matriz, ou None se ele não for um dos pontos."""
+        i = int(np.searchsorted(self.ids, node_id))
+        if i < len(self.ids) and self.ids[i] == node_id:
+            return i
+        return None
+
+    def distancia(self, origem_id, destino_id):
+        """Distância (m) entre dois pontos; inf se inalcançável ou além do corte."""
+        i, j = self.indice(origem_id), self.indice(destino_id)
+        if i is None or j is None:
+            raise KeyError(f"{origem_id if i is None else destino_id} não é um ponto de ônibus da matriz")
+        if self.densa is not None:
+            return float(self.densa[i, j])
+        inicio, fim = self.esparsa.indptr[i], self.esparsa.indptr[i + 1]
+        k = np.searchsorted(self.esparsa.indices[inicio:fim], j)
+        if k < fim - inicio and self.esparsa.indices[inicio + k] == j:
+            return float(self.esparsa.data[inicio + k])
+        return float('inf')
+
+    def linha(self, origem_id):
+        """Distâncias do ponto `origem_id` até todos os pontos (array float32 na ordem de `ids`)."""
+        i = self.indice(origem_id)
+        if i is None:
+            raise KeyError(f"{origem_id} não é um ponto de ônibus da matriz")
+        if self.densa is not None:
+            return np.asarray(self.densa[i])
+        linha = np.full(len(self.ids), np.inf, dtype=np.float32)
+        inicio, fim = self.esparsa.indptr[i], self.esparsa.indptr[i + 1]
+        linha[self.esparsa.indices[inicio:fim]] = self.esparsa.data[inicio:fim]
+        return linha
+
+
+def calcular_matriz(grafo, bus_stop_node_ids, diretorio, corte=None, num_processos=1, tamanho_lote=None):
+    """
+    Calcula as distâncias de caminhada entre todos os pares de pontos de ônibus, em lotes de
+    origens, com o Dijkstra em C do scipy.sparse.csgraph sobre a matriz esparsa do grafo.
+
+    Sem `corte`, grava a matriz densa k x k (float32) em um .npy escrito lote a lote e mapeado em
+    memória, então nem a escrita nem a leitura precisam da matriz inteira na RAM. Com `corte`,
+    cada busca para ao atingir essa distância e só as entradas dentro dele são gravadas, no
+    formato CSR (indptr, indices, data), também mapeável em memória.
+
+    Args:
+        grafo (GrafoCSR): O grafo compilado.
+        bus_stop_node_ids (list): IDs dos nós que são pontos de ônibus (repetições são ignoradas).
+        diretorio (str): Diretório de saída (substituído se já existir).
+        corte (float): Distância máxima (m), ou None para todas as distâncias.
+        num_processos (int): Processos trabalhadores (1 = no próprio processo).
+        tamanho_lote (int): Origens por lote (padrão: limitado por MEMORIA_LOTE_PADRAO).
+
+    Returns:
+        MatrizPontos: A matriz gravada, já aberta em modo mapeado.
+    """
+    ids = np.unique(np.asarray([node_id for node_id in bus_stop_node_ids if grafo.indice(node_id) is not None],
+                               dtype=np.int64))
+    colunas = np.searchsorted(grafo.node_ids, ids)
+    k = len(ids)
+    tamanho_lote = tamanho_lote or max(1, min(k, MEMORIA_LOTE_PADRAO // (8 * max(grafo.num_nos, 1))))
+    lotes = [colunas[inicio:inicio + tamanho_lote] for inicio in range(0, k, tamanho_lote)]
+
+    temporario = f"{diretorio}.tmp-{os.getpid()}"
+    shutil.rmtree(temporario, ignore_errors=True)
+    os.makedirs(temporario)
+    np.save(os.path.join(temporario, "ids.npy"), ids)
+
+    argumentos = (matriz_esparsa(grafo), colunas)
+    tarefa = _distancias_lote if corte is None else _lote_esparso
+    if num_processos > 1:
+        executor = ProcessPoolExecutor(max_workers=num_processos, initializer=_inicializar_trabalhador,
+                                       initargs=argumentos)
+        resultados = executor.map(tarefa, lotes, [corte] * len(lotes))
+    else:
+        executor = None
+        _inicializar_trabalhador(*argumentos)
+        resultados = (tarefa(lote, corte) for lote in lotes)
+
+    try:
+        if corte is None:
+            densa = np.lib.format.open_memmap(os.path.join(temporario, "distancias.npy"), mode="w+",
+                                              dtype=np.float32, shape=(k, k))
+            inicio = 0
+            for bloco in resultados:
+                densa[inicio:inicio + len(bloco)] = bloco
+                inicio += len(bloco)
+            densa.flush()
+            del densa
+        else:
+            contagens, indices, dados = [], [], []
+            for contagem, colunas_bloco, valores in resultados:
+                contagens.append(contagem)
+                indices.append(colunas_bloco)
+                dados.append(valores)
+            indptr = np.zeros(k + 1, dtype=np.int64)
+            if contagens:
+                np.cumsum(np.concatenate(contagens), out=indptr[1:])
+            np.save(os.path.join(temporario, "indptr.npy"), indptr)
+            np.save(os.path.join(temporario, "indices.npy"),
+                    np.concatenate(indices) if indices else np.empty(0, dtype=np.int32))
+            np.save(os.path.join(temporario, "data.npy"),
+                    np.concatenate(dados) if dados else np.empty(0, dtype=np.float32))
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    with open(os.path.join(temporario, ARQUIVO_META), "w", encoding="utf-8") as f:
+        json.dump({"formato": "densa" if corte is None else "esparsa", "corte": corte, "num_pontos": k,
+                   "assinatura_grafo": grafo.assinatura()}, f)
+
+    antigo = f"{diretorio}.old-{os.getpid()}"  # troca como em salvar_snapshot
+    shutil.rmtree(antigo, ignore_errors=True)
+    if os.path.exists(diretorio):
+        os.replace(diretorio, antigo)
+    os.replace(temporario, diretorio)
+    shutil.rmtree(antigo, ignore_errors=True)
+    return carregar_matriz(diretorio)
+
+
+def carregar_matriz(diretorio, mmap=True):
+    """
+    Abre uma matriz gravada por `calcular_matriz` (mapeada em memória por padrão).
+
+    Returns:
+        MatrizPontos: A matriz, ou None se o diretório não existir ou estiver incompleto.
+    """
+    mmap_mode = "r" if mmap else None
+    try:
+        with open(os.path.join(diretorio, ARQUIVO_META), encoding="utf-8") as f:
+            meta = json.load(f)
+        ids = np.load(os.path.join(diretorio, "ids.npy"))
+        if meta["formato"] == "densa":
+            return MatrizPontos(ids, densa=np.load(os.path.join(diretorio, "distancias.npy"), mmap_mode=mmap_mode))
+        from scipy.sparse import csr_matrix
+
+        arrays = [np.load(os.path.join(diretorio, f"{nome}.npy"), mmap_mode=mmap_mode)
+                  for nome in ("data", "indices", "indptr")]
+        return MatrizPontos(ids, corte=meta["corte"], esparsa=csr_matrix(tuple(arrays), shape=(len(ids), len(ids))))
+    except (FileNotFoundError, json.JSONDecodeError, KeyError, ValueError):
+        return None
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    from snapshot import SNAPSHOT_DIRPATH, carregar_grafo_preparado
+
+    parser = argparse.ArgumentParser(description="Matriz de distâncias de caminhada entre todos os pontos de ônibus.")
+    parser.add_argument("-o", "--saida", default=os.path.join(SNAPSHOT_DIRPATH, "matriz_pontos"))
+    parser.add_argument("-c", "--corte", type=float, default=None, help="Distância máxima (m); grava matriz esparsa")
+    parser.add_argument("-p", "--processos", type=int, default=os.cpu_count())
+    parser.add_argument("--tamanho-lote", type=int, default=None)
+    args = parser.parse_args()
+
+    grafo_principal, ids_pontos_onibus = carregar_grafo_preparado()
+    if grafo_principal is None:
+        print("STOP_MATRIX.PY: Falha ao carregar o grafo.")
+        raise SystemExit(1)
+
+    inicio_tempo = time.perf_counter()
+    matriz = calcular_matriz(grafo_principal, ids_pontos_onibus, args.saida, corte=args.corte,
+                             num_processos=args.processos, tamanho_lote=args.tamanho_lote)
+    tempo = time.perf_counter() - inicio_tempo
+    entradas = matriz.densa.size if matriz.densa is not None else matriz.esparsa.nnz
+    print(f"STOP_MATRIX.PY: Matriz de {len(matriz)} pontos ({entradas} entradas) gravada em {args.saida} "
+          f"em {tempo:.1f} s.")